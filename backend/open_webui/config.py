@@ -3,9 +3,12 @@ import json
 import logging
 import os
 import shutil
+import threading
+import time
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Generic, Optional, TypeVar
+from typing import Callable, Generic, Optional, TypeVar
 from urllib.parse import urlparse
 
 import redis
@@ -17,6 +20,7 @@ from open_webui.env import (
     FRONTEND_BUILD_DIR,
     OFFLINE_MODE,
     OPEN_WEBUI_DIR,
+    REDIS_CONFIG_SYNC_INTERVAL,
     REDIS_SENTINEL_HOSTS,
     REDIS_SENTINEL_PORT,
     REDIS_URL,
@@ -254,52 +258,201 @@ class PersistentConfig(Generic[T]):
 
 
 class AppConfig:
+    """
+    Application config backed by `PersistentConfig` values.
+
+    Reads are plain dict lookups on a local snapshot. When Redis is configured,
+    writes are stored under `open-webui:config:<key>`, bump a shared version and
+    are published on the `open-webui:config` channel. A background thread applies
+    updates published by other nodes and periodically compares versions to
+    recover from missed messages.
+
+    Other caches share the channel: `publish_invalidation` tells the other nodes
+    to call the listeners added with `add_invalidation_listener` for a name.
+    Every listener is also called on a resync.
+    """
+
     _state: dict[str, PersistentConfig]
     _redis: Optional[redis.Redis] = None
 
+    _REDIS_KEY_PREFIX = "open-webui:config:"
+    _REDIS_CHANNEL = "open-webui:config"
+    _REDIS_VERSION_KEY = "open-webui:config-version"
+
     def __init__(
-        self, redis_url: Optional[str] = None, redis_sentinels: Optional[list] = []
+        self,
+        redis_url: Optional[str] = None,
+        redis_sentinels: Optional[list] = [],
+        sync_interval: float = REDIS_CONFIG_SYNC_INTERVAL,
     ):
         super().__setattr__("_state", {})
+        super().__setattr__("_node_id", str(uuid.uuid4()))
+        super().__setattr__("_invalidation_listeners", {})
+        super().__setattr__("_sync_interval", sync_interval)
+        super().__setattr__(
+            "_sync_status",
+            {
+                "version": None,
+                "synced_at": time.time(),
+                "updates": 0,
+                "resyncs": 0,
+            },
+        )
+
         if redis_url:
             super().__setattr__(
                 "_redis",
                 get_redis_connection(redis_url, redis_sentinels, decode_responses=True),
             )
+            threading.Thread(
+                target=self._listen, name="config-sync", daemon=True
+            ).start()
 
     def __setattr__(self, key, value):
         if isinstance(value, PersistentConfig):
             self._state[key] = value
+
+            # Pick up a value another node already wrote to Redis
+            if self._redis:
+                try:
+                    self._apply(key, self._redis.get(self._REDIS_KEY_PREFIX + key))
+                except redis.RedisError as e:
+                    log.warning(f"Failed to load {key} from Redis: {e}")
         else:
             self._state[key].value = value
             self._state[key].save()
 
             if self._redis:
-                redis_key = f"open-webui:config:{key}"
-                self._redis.set(redis_key, json.dumps(self._state[key].value))
+                encoded_value = json.dumps(self._state[key].value)
+                self._redis.set(self._REDIS_KEY_PREFIX + key, encoded_value)
+                version = self._redis.incr(self._REDIS_VERSION_KEY)
+                self._redis.publish(
+                    self._REDIS_CHANNEL,
+                    json.dumps(
+                        {
+                            "key": key,
+                            "value": encoded_value,
+                            "version": version,
+                            "node": self._node_id,
+                        }
+                    ),
+                )
 
     def __getattr__(self, key):
-        if key not in self._state:
+        try:
+            return self._state[key].value
+        except KeyError:
             raise AttributeError(f"Config key '{key}' not found")
 
-        # If Redis is available, check for an updated value
-        if self._redis:
-            redis_key = f"open-webui:config:{key}"
-            redis_value = self._redis.get(redis_key)
+    def get_redis(self) -> Optional[redis.Redis]:
+        return self._redis
 
-            if redis_value is not None:
-                try:
-                    decoded_value = json.loads(redis_value)
+    def add_invalidation_listener(self, name: str, listener: Callable[[], None]):
+        """Call `listener` when another node invalidates `name`."""
+        self._invalidation_listeners.setdefault(name, []).append(listener)
 
-                    # Update the in-memory value if different
-                    if self._state[key].value != decoded_value:
-                        self._state[key].value = decoded_value
-                        log.info(f"Updated {key} from Redis: {decoded_value}")
+    def publish_invalidation(self, name: str) -> None:
+        if not self._redis:
+            return
 
-                except json.JSONDecodeError:
-                    log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
+        try:
+            version = self._redis.incr(self._REDIS_VERSION_KEY)
+            self._redis.publish(
+                self._REDIS_CHANNEL,
+                json.dumps(
+                    {"invalidate": name, "version": version, "node": self._node_id}
+                ),
+            )
+        except redis.RedisError as e:
+            log.warning(f"Failed to publish the invalidation of {name}: {e}")
 
-        return self._state[key].value
+    def _invalidate(self, names) -> None:
+        for name in names:
+            for listener in self._invalidation_listeners.get(name, []):
+                try:
+                    listener()
+                except Exception as e:
+                    log.warning(f"Failed to invalidate {name}: {e}")
+
+    def get_sync_status(self) -> dict:
+        """Version of the local snapshot and seconds since it was last confirmed."""
+        return {
+            **self._sync_status,
+            "staleness": (
+                time.time() - self._sync_status["synced_at"] if self._redis else 0.0
+            ),
+        }
+
+    def _apply(self, key: str, redis_value: Optional[str]) -> None:
+        if redis_value is None or key not in self._state:
+            return
+
+        try:
+            decoded_value = json.loads(redis_value)
+        except json.JSONDecodeError:
+            log.error(f"Invalid JSON format in Redis for {key}: {redis_value}")
+            return
+
+        # Update the in-memory value if different
+        if self._state[key].value != decoded_value:
+            self._state[key].value = decoded_value
+            self._sync_status["updates"] += 1
+            log.info(f"Updated {key} from Redis: {decoded_value}")
+
+    def _sync(self) -> None:
+        """Reload every config value from Redis."""
+        version = self._redis.get(self._REDIS_VERSION_KEY)
+        keys = list(self._state.keys())
+        if keys:
+            values = self._redis.mget([self._REDIS_KEY_PREFIX + key for key in keys])
+            for key, redis_value in zip(keys, values):
+                self._apply(key, redis_value)
+
+        # Invalidations may have been missed as well
+        self._invalidate(list(self._invalidation_listeners))
+
+        self._sync_status["version"] = version
+        self._sync_status["synced_at"] = time.time()
+        self._sync_status["resyncs"] += 1
+
+    def _check_version(self) -> None:
+        if self._redis.get(self._REDIS_VERSION_KEY) != self._sync_status["version"]:
+            log.info("Config version changed without an update message, resyncing")
+            self._sync()
+        else:
+            self._sync_status["synced_at"] = time.time()
+
+    def _listen(self) -> None:
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self._REDIS_CHANNEL)
+
+                # Anything written before the subscription is picked up here
+                self._sync()
+
+                last_check = time.monotonic()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        update = json.loads(message["data"])
+                        # Our own writes are already applied locally
+                        if update["node"] != self._node_id:
+                            if "invalidate" in update:
+                                self._invalidate([update["invalidate"]])
+                            else:
+                                self._apply(update["key"], update["value"])
+                        self._sync_status["version"] = str(update["version"])
+                        self._sync_status["synced_at"] = time.time()
+
+                    if time.monotonic() - last_check >= self._sync_interval:
+                        self._check_version()
+                        last_check = time.monotonic()
+            except Exception as e:
+                log.warning(f"Config sync with Redis interrupted, retrying: {e}")
+                time.sleep(1)
+            finally:
+                pubsub.close()
 
 
 ####################################
@@ -252,6 +252,34 @@ try:
 except ValueError:
     MODELS_CACHE_TTL = 300
 
+try:
+    MODELS_ACCESS_CACHE_SIZE = int(os.environ.get("MODELS_ACCESS_CACHE_SIZE") or 1024)
+except ValueError:
+    MODELS_ACCESS_CACHE_SIZE = 1024
+
+####################################
+# ATTESTATION
+####################################
+
+try:
+    ATTESTATION_REPORT_CACHE_TTL = int(
+        os.environ.get("ATTESTATION_REPORT_CACHE_TTL") or 60
+    )
+except ValueError:
+    ATTESTATION_REPORT_CACHE_TTL = 60
+
+try:
+    SIGNATURE_CACHE_SIZE = int(os.environ.get("SIGNATURE_CACHE_SIZE") or 10000)
+except ValueError:
+    SIGNATURE_CACHE_SIZE = 10000
+
+try:
+    SIGNATURE_BATCH_MAX_PARALLELISM = int(
+        os.environ.get("SIGNATURE_BATCH_MAX_PARALLELISM") or 8
+    )
+except ValueError:
+    SIGNATURE_BATCH_MAX_PARALLELISM = 8
+
 FRONTEND_BUILD_DIR = Path(os.getenv("FRONTEND_BUILD_DIR", BASE_DIR / "build")).resolve()
 
 if FROM_INIT_PY:
@@ -327,6 +355,43 @@ ENABLE_REALTIME_CHAT_SAVE = (
     os.environ.get("ENABLE_REALTIME_CHAT_SAVE", "False").lower() == "true"
 )
 
+# Realtime saves are coalesced per chat message and flushed once either budget is hit
+REALTIME_CHAT_SAVE_FLUSH_INTERVAL = os.environ.get(
+    "REALTIME_CHAT_SAVE_FLUSH_INTERVAL", "1.0"
+)
+
+try:
+    REALTIME_CHAT_SAVE_FLUSH_INTERVAL = float(REALTIME_CHAT_SAVE_FLUSH_INTERVAL)
+except Exception:
+    REALTIME_CHAT_SAVE_FLUSH_INTERVAL = 1.0
+
+REALTIME_CHAT_SAVE_FLUSH_BYTES = os.environ.get(
+    "REALTIME_CHAT_SAVE_FLUSH_BYTES", "16384"
+)
+
+try:
+    REALTIME_CHAT_SAVE_FLUSH_BYTES = int(REALTIME_CHAT_SAVE_FLUSH_BYTES)
+except Exception:
+    REALTIME_CHAT_SAVE_FLUSH_BYTES = 16384
+
+# Authenticated users are cached for this many seconds, 0 disables the cache
+USER_CACHE_TTL = os.environ.get("USER_CACHE_TTL", "5")
+
+try:
+    USER_CACHE_TTL = float(USER_CACHE_TTL)
+except Exception:
+    USER_CACHE_TTL = 5.0
+
+# Last active timestamps are aggregated in memory and written at this interval
+USER_LAST_ACTIVE_FLUSH_INTERVAL = os.environ.get(
+    "USER_LAST_ACTIVE_FLUSH_INTERVAL", "10"
+)
+
+try:
+    USER_LAST_ACTIVE_FLUSH_INTERVAL = float(USER_LAST_ACTIVE_FLUSH_INTERVAL)
+except Exception:
+    USER_LAST_ACTIVE_FLUSH_INTERVAL = 10.0
+
 ####################################
 # REDIS
 ####################################
@@ -335,6 +400,14 @@ REDIS_URL = os.environ.get("REDIS_URL", "")
 REDIS_SENTINEL_HOSTS = os.environ.get("REDIS_SENTINEL_HOSTS", "")
 REDIS_SENTINEL_PORT = os.environ.get("REDIS_SENTINEL_PORT", "26379")
 
+# Seconds between checks that the local config snapshot matches Redis, in case a
+# pub/sub update was missed
+REDIS_CONFIG_SYNC_INTERVAL = os.environ.get("REDIS_CONFIG_SYNC_INTERVAL", "30")
+try:
+    REDIS_CONFIG_SYNC_INTERVAL = float(REDIS_CONFIG_SYNC_INTERVAL)
+except ValueError:
+    REDIS_CONFIG_SYNC_INTERVAL = 30.0
+
 ####################################
 # UVICORN WORKERS
 ####################################
@@ -455,6 +528,58 @@ OFFLINE_MODE = os.environ.get("OFFLINE_MODE", "false").lower() == "true"
 if OFFLINE_MODE:
     os.environ["HF_HUB_OFFLINE"] = "1"
 
+####################################
+# RETRIEVAL
+####################################
+
+# Threads of the executor shared by all retrieval requests
+RAG_RETRIEVAL_WORKERS = os.environ.get(
+    "RAG_RETRIEVAL_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))
+)
+
+try:
+    RAG_RETRIEVAL_WORKERS = max(1, int(RAG_RETRIEVAL_WORKERS))
+except Exception:
+    RAG_RETRIEVAL_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Queries and collections of a single request searched at the same time
+RAG_RETRIEVAL_MAX_PARALLELISM = os.environ.get("RAG_RETRIEVAL_MAX_PARALLELISM", "8")
+
+try:
+    RAG_RETRIEVAL_MAX_PARALLELISM = max(1, int(RAG_RETRIEVAL_MAX_PARALLELISM))
+except Exception:
+    RAG_RETRIEVAL_MAX_PARALLELISM = 8
+
+# Embeddings kept in memory by (engine, model, prefix, text), 0 disables the cache
+RAG_EMBEDDING_CACHE_SIZE = os.environ.get("RAG_EMBEDDING_CACHE_SIZE", "1024")
+
+try:
+    RAG_EMBEDDING_CACHE_SIZE = max(0, int(RAG_EMBEDDING_CACHE_SIZE))
+except Exception:
+    RAG_EMBEDDING_CACHE_SIZE = 1024
+
+# Seconds before a cached embedding is computed again
+RAG_EMBEDDING_CACHE_TTL = os.environ.get("RAG_EMBEDDING_CACHE_TTL", "3600")
+
+try:
+    RAG_EMBEDDING_CACHE_TTL = float(RAG_EMBEDDING_CACHE_TTL)
+except Exception:
+    RAG_EMBEDDING_CACHE_TTL = 3600.0
+
+# Hybrid search keeps a BM25 index of each collection in this directory, it has to
+# be shared by all instances like the vector DB
+RAG_BM25_INDEX_DIR = Path(
+    os.environ.get("RAG_BM25_INDEX_DIR", DATA_DIR / "cache" / "bm25")
+).resolve()
+
+# BM25 indexes kept in memory, the least recently used ones are loaded again on use
+RAG_BM25_INDEX_CACHE_SIZE = os.environ.get("RAG_BM25_INDEX_CACHE_SIZE", "16")
+
+try:
+    RAG_BM25_INDEX_CACHE_SIZE = max(1, int(RAG_BM25_INDEX_CACHE_SIZE))
+except Exception:
+    RAG_BM25_INDEX_CACHE_SIZE = 16
+
 ####################################
 # AUDIT LOGGING
 ####################################
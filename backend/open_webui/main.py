@@ -14,7 +14,6 @@ from urllib.parse import parse_qs, urlencode, urlparse
 
 import aiohttp
 import requests
-from aiocache import cached
 from fastapi import (
     BackgroundTasks,
     Depends,
@@ -257,7 +256,6 @@ from open_webui.env import (
     EXTERNAL_PWA_MANIFEST_URL,
     GLOBAL_LOG_LEVEL,
     MAX_BODY_LOG_SIZE,
-    MODELS_CACHE_TTL,
     OFFLINE_MODE,
     REDIS_SENTINEL_HOSTS,
     REDIS_SENTINEL_PORT,
@@ -304,34 +302,50 @@ from open_webui.routers import (
     utils,
 )
 from open_webui.routers.retrieval import get_ef, get_embedding_function, get_rf
+from open_webui.retrieval.executor import RETRIEVAL_EXECUTOR
 from open_webui.socket.main import app as socket_app
 from open_webui.socket.main import periodic_usage_pool_cleanup
 from open_webui.tasks import list_task_ids_by_chat_id  # Import from tasks.py
 from open_webui.tasks import list_tasks, stop_task
 from open_webui.utils import logger
-from open_webui.utils.access_control import has_access
+from open_webui.utils.attestation import ATTESTATION_CLIENT
 from open_webui.utils.audit import AuditLevel, AuditLoggingMiddleware
 from open_webui.utils.auth import (
+    LAST_ACTIVE_WRITER,
     decode_token,
     get_admin_user,
     get_http_authorization_cred,
     get_license_data,
     get_verified_user,
+    periodic_last_active_flush,
 )
+from open_webui.utils.filter import FILTER_REGISTRY
 from open_webui.utils.chat import chat_action as chat_action_handler
 from open_webui.utils.chat import chat_completed as chat_completed_handler
 from open_webui.utils.chat import generate_chat_completion as chat_completion_handler
+from open_webui.utils.chat_encryption_proxy import (
+    backfill_chat_search_index,
+    prefetch_chat_encryption_key,
+)
 from open_webui.utils.logger import start_logger
+from open_webui.utils.message_buffer import get_message_write_buffer_stats
 from open_webui.utils.middleware import process_chat_payload, process_chat_response
 from open_webui.utils.models import (
+    MODEL_CATALOG,
     check_model_access,
     get_all_base_models,
     get_all_models,
 )
 from open_webui.utils.oauth import OAuthManager
-from open_webui.utils.redis import get_sentinels_from_env
+from open_webui.utils.redis import get_redis_connection, get_sentinels_from_env
 from open_webui.utils.security_headers import SecurityHeadersMiddleware
-from pydantic import BaseModel
+from open_webui.utils.user_encryption import (
+    UserEncryptionConfig,
+    close_encryption_service,
+    prefetch_user_encryption_key,
+    prewarm_encryption_keys,
+)
+from pydantic import BaseModel, Field
 from sqlalchemy import text
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -420,8 +434,18 @@ async def lifespan(app: FastAPI):
         get_license_data(app, LICENSE_KEY)
 
     asyncio.create_task(periodic_usage_pool_cleanup())
+    last_active_flush_task = asyncio.create_task(periodic_last_active_flush())
+
+    if UserEncryptionConfig.is_encryption_enabled():
+        asyncio.create_task(prewarm_encryption_keys())
+        asyncio.create_task(backfill_chat_search_index())
+
     yield
 
+    last_active_flush_task.cancel()
+    LAST_ACTIVE_WRITER.flush()
+    close_encryption_service()
+
 
 app = FastAPI(
     title="NEAR AI Private Chat",
@@ -437,6 +461,14 @@ app.state.config = AppConfig(
     redis_url=REDIS_URL,
     redis_sentinels=get_sentinels_from_env(REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT),
 )
+FILTER_REGISTRY.attach(app.state.config)
+MODEL_CATALOG.attach(app.state.config)
+if REDIS_URL:
+    openai.OPENAI_MODELS_REFRESHER.redis = get_redis_connection(
+        REDIS_URL,
+        get_sentinels_from_env(REDIS_SENTINEL_HOSTS, REDIS_SENTINEL_PORT),
+        async_mode=True,
+    )
 
 app.state.WEBUI_NAME = WEBUI_NAME
 app.state.LICENSE_METADATA = None
@@ -893,6 +925,32 @@ async def check_url(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def prefetch_encryption_key(request: Request, call_next):
+    # Load the caller's data key off the event loop so that the synchronous chat
+    # encryption proxy only ever hits the key cache while handling the request.
+    # Static files and the SPA never touch chats, their tokens are not decoded
+    if UserEncryptionConfig.is_encryption_enabled() and request.url.path.startswith(
+        "/api/"
+    ):
+        auth_token = get_http_authorization_cred(request.headers.get("Authorization"))
+        token = auth_token.credentials if auth_token else request.cookies.get("token")
+
+        user_id = None
+        if token and token.startswith("sk-"):
+            # API key clients save and read chats just like session users
+            api_key_user = await asyncio.to_thread(Users.get_user_by_api_key, token)
+            user_id = api_key_user.id if api_key_user else None
+        elif token:
+            data = decode_token(token)
+            user_id = data.get("id") if data is not None else None
+
+        if user_id:
+            await prefetch_user_encryption_key(user_id)
+
+    return await call_next(request)
+
+
 @app.middleware("http")
 async def inspect_websocket(request: Request, call_next):
     if (
@@ -979,69 +1037,18 @@ if audit_level != AuditLevel.NONE:
 ##################################
 
 
-async def get_models_uncached(request: Request, user):
-    """
-    Function with the exact, entire content of the current /api/models code, without cache
-    """
-
-    def get_filtered_models(models, user):
-        filtered_models = []
-        for model in models:
-            if model.get("arena"):
-                if has_access(
-                    user.id,
-                    type="read",
-                    access_control=model.get("info", {})
-                    .get("meta", {})
-                    .get("access_control", {}),
-                ):
-                    filtered_models.append(model)
-                continue
-
-            model_info = Models.get_model_by_id(model["id"])
-            if model_info:
-                if user.id == model_info.user_id or has_access(
-                    user.id, type="read", access_control=model_info.access_control
-                ):
-                    filtered_models.append(model)
-
-        return filtered_models
-
+@app.get("/api/models")
+async def get_models(request: Request, user=Depends(get_verified_user)):
     all_models = await get_all_models(request, user=user)
 
-    models = []
-    for model in all_models:
-        # Filter out filter pipelines
-        if "pipeline" in model and model["pipeline"].get("type", None) == "filter":
-            continue
-
-        try:
-            model_tags = [
-                tag.get("name")
-                for tag in model.get("info", {}).get("meta", {}).get("tags", [])
-            ]
-            tags = [tag.get("name") for tag in model.get("tags", [])]
-
-            tags = list(set(model_tags + tags))
-            model["tags"] = [{"name": tag} for tag in tags]
-        except Exception as e:
-            log.debug(f"Error processing model tags: {e}")
-            model["tags"] = []
-            pass
-
-        models.append(model)
-
-    model_order_list = request.app.state.config.MODEL_ORDER_LIST
-    if model_order_list:
-        model_order_dict = {model_id: i for i, model_id in enumerate(model_order_list)}
-        # Sort models by order list priority, with fallback for those not in the list
-        models.sort(
-            key=lambda x: (model_order_dict.get(x["id"], float("inf")), x["name"])
-        )
-
     # Filter out models that the user does not have access to
-    if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
-        models = get_filtered_models(models, user)
+    models = await MODEL_CATALOG.get_models(
+        all_models,
+        request.app.state.config.MODEL_ORDER_LIST,
+        user=(
+            user if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL else None
+        ),
+    )
 
     log.debug(
         f"/api/models returned filtered models accessible to the user: {json.dumps([model['id'] for model in models])}"
@@ -1049,23 +1056,6 @@ async def get_models_uncached(request: Request, user):
     return {"data": models}
 
 
-@cached(ttl=MODELS_CACHE_TTL, key_builder=lambda *args, **kwargs: "user_models")
-async def get_models_cached(request: Request, user):
-    """
-    Function which calls get_models_uncached with configurable cache TTL (MODELS_CACHE_TTL).
-    """
-    return await get_models_uncached(request, user)
-
-
-@app.get("/api/models")
-async def get_models(request: Request, user=Depends(get_verified_user)):
-    # Call function 1 or 2 based on user role
-    if user.role == "admin":
-        return await get_models_uncached(request, user)
-    else:
-        return await get_models_cached(request, user)
-
-
 @app.get("/api/models/base")
 async def get_base_models(request: Request, user=Depends(get_admin_user)):
     models = await get_all_base_models(request, user=user)
@@ -1153,7 +1143,7 @@ async def chat_completion(
         log.debug(f"Error processing chat payload: {e}")
         if metadata.get("chat_id") and metadata.get("message_id"):
             # Update the chat message with the error
-            Chats.upsert_message_to_chat_by_id_and_message_id(
+            Chats.save_message_to_chat_by_id_and_message_id(
                 metadata["chat_id"],
                 metadata["message_id"],
                 {
@@ -1214,6 +1204,30 @@ async def chat_completed(
         )
 
 
+async def get_model_connection(request: Request, model: str, user) -> tuple[str, str]:
+    """The base url and key of the OpenAI connection serving a model the user may read."""
+    # Get the model configuration
+    if model not in request.app.state.MODELS:
+        await get_all_models(request, user=user)
+
+    if model not in request.app.state.MODELS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Model {model} not found"
+        )
+
+    model_config = request.app.state.MODELS[model]
+
+    # Check if user has access to the model
+    if not BYPASS_MODEL_ACCESS_CONTROL and user.role == "user":
+        check_model_access(user, model_config)
+
+    idx = model_config.get("urlIdx")
+    return (
+        request.app.state.config.OPENAI_API_BASE_URLS[idx],
+        request.app.state.config.OPENAI_API_KEYS[idx],
+    )
+
+
 # Get attestation report of intel quote and nvidia payload
 @app.get("/api/attestation/report")
 async def chat_attestation(
@@ -1231,63 +1245,11 @@ async def chat_attestation(
         ModelAttestationReport: Attestation report with signing address, nvidia payload, and intel quote
     """
     try:
-        # Get the model configuration
-        if model not in request.app.state.MODELS:
-            await get_all_models(request, user=user)
-
-        if model not in request.app.state.MODELS:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail=f"Model {model} not found"
-            )
-
-        model_config = request.app.state.MODELS[model]
-
-        # Check if user has access to the model
-        if not BYPASS_MODEL_ACCESS_CONTROL and user.role == "user":
-            try:
-                check_model_access(user, model_config)
-            except Exception as e:
-                raise e
-
-        idx = model_config.get("urlIdx")
-        base_url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
-        key = request.app.state.config.OPENAI_API_KEYS[idx]
-
-        headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
-
-        # Forward the request to the model provider
-        async with (
-            aiohttp.ClientSession() as session,
-            session.get(
-                f"{base_url}/attestation/report",
-                headers=headers,
-                params={"model": model},
-            ) as response,
-        ):
-            if response.status != 200:
-                raise HTTPException(
-                    status_code=response.status,
-                    detail=f"Model provider returned error: {response.status}",
-                )
-
-            # Handle responses that return JSON but with text/plain content-type
-            try:
-                attestation_data = await response.json()
-            except Exception as json_error:
-                log.warning(f"Failed to parse response as JSON: {json_error}")
-                # Try to read as text and parse manually
-                text_content = await response.text()
-                try:
-                    attestation_data = json.loads(text_content)
-                except json.JSONDecodeError as e:
-                    log.error(f"Failed to parse response text as JSON: {e}")
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Invalid JSON response from model provider: {text_content}",
-                    )
-
-            return attestation_data
+        base_url, key = await get_model_connection(request, model, user)
+        return await ATTESTATION_CLIENT.get_attestation_report(base_url, key, model)
 
+    except HTTPException:
+        raise
     except aiohttp.ClientError as e:
         log.error(f"Error connecting to model provider: {e}")
         raise HTTPException(
@@ -1325,63 +1287,13 @@ async def chat_signature(
         MessageSignature: Signature with text, signature, signing address, and algorithm
     """
     try:
-        # Get the model configuration
-        if model not in request.app.state.MODELS:
-            await get_all_models(request, user=user)
-
-        if model not in request.app.state.MODELS:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail=f"Model {model} not found"
-            )
-
-        model_config = request.app.state.MODELS[model]
-
-        # Check if user has access to the model
-        if not BYPASS_MODEL_ACCESS_CONTROL and user.role == "user":
-            try:
-                check_model_access(user, model_config)
-            except Exception as e:
-                raise e
-
-        idx = model_config.get("urlIdx")
-        base_url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
-        key = request.app.state.config.OPENAI_API_KEYS[idx]
-
-        headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
-
-        # Forward the request to the model provider
-        async with (
-            aiohttp.ClientSession() as session,
-            session.get(
-                f"{base_url}/signature/{chat_completion_id}",
-                headers=headers,
-                params={"model": model, "signing_algo": signing_algo},
-            ) as response,
-        ):
-            if response.status != 200:
-                raise HTTPException(
-                    status_code=response.status,
-                    detail=f"Model provider returned error: {response.status}",
-                )
-
-            # Handle responses that return JSON but with text/plain content-type
-            try:
-                signature_data = await response.json()
-            except Exception as json_error:
-                log.warning(f"Failed to parse response as JSON: {json_error}")
-                # Try to read as text and parse manually
-                text_content = await response.text()
-                try:
-                    signature_data = json.loads(text_content)
-                except json.JSONDecodeError as e:
-                    log.error(f"Failed to parse response text as JSON: {e}")
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Invalid JSON response from model provider: {text_content}",
-                    )
-
-            return signature_data
+        base_url, key = await get_model_connection(request, model, user)
+        return await ATTESTATION_CLIENT.get_signature(
+            base_url, key, model, chat_completion_id, signing_algo
+        )
 
+    except HTTPException:
+        raise
     except aiohttp.ClientError as e:
         log.error(f"Error connecting to model provider: {e}")
         raise HTTPException(
@@ -1396,6 +1308,50 @@ async def chat_signature(
         ) from e
 
 
+class SignaturesForm(BaseModel):
+    model: str
+    chat_completion_ids: list[str] = Field(max_length=1000)
+    signing_algo: str = "ecdsa"
+
+
+# Get the signatures of several chats at once
+@app.post("/api/signatures")
+async def chat_signatures(
+    request: Request, form_data: SignaturesForm, user=Depends(get_verified_user)
+):
+    """
+    Get the signatures of chat completions of a model, e.g. all the messages of
+    a chat.
+
+    Returns:
+        StreamingResponse: One JSON line per chat completion as soon as its
+        signature is available, the cached ones first, either
+        {"chat_completion_id", "signature": MessageSignature} or
+        {"chat_completion_id", "error", "status"}
+    """
+    try:
+        base_url, key = await get_model_connection(request, form_data.model, user)
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error(f"Error getting signatures: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error",
+        ) from e
+
+    return StreamingResponse(
+        ATTESTATION_CLIENT.stream_signatures(
+            base_url,
+            key,
+            form_data.model,
+            form_data.chat_completion_ids,
+            form_data.signing_algo,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
 @app.post("/api/chat/actions/{action_id}")
 async def chat_action(
     request: Request, action_id: str, form_data: dict, user=Depends(get_verified_user)
@@ -1431,6 +1387,7 @@ async def list_tasks_endpoint(user=Depends(get_verified_user)):
 
 @app.get("/api/tasks/chat/{chat_id}")
 async def list_tasks_by_chat_id_endpoint(chat_id: str, user=Depends(get_verified_user)):
+    await prefetch_chat_encryption_key(chat_id)
     chat = Chats.get_chat_by_id(chat_id)
     if chat is None or chat.user_id != user.id:
         return {"task_ids": []}
@@ -1694,6 +1651,26 @@ async def healthcheck_with_db():
     return {"status": True}
 
 
+@app.get("/health/config")
+async def healthcheck_with_config():
+    return {"status": True, **app.state.config.get_sync_status()}
+
+
+@app.get("/health/retrieval")
+async def healthcheck_with_retrieval():
+    return {"status": True, **RETRIEVAL_EXECUTOR.get_stats()}
+
+
+@app.get("/health/models")
+async def healthcheck_with_models():
+    return {"status": True, **openai.OPENAI_MODELS_REFRESHER.get_stats()}
+
+
+@app.get("/health/chat-saves")
+async def healthcheck_with_chat_saves():
+    return {"status": True, **get_message_write_buffer_stats()}
+
+
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 app.mount("/cache", StaticFiles(directory=CACHE_DIR), name="cache")
 
@@ -0,0 +1,37 @@
+"""Add chat_message table
+
+Revision ID: d31026856c01
+Revises: 3781e22d8b01
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "d31026856c01"
+down_revision = "3781e22d8b01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "chat_message",
+        sa.Column("id", sa.String(), nullable=False),  # Message ID within the chat
+        sa.Column("chat_id", sa.String(), nullable=False),  # Owning chat
+        sa.Column("user_id", sa.String(), nullable=False),  # Owner of the chat
+        sa.Column("data", sa.Text(), nullable=True),  # Encrypted message
+        sa.Column(
+            "digest", sa.String(), nullable=True
+        ),  # Keyed hash of the plaintext message
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("chat_id", "id", name="pk_chat_id_id"),
+    )
+    op.create_index("chat_message_user_id_idx", "chat_message", ["user_id"])
+
+
+def downgrade():
+    op.drop_index("chat_message_user_id_idx", table_name="chat_message")
+    op.drop_table("chat_message")
@@ -0,0 +1,37 @@
+"""Add chat_search_token table
+
+Revision ID: e6c2b0f4a7d9
+Revises: d31026856c01
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "e6c2b0f4a7d9"
+down_revision = "d31026856c01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "chat_search_token",
+        sa.Column("chat_id", sa.String(), nullable=False),  # Indexed chat
+        sa.Column("user_id", sa.String(), nullable=False),  # Owner of the chat
+        sa.Column(
+            "token", sa.String(), nullable=False
+        ),  # Keyed HMAC of a normalised word
+        sa.PrimaryKeyConstraint("chat_id", "token", name="pk_chat_id_token"),
+    )
+    op.create_index(
+        "chat_search_token_user_id_token_idx",
+        "chat_search_token",
+        ["user_id", "token"],
+    )
+
+
+def downgrade():
+    op.drop_index("chat_search_token_user_id_token_idx", table_name="chat_search_token")
+    op.drop_table("chat_search_token")
@@ -0,0 +1,49 @@
+"""Add group_member table
+
+Revision ID: f3b1c8d2a6e4
+Revises: e6c2b0f4a7d9
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "f3b1c8d2a6e4"
+down_revision = "e6c2b0f4a7d9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    group_member_table = op.create_table(
+        "group_member",
+        sa.Column("group_id", sa.Text(), nullable=False),  # Group
+        sa.Column("user_id", sa.Text(), nullable=False),  # Member of the group
+        sa.PrimaryKeyConstraint("group_id", "user_id", name="pk_group_id_user_id"),
+    )
+    op.create_index("group_member_user_id_idx", "group_member", ["user_id"])
+
+    # Backfill the membership rows from the `user_ids` of the existing groups
+    group_table = sa.table(
+        "group",
+        sa.column("id", sa.Text()),
+        sa.column("user_ids", sa.JSON()),
+    )
+
+    connection = op.get_bind()
+    rows = [
+        {"group_id": group_id, "user_id": user_id}
+        for group_id, user_ids in connection.execute(
+            sa.select(group_table.c.id, group_table.c.user_ids)
+        ).fetchall()
+        for user_id in set(user_ids or [])
+    ]
+
+    if rows:
+        op.bulk_insert(group_member_table, rows)
+
+
+def downgrade():
+    op.drop_index("group_member_user_id_idx", table_name="group_member")
+    op.drop_table("group_member")
@@ -4,7 +4,7 @@ import uuid
 from typing import Optional
 
 from open_webui.internal.db import Base, get_db
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import has_access_many
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON
@@ -99,9 +99,15 @@ class ChannelTable:
         channels = self.get_channels()
         return [
             channel
-            for channel in channels
-            if channel.user_id == user_id
-            or has_access(user_id, permission, channel.access_control)
+            for channel, access in zip(
+                channels,
+                has_access_many(
+                    user_id,
+                    permission,
+                    [channel.access_control for channel in channels],
+                ),
+            )
+            if channel.user_id == user_id or access
         ]
 
     def get_channel_by_id(self, id: str) -> Optional[ChannelModel]:
@@ -0,0 +1,210 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.internal.db import Base, get_db
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, PrimaryKeyConstraint, String, Text
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+####################
+# ChatMessage DB Schema
+####################
+
+
+class ChatMessage(Base):
+    """
+    A single message of a chat's `history.messages`, stored on its own row.
+
+    `data` holds the encrypted message and `digest` a keyed hash of its plaintext
+    so unchanged messages can be skipped without decrypting them.
+    """
+
+    __tablename__ = "chat_message"
+
+    id = Column(String)
+    chat_id = Column(String)
+    user_id = Column(String)
+
+    data = Column(Text)
+    digest = Column(String, nullable=True)
+
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)
+
+    __table_args__ = (PrimaryKeyConstraint("chat_id", "id", name="pk_chat_id_id"),)
+
+
+class ChatMessageModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    chat_id: str
+    user_id: str
+
+    data: str
+    digest: Optional[str] = None
+
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+
+
+@contextmanager
+def _get_session(db: Optional[Session] = None):
+    """
+    Use the session of the caller, who commits the writes together with its own,
+    or a new session committed on exit.
+    """
+    if db is not None:
+        yield db
+        return
+
+    with get_db() as db:
+        yield db
+        db.commit()
+
+
+class ChatMessagesTable:
+    def get_message(
+        self, chat_id: str, id: str, db: Optional[Session] = None
+    ) -> Optional[ChatMessageModel]:
+        with _get_session(db) as db:
+            message = db.get(ChatMessage, (chat_id, id))
+            return ChatMessageModel.model_validate(message) if message else None
+
+    def get_messages_by_chat_id(
+        self, chat_id: str, db: Optional[Session] = None
+    ) -> list[ChatMessageModel]:
+        with _get_session(db) as db:
+            return [
+                ChatMessageModel.model_validate(message)
+                for message in db.query(ChatMessage).filter_by(chat_id=chat_id).all()
+            ]
+
+    def get_messages_by_chat_ids(
+        self, chat_ids: list[str]
+    ) -> dict[str, list[ChatMessageModel]]:
+        messages = {chat_id: [] for chat_id in chat_ids}
+        if not chat_ids:
+            return messages
+
+        with get_db() as db:
+            for message in (
+                db.query(ChatMessage).filter(ChatMessage.chat_id.in_(chat_ids)).all()
+            ):
+                messages[message.chat_id].append(
+                    ChatMessageModel.model_validate(message)
+                )
+
+        return messages
+
+    def get_digests_by_chat_id(
+        self, chat_id: str, db: Optional[Session] = None
+    ) -> dict[str, Optional[str]]:
+        with _get_session(db) as db:
+            return {
+                id: digest
+                for id, digest in db.query(ChatMessage.id, ChatMessage.digest)
+                .filter_by(chat_id=chat_id)
+                .all()
+            }
+
+    def upsert_message(
+        self,
+        chat_id: str,
+        id: str,
+        user_id: str,
+        data: str,
+        digest: Optional[str] = None,
+        db: Optional[Session] = None,
+    ) -> ChatMessageModel:
+        with _get_session(db) as db:
+            now = int(time.time())
+
+            message = db.get(ChatMessage, (chat_id, id))
+            if message is None:
+                message = ChatMessage(
+                    id=id, chat_id=chat_id, user_id=user_id, created_at=now
+                )
+                db.add(message)
+
+            message.data = data
+            message.digest = digest
+            message.updated_at = now
+
+            db.flush()
+            return ChatMessageModel.model_validate(message)
+
+    def sync_messages(
+        self,
+        chat_id: str,
+        user_id: str,
+        messages: dict[str, tuple[str, Optional[str]]],
+        keep: Optional[set[str]] = None,
+        db: Optional[Session] = None,
+    ) -> None:
+        """
+        Write `messages` ({id: (data, digest)}) and delete every other message of
+        the chat that is not listed in `keep`.
+        """
+        keep = set(keep or ()) | set(messages.keys())
+
+        with _get_session(db) as db:
+            now = int(time.time())
+            existing = {
+                message.id: message
+                for message in db.query(ChatMessage).filter_by(chat_id=chat_id).all()
+            }
+
+            for id, message in existing.items():
+                if id not in keep:
+                    db.delete(message)
+
+            for id, (data, digest) in messages.items():
+                message = existing.get(id)
+                if message is None:
+                    message = ChatMessage(
+                        id=id, chat_id=chat_id, user_id=user_id, created_at=now
+                    )
+                    db.add(message)
+
+                message.data = data
+                message.digest = digest
+                message.updated_at = now
+
+    def delete_messages_by_chat_id(
+        self, chat_id: str, db: Optional[Session] = None
+    ) -> bool:
+        try:
+            with _get_session(db) as db:
+                db.query(ChatMessage).filter_by(chat_id=chat_id).delete()
+                return True
+        except Exception:
+            return False
+
+    def delete_messages_by_chat_ids(self, chat_ids: list[str]) -> bool:
+        try:
+            with get_db() as db:
+                db.query(ChatMessage).filter(ChatMessage.chat_id.in_(chat_ids)).delete()
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+    def delete_messages_by_user_id(self, user_id: str) -> bool:
+        try:
+            with get_db() as db:
+                db.query(ChatMessage).filter_by(user_id=user_id).delete()
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+
+ChatMessages = ChatMessagesTable()
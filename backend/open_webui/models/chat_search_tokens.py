@@ -0,0 +1,145 @@
+import logging
+from typing import Iterable
+
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.internal.db import Base, get_db
+from sqlalchemy import Column, Index, PrimaryKeyConstraint, String, func, select
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+# Kept in the index of every indexed chat, so chats without any word are not
+# mistaken for chats written before the index existed. Never a query token.
+INDEXED_TOKEN = ""
+
+
+####################
+# ChatSearchToken DB Schema
+####################
+
+
+class ChatSearchToken(Base):
+    """
+    Blind search index entry: a keyed HMAC of a word (or word prefix) that occurs
+    in the title or messages of an encrypted chat.
+    """
+
+    __tablename__ = "chat_search_token"
+
+    chat_id = Column(String)
+    user_id = Column(String)
+    token = Column(String)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("chat_id", "token", name="pk_chat_id_token"),
+        Index("chat_search_token_user_id_token_idx", "user_id", "token"),
+    )
+
+
+class ChatSearchTokensTable:
+    def get_tokens_by_chat_id(self, chat_id: str) -> set[str]:
+        with get_db() as db:
+            return {
+                token
+                for (token,) in db.query(ChatSearchToken.token)
+                .filter_by(chat_id=chat_id)
+                .all()
+                if token != INDEXED_TOKEN
+            }
+
+    def add_tokens(self, chat_id: str, user_id: str, tokens: Iterable[str]) -> None:
+        """Add tokens to a chat's index, keeping the ones it already has."""
+        tokens = set(tokens)
+        if not tokens:
+            return
+
+        with get_db() as db:
+            existing = {
+                token
+                for (token,) in db.query(ChatSearchToken.token)
+                .filter(
+                    ChatSearchToken.chat_id == chat_id,
+                    ChatSearchToken.token.in_(tokens),
+                )
+                .all()
+            }
+
+            db.add_all(
+                [
+                    ChatSearchToken(chat_id=chat_id, user_id=user_id, token=token)
+                    for token in tokens - existing
+                ]
+            )
+            db.commit()
+
+    def sync_tokens(self, chat_id: str, user_id: str, tokens: Iterable[str]) -> None:
+        """Replace a chat's index with `tokens`, writing only the difference."""
+        tokens = set(tokens) | {INDEXED_TOKEN}
+
+        with get_db() as db:
+            existing = {
+                token
+                for (token,) in db.query(ChatSearchToken.token)
+                .filter_by(chat_id=chat_id)
+                .all()
+            }
+
+            removed = existing - tokens
+            if removed:
+                db.query(ChatSearchToken).filter(
+                    ChatSearchToken.chat_id == chat_id,
+                    ChatSearchToken.token.in_(removed),
+                ).delete(synchronize_session=False)
+
+            db.add_all(
+                [
+                    ChatSearchToken(chat_id=chat_id, user_id=user_id, token=token)
+                    for token in tokens - existing
+                ]
+            )
+            db.commit()
+
+    def get_chat_ids_query(self, user_id: str, tokens: Iterable[str]):
+        """Select the ids of the user's chats that contain every token."""
+        tokens = set(tokens)
+        return (
+            select(ChatSearchToken.chat_id)
+            .where(
+                ChatSearchToken.user_id == user_id,
+                ChatSearchToken.token.in_(tokens),
+            )
+            .group_by(ChatSearchToken.chat_id)
+            .having(func.count(ChatSearchToken.token) == len(tokens))
+        )
+
+    def delete_tokens_by_chat_id(self, chat_id: str) -> bool:
+        try:
+            with get_db() as db:
+                db.query(ChatSearchToken).filter_by(chat_id=chat_id).delete()
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+    def delete_tokens_by_chat_ids(self, chat_ids: list[str]) -> bool:
+        try:
+            with get_db() as db:
+                db.query(ChatSearchToken).filter(
+                    ChatSearchToken.chat_id.in_(chat_ids)
+                ).delete(synchronize_session=False)
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+    def delete_tokens_by_user_id(self, user_id: str) -> bool:
+        try:
+            with get_db() as db:
+                db.query(ChatSearchToken).filter_by(user_id=user_id).delete()
+                db.commit()
+                return True
+        except Exception:
+            return False
+
+
+ChatSearchTokens = ChatSearchTokensTable()
@@ -1,7 +1,7 @@
 import logging
 import time
 import uuid
-from typing import Optional
+from typing import Iterator, Optional
 
 from open_webui.env import SRC_LOG_LEVELS
 from open_webui.internal.db import Base, get_db
@@ -257,6 +257,21 @@ class ChatTable:
         chat["history"] = history
         return self.update_chat_by_id(id, chat)
 
+    def save_message_to_chat_by_id_and_message_id(
+        self, id: str, message_id: str, message: dict, append: bool = False
+    ) -> bool:
+        """
+        Like `upsert_message_to_chat_by_id_and_message_id` without returning the chat.
+
+        `append` marks content that only grew since it was last saved, as while
+        streaming, which the encrypted chat search index adds to instead of
+        rebuilding.
+        """
+        return (
+            self.upsert_message_to_chat_by_id_and_message_id(id, message_id, message)
+            is not None
+        )
+
     def add_message_status_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, status: dict
     ) -> Optional[ChatModel]:
@@ -434,29 +449,66 @@ class ChatTable:
             if not include_archived:
                 query = query.filter_by(archived=False)
 
-            query = query.order_by(Chat.updated_at.desc()).with_entities(
-                Chat.id, Chat.title, Chat.updated_at, Chat.created_at
-            )
+            query = query.order_by(Chat.updated_at.desc())
 
             if skip:
                 query = query.offset(skip)
             if limit:
                 query = query.limit(limit)
 
-            all_chats = query.all()
+            return self._get_chat_title_id_list(query)
+
+    def _get_chat_title_id_list(self, query) -> list[ChatTitleIdResponse]:
+        """Run a chat query fetching only the columns of `ChatTitleIdResponse`."""
+        all_chats = query.with_entities(
+            Chat.id, Chat.title, Chat.updated_at, Chat.created_at
+        ).all()
+
+        # result has to be destrctured from sqlalchemy `row` and mapped to a dict since the `ChatModel`is not the returned dataclass.
+        return [
+            ChatTitleIdResponse.model_validate(
+                {
+                    "id": chat[0],
+                    "title": chat[1],
+                    "updated_at": chat[2],
+                    "created_at": chat[3],
+                }
+            )
+            for chat in all_chats
+        ]
 
-            # result has to be destrctured from sqlalchemy `row` and mapped to a dict since the `ChatModel`is not the returned dataclass.
-            return [
-                ChatTitleIdResponse.model_validate(
-                    {
-                        "id": chat[0],
-                        "title": chat[1],
-                        "updated_at": chat[2],
-                        "created_at": chat[3],
-                    }
-                )
-                for chat in all_chats
-            ]
+    def get_pinned_chat_title_id_list_by_user_id(
+        self, user_id: str
+    ) -> list[ChatTitleIdResponse]:
+        with get_db() as db:
+            query = (
+                db.query(Chat)
+                .filter_by(user_id=user_id, pinned=True, archived=False)
+                .order_by(Chat.updated_at.desc())
+            )
+            return self._get_chat_title_id_list(query)
+
+    def get_archived_chat_title_id_list_by_user_id(
+        self, user_id: str
+    ) -> list[ChatTitleIdResponse]:
+        with get_db() as db:
+            query = (
+                db.query(Chat)
+                .filter_by(user_id=user_id, archived=True)
+                .order_by(Chat.updated_at.desc())
+            )
+            return self._get_chat_title_id_list(query)
+
+    def get_chat_title_id_list_by_folder_id_and_user_id(
+        self, folder_id: str, user_id: str
+    ) -> list[ChatTitleIdResponse]:
+        with get_db() as db:
+            query = db.query(Chat).filter_by(folder_id=folder_id, user_id=user_id)
+            query = query.filter(or_(Chat.pinned == False, Chat.pinned == None))
+            query = query.filter_by(archived=False)
+
+            query = query.order_by(Chat.updated_at.desc())
+            return self._get_chat_title_id_list(query)
 
     def get_chat_list_by_chat_ids(
         self, chat_ids: list[str], skip: int = 0, limit: int = 50
@@ -510,6 +562,57 @@ class ChatTable:
             )
             return [ChatModel.model_validate(chat) for chat in all_chats]
 
+    def _iter_chat_record_pages(
+        self, filters: tuple = (), page_size: int = 50
+    ) -> Iterator[list[Chat]]:
+        """
+        Yield the chats matching `filters` in pages, newest first.
+
+        Pages are fetched with keyset pagination, each in its own session, so
+        walking every chat of a user neither holds a connection nor loads all
+        rows at once.
+        """
+        last = None
+        while True:
+            with get_db() as db:
+                query = db.query(Chat).filter(*filters)
+                if last is not None:
+                    query = query.filter(
+                        or_(
+                            Chat.updated_at < last.updated_at,
+                            and_(Chat.updated_at == last.updated_at, Chat.id < last.id),
+                        )
+                    )
+
+                chat_records = (
+                    query.order_by(Chat.updated_at.desc(), Chat.id.desc())
+                    .limit(page_size)
+                    .all()
+                )
+
+            if not chat_records:
+                return
+
+            yield chat_records
+
+            if len(chat_records) < page_size:
+                return
+            last = chat_records[-1]
+
+    def iter_chats(self, page_size: int = 50) -> Iterator[ChatModel]:
+        for chat_records in self._iter_chat_record_pages(page_size=page_size):
+            for chat in chat_records:
+                yield ChatModel.model_validate(chat)
+
+    def iter_chats_by_user_id(
+        self, user_id: str, page_size: int = 50
+    ) -> Iterator[ChatModel]:
+        for chat_records in self._iter_chat_record_pages(
+            (Chat.user_id == user_id,), page_size
+        ):
+            for chat in chat_records:
+                yield ChatModel.model_validate(chat)
+
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
             all_chats = (
@@ -537,6 +640,66 @@ class ChatTable:
             )
             return [ChatModel.model_validate(chat) for chat in all_chats]
 
+    def _parse_search_text(self, search_text: str) -> tuple[str, list[str]]:
+        """Split a search query into its text and the ids of its `tag:` filters."""
+        search_text_words = search_text.split(" ")
+
+        # search_text might contain 'tag:tag_name' format so we need to extract the tag_name, split the search_text and remove the tags
+        tag_ids = [
+            word.replace("tag:", "").replace(" ", "_").lower()
+            for word in search_text_words
+            if word.startswith("tag:")
+        ]
+
+        search_text_words = [
+            word for word in search_text_words if not word.startswith("tag:")
+        ]
+
+        return " ".join(search_text_words), tag_ids
+
+    def _filter_by_tag_ids(self, query, dialect_name: str, tag_ids: list[str]):
+        """Restrict a chat query to chats with all `tag_ids`, or no tags for "none"."""
+        if dialect_name == "sqlite":
+            tags_table = "json_each(Chat.meta, '$.tags') AS tag"
+            tag_value = "tag.value"
+        elif dialect_name == "postgresql":
+            tags_table = "json_array_elements_text(Chat.meta->'tags') AS tag"
+            tag_value = "tag"
+        else:
+            raise NotImplementedError(f"Unsupported dialect: {dialect_name}")
+
+        # Check if there are any tags to filter, it should have all the tags
+        if "none" in tag_ids:
+            query = query.filter(
+                text(
+                    f"""
+                    NOT EXISTS (
+                        SELECT 1
+                        FROM {tags_table}
+                    )
+                    """
+                )
+            )
+        elif tag_ids:
+            query = query.filter(
+                and_(
+                    *[
+                        text(
+                            f"""
+                            EXISTS (
+                                SELECT 1
+                                FROM {tags_table}
+                                WHERE {tag_value} = :tag_id_{tag_idx}
+                            )
+                            """
+                        ).params(**{f"tag_id_{tag_idx}": tag_id})
+                        for tag_idx, tag_id in enumerate(tag_ids)
+                    ]
+                )
+            )
+
+        return query
+
     def get_chats_by_user_id_and_search_text(
         self,
         user_id: str,
@@ -553,20 +716,7 @@ class ChatTable:
         if not search_text:
             return self.get_chat_list_by_user_id(user_id, include_archived, skip, limit)
 
-        search_text_words = search_text.split(" ")
-
-        # search_text might contain 'tag:tag_name' format so we need to extract the tag_name, split the search_text and remove the tags
-        tag_ids = [
-            word.replace("tag:", "").replace(" ", "_").lower()
-            for word in search_text_words
-            if word.startswith("tag:")
-        ]
-
-        search_text_words = [
-            word for word in search_text_words if not word.startswith("tag:")
-        ]
-
-        search_text = " ".join(search_text_words)
+        search_text, tag_ids = self._parse_search_text(search_text)
 
         with get_db() as db:
             query = db.query(Chat).filter(Chat.user_id == user_id)
@@ -597,36 +747,6 @@ class ChatTable:
                     ).params(search_text=search_text)
                 )
 
-                # Check if there are any tags to filter, it should have all the tags
-                if "none" in tag_ids:
-                    query = query.filter(
-                        text(
-                            """
-                            NOT EXISTS (
-                                SELECT 1
-                                FROM json_each(Chat.meta, '$.tags') AS tag
-                            )
-                            """
-                        )
-                    )
-                elif tag_ids:
-                    query = query.filter(
-                        and_(
-                            *[
-                                text(
-                                    f"""
-                                    EXISTS (
-                                        SELECT 1
-                                        FROM json_each(Chat.meta, '$.tags') AS tag
-                                        WHERE tag.value = :tag_id_{tag_idx}
-                                    )
-                                    """
-                                ).params(**{f"tag_id_{tag_idx}": tag_id})
-                                for tag_idx, tag_id in enumerate(tag_ids)
-                            ]
-                        )
-                    )
-
             elif dialect_name == "postgresql":
                 # PostgreSQL relies on proper JSON query for search
                 query = query.filter(
@@ -646,40 +766,13 @@ class ChatTable:
                     ).params(search_text=search_text)
                 )
 
-                # Check if there are any tags to filter, it should have all the tags
-                if "none" in tag_ids:
-                    query = query.filter(
-                        text(
-                            """
-                            NOT EXISTS (
-                                SELECT 1
-                                FROM json_array_elements_text(Chat.meta->'tags') AS tag
-                            )
-                            """
-                        )
-                    )
-                elif tag_ids:
-                    query = query.filter(
-                        and_(
-                            *[
-                                text(
-                                    f"""
-                                    EXISTS (
-                                        SELECT 1
-                                        FROM json_array_elements_text(Chat.meta->'tags') AS tag
-                                        WHERE tag = :tag_id_{tag_idx}
-                                    )
-                                    """
-                                ).params(**{f"tag_id_{tag_idx}": tag_id})
-                                for tag_idx, tag_id in enumerate(tag_ids)
-                            ]
-                        )
-                    )
             else:
                 raise NotImplementedError(
                     f"Unsupported dialect: {db.bind.dialect.name}"
                 )
 
+            query = self._filter_by_tag_ids(query, dialect_name, tag_ids)
+
             # Perform pagination at the SQL level
             all_chats = query.offset(skip).limit(limit).all()
 
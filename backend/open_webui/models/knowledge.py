@@ -14,7 +14,7 @@ from open_webui.models.users import Users, UserResponse
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import has_access_many
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -149,9 +149,18 @@ class KnowledgeTable:
         knowledge_bases = self.get_knowledge_bases()
         return [
             knowledge_base
-            for knowledge_base in knowledge_bases
-            if knowledge_base.user_id == user_id
-            or has_access(user_id, permission, knowledge_base.access_control)
+            for knowledge_base, access in zip(
+                knowledge_bases,
+                has_access_many(
+                    user_id,
+                    permission,
+                    [
+                        knowledge_base.access_control
+                        for knowledge_base in knowledge_bases
+                    ],
+                ),
+            )
+            if knowledge_base.user_id == user_id or access
         ]
 
     def get_knowledge_by_id(self, id: str) -> Optional[KnowledgeModel]:
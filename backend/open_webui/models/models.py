@@ -15,7 +15,7 @@ from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy import BigInteger, Column, Text, JSON, Boolean
 
 
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import has_access_many
 
 
 log = logging.getLogger(__name__)
@@ -201,9 +201,15 @@ class ModelsTable:
         models = self.get_models()
         return [
             model
-            for model in models
-            if model.user_id == user_id
-            or has_access(user_id, permission, model.access_control)
+            for model, access in zip(
+                models,
+                has_access_many(
+                    user_id,
+                    permission,
+                    [model.access_control for model in models],
+                ),
+            )
+            if model.user_id == user_id or access
         ]
 
     def get_model_by_id(self, id: str) -> Optional[ModelModel]:
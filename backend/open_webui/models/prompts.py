@@ -7,7 +7,7 @@ from open_webui.models.users import Users, UserResponse
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON
 
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import has_access_many
 
 ####################
 # Prompts DB Schema
@@ -125,9 +125,15 @@ class PromptsTable:
 
         return [
             prompt
-            for prompt in prompts
-            if prompt.user_id == user_id
-            or has_access(user_id, permission, prompt.access_control)
+            for prompt, access in zip(
+                prompts,
+                has_access_many(
+                    user_id,
+                    permission,
+                    [prompt.access_control for prompt in prompts],
+                ),
+            )
+            if prompt.user_id == user_id or access
         ]
 
     def update_prompt_by_command(
@@ -68,6 +68,23 @@ class UserDataKeysTable:
         except Exception:
             return None
 
+    def get_user_data_keys_by_user_ids(
+        self, user_ids: list[str]
+    ) -> list[UserDataKeyModel]:
+        try:
+            with get_db() as db:
+                user_data_keys = (
+                    db.query(UserDataKey)
+                    .filter(UserDataKey.user_id.in_(user_ids))
+                    .all()
+                )
+                return [
+                    UserDataKeyModel.model_validate(user_data_key)
+                    for user_data_key in user_data_keys
+                ]
+        except Exception:
+            return []
+
     def update_user_data_key_by_user_id(
         self, user_id: str, encrypted_data_key: str
     ) -> Optional[UserDataKeyModel]:
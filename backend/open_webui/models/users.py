@@ -2,11 +2,12 @@ import logging
 import time
 from typing import Optional
 
+from open_webui.env import USER_CACHE_TTL
 from open_webui.internal.db import Base, JSONField, get_db
 from open_webui.models.chats import Chats
 from open_webui.models.groups import Groups
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, or_
+from sqlalchemy import BigInteger, Column, String, Text, case, or_
 
 log = logging.getLogger(__name__)
 
@@ -95,6 +96,12 @@ class UserUpdateForm(BaseModel):
 
 
 class UsersTable:
+    def __init__(self, cache_ttl: float = USER_CACHE_TTL):
+        self.cache_ttl = cache_ttl
+
+        # id -> (expires_at, user)
+        self._user_cache: dict[str, tuple[float, UserModel]] = {}
+
     def insert_new_user(
         self,
         id: str,
@@ -149,6 +156,31 @@ class UsersTable:
         except Exception:
             return None
 
+    def get_user_by_id_cached(self, id: str) -> Optional[UserModel]:
+        """
+        `get_user_by_id` served from a short-lived per-process cache, for lookups on
+        every request. Entries are dropped when the user is updated through this
+        table; changes made by other workers show up after `cache_ttl` seconds.
+        """
+        if self.cache_ttl <= 0:
+            return self.get_user_by_id(id)
+
+        now = time.monotonic()
+        cached = self._user_cache.get(id)
+        if cached is not None and cached[0] > now:
+            return cached[1].model_copy()
+
+        user = self.get_user_by_id(id)
+        if user is not None:
+            self._user_cache[id] = (now + self.cache_ttl, user)
+        else:
+            self._user_cache.pop(id, None)
+
+        return user.model_copy() if user is not None else None
+
+    def _invalidate_cached_user(self, id: str) -> None:
+        self._user_cache.pop(id, None)
+
     def get_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
@@ -194,6 +226,16 @@ class UsersTable:
             users = db.query(User).filter(User.id.in_(user_ids)).all()
             return [UserModel.model_validate(user) for user in users]
 
+    def get_active_user_ids(self, since: int) -> list[str]:
+        with get_db() as db:
+            users = (
+                db.query(User.id)
+                .filter(User.last_active_at >= since)
+                .order_by(User.last_active_at.desc())
+                .all()
+            )
+            return [user.id for user in users]
+
     def get_num_users(self) -> Optional[int]:
         with get_db() as db:
             return db.query(User).count()
@@ -227,6 +269,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"role": role})
                 db.commit()
+                self._invalidate_cached_user(id)
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
         except Exception:
@@ -241,6 +284,7 @@ class UsersTable:
                     {"profile_image_url": profile_image_url}
                 )
                 db.commit()
+                self._invalidate_cached_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -260,6 +304,25 @@ class UsersTable:
         except Exception:
             return None
 
+    def update_users_last_active_by_ids(self, last_active: dict[str, int]) -> bool:
+        """Write the `last_active_at` of several users ({id: timestamp}) at once."""
+        if not last_active:
+            return True
+
+        try:
+            with get_db() as db:
+                db.query(User).filter(User.id.in_(list(last_active.keys()))).update(
+                    {"last_active_at": case(last_active, value=User.id)},
+                    synchronize_session=False,
+                )
+                db.commit()
+                return True
+        except Exception as e:
+            log.exception(
+                f"Error updating last active of {len(last_active)} users: {e}"
+            )
+            return False
+
     def update_user_oauth_sub_by_id(
         self, id: str, oauth_sub: str
     ) -> Optional[UserModel]:
@@ -267,6 +330,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"oauth_sub": oauth_sub})
                 db.commit()
+                self._invalidate_cached_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -278,6 +342,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update(updated)
                 db.commit()
+                self._invalidate_cached_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -297,6 +362,7 @@ class UsersTable:
 
                 db.query(User).filter_by(id=id).update({"settings": user_settings})
                 db.commit()
+                self._invalidate_cached_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -315,6 +381,7 @@ class UsersTable:
                     # Delete User
                     db.query(User).filter_by(id=id).delete()
                     db.commit()
+                    self._invalidate_cached_user(id)
 
                 return True
             else:
@@ -327,6 +394,7 @@ class UsersTable:
             with get_db() as db:
                 result = db.query(User).filter_by(id=id).update({"api_key": api_key})
                 db.commit()
+                self._invalidate_cached_user(id)
                 return True if result == 1 else False
         except Exception:
             return False
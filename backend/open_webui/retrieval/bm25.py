@@ -0,0 +1,446 @@
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows, the thread lock is the only lock
+    fcntl = None
+
+from open_webui.env import (
+    RAG_BM25_INDEX_CACHE_SIZE,
+    RAG_BM25_INDEX_DIR,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+def tokenize(text: str) -> list[str]:
+    # Same tokens as the default preprocessing of langchain's BM25Retriever
+    return text.split()
+
+
+class BM25Index:
+    """
+    Inverted index of a collection scored with Okapi BM25, using the same
+    formula and parameters as `rank_bm25.BM25Okapi`.
+
+    Only the documents containing a query term are scored, documents can be
+    added and removed without rebuilding the index.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        # id -> (text, metadata)
+        self.docs: dict[str, tuple[str, dict]] = {}
+        # term -> {id: term frequency}, the document frequency is its length
+        self.postings: dict[str, dict[str, int]] = {}
+        self.doc_lengths: dict[str, int] = {}
+        self.total_length = 0
+
+        self._average_idf = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, id: str, text: str, metadata: Optional[dict] = None):
+        if id in self.docs:
+            self.remove(id)
+
+        tokens = tokenize(text)
+        self.docs[id] = (text, metadata or {})
+        self.doc_lengths[id] = len(tokens)
+        self.total_length += len(tokens)
+
+        for term, count in Counter(tokens).items():
+            self.postings.setdefault(term, {})[id] = count
+
+        self._average_idf = None
+
+    def remove(self, id: str) -> bool:
+        doc = self.docs.pop(id, None)
+        if doc is None:
+            return False
+
+        for term in set(tokenize(doc[0])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(id, None)
+                if not postings:
+                    del self.postings[term]
+
+        self.total_length -= self.doc_lengths.pop(id)
+        self._average_idf = None
+        return True
+
+    def remove_where(self, filter: dict) -> list[str]:
+        """Remove the documents whose metadata has all the values of `filter`."""
+        ids = [
+            id
+            for id, (_, metadata) in self.docs.items()
+            if all(metadata.get(key) == value for key, value in filter.items())
+        ]
+        for id in ids:
+            self.remove(id)
+        return ids
+
+    def _get_idf(self, document_frequency: int) -> float:
+        return math.log(len(self.docs) - document_frequency + 0.5) - math.log(
+            document_frequency + 0.5
+        )
+
+    def search(self, query: str, k: int) -> list[tuple[float, str, str, dict]]:
+        """Return the `k` best (score, id, text, metadata) for `query`."""
+        if not self.docs:
+            return []
+
+        if self._average_idf is None:
+            self._average_idf = sum(
+                self._get_idf(len(postings)) for postings in self.postings.values()
+            ) / max(len(self.postings), 1)
+
+        # Terms in more than half of the documents get a small positive weight
+        min_idf = self.epsilon * self._average_idf
+        average_length = self.total_length / len(self.docs)
+
+        scores: dict[str, float] = {}
+        for term in tokenize(query):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            idf = self._get_idf(len(postings))
+            if idf < 0:
+                idf = min_idf
+
+            for id, frequency in postings.items():
+                length_norm = (
+                    1 - self.b + self.b * self.doc_lengths[id] / average_length
+                )
+                scores[id] = scores.get(id, 0.0) + idf * (
+                    frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                )
+
+        return [
+            (score, id, *self.docs[id])
+            for id, score in heapq.nlargest(k, scores.items(), key=itemgetter(1))
+        ]
+
+
+class _LoadedIndex:
+    def __init__(self):
+        self.index = BM25Index()
+        self.lock = threading.Lock()
+
+        # Snapshot and position in the log file the index was read up to
+        self.snapshot_id = None
+        self.inode = None
+        self.offset = 0
+        self.snapshot_size = 0
+
+
+class BM25IndexStore:
+    """
+    BM25 indexes of the vector DB collections used by hybrid search.
+
+    Each collection has an append-only JSON lines log in `directory`, starting
+    with a snapshot of the documents followed by the documents added or removed
+    since:
+
+        {"snapshot": id}
+        {"add": [[id, text, metadata], ...]}
+        {"delete": [id, ...]}
+        {"delete_where": {key: value}}
+
+    An index is built from the vector DB the first time the collection is
+    searched, changes are only logged for collections that have an index.
+    The collection is fetched without holding the lock of its log, the changes
+    made meanwhile go to a pending log, starting with `{"build": id}`, which is
+    replayed on the new snapshot. Dropping the index discards the builds in
+    progress.
+
+    Indexes are loaded lazily, at most `maxsize` stay in memory, and catch up
+    with the log when it grew, whichever worker wrote to it. Once the changes
+    outgrow the snapshot the log is rewritten as a single snapshot.
+    """
+
+    def __init__(self, directory: Path, maxsize: int):
+        self.directory = Path(directory)
+        self.maxsize = maxsize
+
+        self._indexes: OrderedDict[str, _LoadedIndex] = OrderedDict()
+        self._lock = threading.Lock()
+        self._path_locks: dict[Path, threading.Lock] = {}
+
+    def _get_path(self, collection_name: str) -> Path:
+        if re.fullmatch(r"[\w-]+", collection_name):
+            name = collection_name
+        else:
+            name = hashlib.sha256(collection_name.encode()).hexdigest()
+        return self.directory / f"{name}.jsonl"
+
+    def _get_pending_path(self, path: Path) -> Path:
+        return path.with_suffix(".pending")
+
+    @contextmanager
+    def _file_lock(self, path: Path):
+        """Serialize the writes of a log across threads and worker processes."""
+        with self._lock:
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+
+        with path_lock:
+            if fcntl is None:
+                yield
+                return
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(f"{path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, collection_name: str, entry: dict):
+        path = self._get_path(collection_name)
+        with self._file_lock(path):
+            # Collections without an index get one built from the vector DB
+            for log_path in (path, self._get_pending_path(path)):
+                if log_path.exists():
+                    with open(log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry) + "\n")
+                    break
+
+    def _read(self, path: Path, loaded: _LoadedIndex):
+        with open(path, "rb") as f:
+            header = f.readline()
+            snapshot_id = json.loads(header)["snapshot"]
+
+            if loaded.snapshot_id != snapshot_id:
+                # Rewritten since, start over
+                loaded.index = BM25Index()
+                loaded.snapshot_id = snapshot_id
+                loaded.offset = len(header)
+                loaded.snapshot_size = 0
+
+            loaded.inode = os.fstat(f.fileno()).st_ino
+            f.seek(loaded.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+
+                loaded.offset += len(line)
+                if not loaded.snapshot_size:
+                    loaded.snapshot_size = loaded.offset
+
+                entry = json.loads(line)
+                for id, text, metadata in entry.get("add", []):
+                    loaded.index.add(id, text, metadata)
+                for id in entry.get("delete", []):
+                    loaded.index.remove(id)
+                if "delete_where" in entry:
+                    loaded.index.remove_where(entry["delete_where"])
+
+    def _write_snapshot(self, path: Path, docs: list, entries: list = ()) -> str:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        snapshot_id = str(uuid.uuid4())
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"snapshot": snapshot_id}) + "\n")
+            f.write(json.dumps({"add": docs}) + "\n")
+            f.writelines(entries)
+        os.replace(tmp_path, path)
+
+        return snapshot_id
+
+    def _read_pending(self, path: Path) -> tuple[Optional[str], list[str]]:
+        """Return the build id and the entries of the pending log of `path`."""
+        try:
+            with open(self._get_pending_path(path), encoding="utf-8") as f:
+                build_id = json.loads(f.readline())["build"]
+                return build_id, [line for line in f if line.endswith("\n")]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None, []
+
+    def _build(self, collection_name: str, path: Path, fetch: Callable) -> bool:
+        """Build the index of a collection, False if it does not exist."""
+        pending_path = self._get_pending_path(path)
+
+        while True:
+            with self._file_lock(path):
+                if path.exists():
+                    return True
+
+                # Concurrent builds of the collection share the pending log
+                build_id, _ = self._read_pending(path)
+                if build_id is None:
+                    build_id = str(uuid.uuid4())
+                    pending_path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(pending_path, "w", encoding="utf-8") as f:
+                        f.write(json.dumps({"build": build_id}) + "\n")
+
+            result = None
+            try:
+                result = fetch()
+            finally:
+                if result is None:
+                    # Nothing to build, stop logging the changes
+                    with self._file_lock(path):
+                        if self._read_pending(path)[0] == build_id:
+                            pending_path.unlink(missing_ok=True)
+
+            if result is None:
+                return False
+
+            docs = [
+                [id, text, metadata]
+                for id, text, metadata in zip(
+                    result.ids[0], result.documents[0], result.metadatas[0]
+                )
+            ]
+
+            with self._file_lock(path):
+                if path.exists():
+                    return True
+
+                pending_id, entries = self._read_pending(path)
+                if pending_id == build_id:
+                    log.info(f"Building BM25 index of collection {collection_name}")
+                    self._write_snapshot(path, docs, entries)
+                    pending_path.unlink(missing_ok=True)
+                    return True
+
+            # Dropped while it was fetched, the documents may be outdated
+
+    def _is_current(self, path: Path, loaded: _LoadedIndex) -> bool:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return False
+        return loaded.inode == stat.st_ino and loaded.offset == stat.st_size
+
+    def _get(self, collection_name: str, fetch: Callable) -> Optional[_LoadedIndex]:
+        path = self._get_path(collection_name)
+
+        with self._lock:
+            loaded = self._indexes.get(collection_name)
+            if loaded is not None:
+                self._indexes.move_to_end(collection_name)
+
+        if loaded is not None and self._is_current(path, loaded):
+            return loaded
+
+        while True:
+            if not path.exists() and not self._build(collection_name, path, fetch):
+                return None
+
+            with self._file_lock(path):
+                if not path.exists():
+                    # Dropped since it was built
+                    continue
+
+                loaded = loaded or _LoadedIndex()
+                with loaded.lock:
+                    self._read(path, loaded)
+
+                    # Compact once the logged changes are larger than the snapshot
+                    if loaded.offset > 2 * loaded.snapshot_size:
+                        loaded.snapshot_id = self._write_snapshot(
+                            path,
+                            [
+                                [id, text, metadata]
+                                for id, (text, metadata) in loaded.index.docs.items()
+                            ],
+                        )
+
+                        stat = path.stat()
+                        loaded.inode = stat.st_ino
+                        loaded.offset = loaded.snapshot_size = stat.st_size
+                break
+
+        with self._lock:
+            self._indexes[collection_name] = loaded
+            self._indexes.move_to_end(collection_name)
+            while len(self._indexes) > self.maxsize:
+                self._indexes.popitem(last=False)
+
+        return loaded
+
+    def load(self, collection_name: str, fetch: Callable) -> bool:
+        """Load or build the index of a collection, False if it does not exist."""
+        return self._get(collection_name, fetch) is not None
+
+    def search(
+        self, collection_name: str, query: str, k: int, fetch: Callable
+    ) -> Optional[list[tuple[float, str, str, dict]]]:
+        """
+        Search the index of a collection, `fetch` returns the `GetResult` of
+        the whole collection if the index has to be built. Returns None when the
+        collection does not exist.
+        """
+        loaded = self._get(collection_name, fetch)
+        if loaded is None:
+            return None
+
+        with loaded.lock:
+            return loaded.index.search(query, k)
+
+    def add(self, collection_name: str, items: list[dict]):
+        self._append(
+            collection_name,
+            {"add": [[item["id"], item["text"], item["metadata"]] for item in items]},
+        )
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        if ids:
+            self._append(collection_name, {"delete": ids})
+        elif filter:
+            self._append(collection_name, {"delete_where": filter})
+
+    def drop(self, collection_name: str):
+        path = self._get_path(collection_name)
+        with self._file_lock(path):
+            path.unlink(missing_ok=True)
+            self._get_pending_path(path).unlink(missing_ok=True)
+
+        with self._lock:
+            self._indexes.pop(collection_name, None)
+
+    def reset(self):
+        paths = {
+            path.with_suffix(".jsonl") for path in self.directory.glob("*.pending")
+        }
+        for path in paths | set(self.directory.glob("*.jsonl")):
+            with self._file_lock(path):
+                path.unlink(missing_ok=True)
+                self._get_pending_path(path).unlink(missing_ok=True)
+
+        with self._lock:
+            self._indexes.clear()
+
+
+BM25_INDEXES = BM25IndexStore(
+    directory=RAG_BM25_INDEX_DIR, maxsize=RAG_BM25_INDEX_CACHE_SIZE
+)
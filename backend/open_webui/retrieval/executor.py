@@ -0,0 +1,127 @@
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, TypeVar
+
+from open_webui.env import (
+    RAG_RETRIEVAL_MAX_PARALLELISM,
+    RAG_RETRIEVAL_WORKERS,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class RetrievalExecutor:
+    """
+    Thread pool shared by all retrieval requests.
+
+    `map` runs the items of one request with at most `max_parallelism` threads,
+    the calling thread being one of them. The caller keeps taking items until
+    none are left and only waits for the ones already started by the pool, so
+    nested calls (a request running on the pool that maps its collections) never
+    wait on a saturated pool.
+
+    `stage` times the steps of the retrieval pipeline, totals are in `get_stats`.
+    """
+
+    def __init__(self, max_workers: int, max_parallelism: int):
+        self.max_workers = max_workers
+        self.max_parallelism = max_parallelism
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "tasks": 0,
+            "pooled_tasks": 0,
+            "active_tasks": 0,
+            "stages": {},
+        }
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="retrieval",
+                )
+            return self._pool
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T]) -> list[R]:
+        items = list(items)
+        results = [None] * len(items)
+        indexes = itertools.count()
+
+        def run(pooled: bool):
+            with self._lock:
+                self._stats["active_tasks"] += 1
+            try:
+                while (index := next(indexes)) < len(items):
+                    results[index] = fn(items[index])
+
+                    with self._lock:
+                        self._stats["tasks"] += 1
+                        if pooled:
+                            self._stats["pooled_tasks"] += 1
+            finally:
+                with self._lock:
+                    self._stats["active_tasks"] -= 1
+
+        futures = [
+            self.pool.submit(run, True)
+            for _ in range(min(self.max_parallelism, len(items)) - 1)
+        ]
+
+        try:
+            run(False)
+        finally:
+            # Helpers still queued have nothing left to do
+            futures = [future for future in futures if not future.cancel()]
+
+        for future in futures:
+            future.result()
+
+        return results
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            log.debug(f"retrieval stage {name} took {elapsed * 1000:.1f}ms")
+
+            with self._lock:
+                stage = self._stats["stages"].setdefault(
+                    name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+                )
+                stage["count"] += 1
+                stage["total_seconds"] += elapsed
+                stage["max_seconds"] = max(stage["max_seconds"], elapsed)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_parallelism": self.max_parallelism,
+                "queued": self._pool._work_queue.qsize() if self._pool else 0,
+                **self._stats,
+                "stages": {
+                    name: dict(stage) for name, stage in self._stats["stages"].items()
+                },
+            }
+
+
+RETRIEVAL_EXECUTOR = RetrievalExecutor(
+    max_workers=RAG_RETRIEVAL_WORKERS,
+    max_parallelism=RAG_RETRIEVAL_MAX_PARALLELISM,
+)
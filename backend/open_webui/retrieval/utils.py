@@ -1,13 +1,15 @@
 import hashlib
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from array import array
+from collections import OrderedDict
 from typing import Optional, Union
 
 import requests
 from huggingface_hub import snapshot_download
 from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 from open_webui.config import (
     RAG_EMBEDDING_CONTENT_PREFIX,
@@ -18,12 +20,15 @@ from open_webui.config import (
 from open_webui.env import (
     ENABLE_FORWARD_USER_INFO_HEADERS,
     OFFLINE_MODE,
+    RAG_EMBEDDING_CACHE_SIZE,
+    RAG_EMBEDDING_CACHE_TTL,
     SRC_LOG_LEVELS,
 )
 from open_webui.models.files import Files
 from open_webui.models.users import UserModel
+from open_webui.retrieval.bm25 import BM25_INDEXES
+from open_webui.retrieval.executor import RETRIEVAL_EXECUTOR
 from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
-from open_webui.retrieval.vector.main import GetResult
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
@@ -67,6 +72,30 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+class BM25IndexRetriever(BaseRetriever):
+    collection_name: Any
+    top_k: int
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        results = BM25_INDEXES.search(
+            self.collection_name,
+            query,
+            self.top_k,
+            fetch=lambda: VECTOR_DB_CLIENT.get(collection_name=self.collection_name),
+        )
+
+        return [
+            # The compressor adds the score to the metadata, keep the index's own
+            Document(metadata=dict(metadata), page_content=text)
+            for _, _, text, metadata in results or []
+        ]
+
+
 def query_doc(
     collection_name: str, query_embedding: list[float], k: int, user: UserModel = None
 ):
@@ -107,21 +136,17 @@ def get_doc(collection_name: str, user: UserModel = None):
 
 def query_doc_with_hybrid_search(
     collection_name: str,
-    collection_result: GetResult,
     query: str,
     embedding_function,
     k: int,
     reranking_function,
     k_reranker: int,
     r: float,
+    user: UserModel = None,
 ) -> dict:
     try:
         log.debug(f"query_doc_with_hybrid_search:doc {collection_name}")
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=collection_result.documents[0],
-            metadatas=collection_result.metadatas[0],
-        )
-        bm25_retriever.k = k
+        bm25_retriever = BM25IndexRetriever(collection_name=collection_name, top_k=k)
 
         vector_search_retriever = VectorSearchRetriever(
             collection_name=collection_name,
@@ -256,26 +281,43 @@ def query_collection(
     embedding_function,
     k: int,
 ) -> dict:
-    results = []
-    for query in queries:
-        log.debug(f"query_collection:query {query}")
-        query_embedding = embedding_function(query, prefix=RAG_EMBEDDING_QUERY_PREFIX)
-        for collection_name in collection_names:
-            if collection_name:
-                try:
-                    result = query_doc(
-                        collection_name=collection_name,
-                        k=k,
-                        query_embedding=query_embedding,
-                    )
-                    if result is not None:
-                        results.append(result.model_dump())
-                except Exception as e:
-                    log.exception(f"Error when querying the collection: {e}")
-            else:
-                pass
+    collection_names = [name for name in collection_names if name]
+
+    log.debug(f"query_collection:queries {queries}")
 
-    return merge_and_sort_query_results(results, k=k)
+    # All queries are embedded in a single batch
+    with RETRIEVAL_EXECUTOR.stage("embedding"):
+        query_embeddings = embedding_function(
+            list(queries), prefix=RAG_EMBEDDING_QUERY_PREFIX
+        )
+
+    def process_query(task):
+        collection_name, query_embedding = task
+        try:
+            result = query_doc(
+                collection_name=collection_name,
+                k=k,
+                query_embedding=query_embedding,
+            )
+            return result.model_dump() if result is not None else None
+        except Exception as e:
+            log.exception(f"Error when querying the collection: {e}")
+            return None
+
+    with RETRIEVAL_EXECUTOR.stage("search"):
+        results = RETRIEVAL_EXECUTOR.map(
+            process_query,
+            [
+                (collection_name, query_embedding)
+                for query_embedding in query_embeddings
+                for collection_name in collection_names
+            ],
+        )
+
+    with RETRIEVAL_EXECUTOR.stage("merge"):
+        return merge_and_sort_query_results(
+            [result for result in results if result is not None], k=k
+        )
 
 
 def query_collection_with_hybrid_search(
@@ -289,30 +331,45 @@ def query_collection_with_hybrid_search(
 ) -> dict:
     results = []
     error = False
-    # Fetch collection data once per collection sequentially
-    # Avoid fetching the same data multiple times later
-    collection_results = {}
-    for collection_name in collection_names:
+
+    # Load the BM25 index of each collection, the collection is only fetched from
+    # the vector DB the first time to build it
+    def load_index(collection_name):
         try:
             log.debug(
-                f"query_collection_with_hybrid_search:VECTOR_DB_CLIENT.get:collection {collection_name}"
+                f"query_collection_with_hybrid_search:BM25_INDEXES.load:collection {collection_name}"
             )
-            collection_results[collection_name] = VECTOR_DB_CLIENT.get(
-                collection_name=collection_name
+            return BM25_INDEXES.load(
+                collection_name,
+                fetch=lambda: VECTOR_DB_CLIENT.get(collection_name=collection_name),
             )
         except Exception as e:
-            log.exception(f"Failed to fetch collection {collection_name}: {e}")
-            collection_results[collection_name] = None
+            log.exception(f"Failed to load collection {collection_name}: {e}")
+            return False
+
+    collection_names = list(collection_names)
+    with RETRIEVAL_EXECUTOR.stage("index"):
+        loaded_collections = dict(
+            zip(
+                collection_names,
+                RETRIEVAL_EXECUTOR.map(load_index, collection_names),
+            )
+        )
 
     log.info(
         f"Starting hybrid search for {len(queries)} queries in {len(collection_names)} collections..."
     )
 
-    def process_query(collection_name, query):
+    # Embed all queries in a single batch, the searches below get them from the
+    # embedding cache
+    with RETRIEVAL_EXECUTOR.stage("embedding"):
+        embedding_function(list(queries), RAG_EMBEDDING_QUERY_PREFIX)
+
+    def process_query(task):
+        collection_name, query = task
         try:
             result = query_doc_with_hybrid_search(
                 collection_name=collection_name,
-                collection_result=collection_results[collection_name],
                 query=query,
                 embedding_function=embedding_function,
                 k=k,
@@ -326,17 +383,13 @@ def query_collection_with_hybrid_search(
             return None, e
 
     # Prepare tasks for all collections and queries
-    # Avoid running any tasks for collections that failed to fetch data (have assigned None)
+    # Avoid running any tasks for collections that failed to load
     tasks = [
-        (cn, q)
-        for cn in collection_names
-        if collection_results[cn] is not None
-        for q in queries
+        (cn, q) for cn in collection_names if loaded_collections[cn] for q in queries
     ]
 
-    with ThreadPoolExecutor() as executor:
-        future_results = [executor.submit(process_query, cn, q) for cn, q in tasks]
-        task_results = [future.result() for future in future_results]
+    with RETRIEVAL_EXECUTOR.stage("hybrid_search"):
+        task_results = RETRIEVAL_EXECUTOR.map(process_query, tasks)
 
     for result, err in task_results:
         if err is not None:
@@ -349,7 +402,127 @@ def query_collection_with_hybrid_search(
             "Hybrid search failed for all collections. Using Non-hybrid search as fallback."
         )
 
-    return merge_and_sort_query_results(results, k=k)
+    with RETRIEVAL_EXECUTOR.stage("merge"):
+        return merge_and_sort_query_results(results, k=k)
+
+
+class EmbeddingCache:
+    """
+    LRU cache of embeddings keyed by (engine, model, endpoint, prefix, hash of
+    the text), entries expire `ttl` seconds after being computed. The endpoint
+    is the base url and a hash of the API key, so embeddings of different
+    servers or accounts serving a model of the same name are never mixed.
+
+    Embeddings are stored as arrays of doubles, a fraction of the memory of
+    lists of floats, and returned as lists.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._items: OrderedDict[tuple, tuple[float, array]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_endpoint(url: Optional[str], key: Optional[str]) -> tuple:
+        return (url or "", hashlib.sha256((key or "").encode("utf-8")).digest())
+
+    @staticmethod
+    def get_key(
+        engine: str,
+        model: str,
+        endpoint: tuple,
+        prefix: Optional[str],
+        text: str,
+    ) -> tuple:
+        return (
+            engine,
+            model,
+            endpoint,
+            prefix,
+            hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest(),
+        )
+
+    def get(self, key: tuple) -> Optional[list[float]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+
+            expires_at, embedding = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+
+            self._items.move_to_end(key)
+            return embedding.tolist()
+
+    def set(self, key: tuple, embedding: list[float]):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, array("d", embedding))
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def wrap(
+        self,
+        engine: str,
+        model: str,
+        func,
+        url: Optional[str] = None,
+        key: Optional[str] = None,
+    ):
+        """
+        Wrap an embedding function taking a text or a list of texts so that only
+        the texts missing from the cache are embedded, in a single call.
+        """
+        if self.maxsize <= 0:
+            return func
+
+        endpoint = self.get_endpoint(url, key)
+
+        def embed(query, prefix=None, user=None):
+            texts = query if isinstance(query, list) else [query]
+            keys = [
+                self.get_key(engine, model, endpoint, prefix, text) for text in texts
+            ]
+            embeddings = [self.get(key) for key in keys]
+
+            # text -> key, duplicated texts are only embedded once
+            missing = {
+                text: key
+                for text, key, embedding in zip(texts, keys, embeddings)
+                if embedding is None
+            }
+
+            if missing:
+                computed = func(list(missing.keys()), prefix=prefix, user=user)
+                if computed is None:
+                    return None
+
+                computed = dict(zip(missing.keys(), computed))
+                for text, key in missing.items():
+                    self.set(key, computed[text])
+
+                embeddings = [
+                    computed[text] if embedding is None else embedding
+                    for text, embedding in zip(texts, embeddings)
+                ]
+
+            return embeddings if isinstance(query, list) else embeddings[0]
+
+        return embed
+
+
+EMBEDDING_CACHE = EmbeddingCache(
+    maxsize=RAG_EMBEDDING_CACHE_SIZE, ttl=RAG_EMBEDDING_CACHE_TTL
+)
 
 
 def get_embedding_function(
@@ -359,13 +532,18 @@ def get_embedding_function(
     url,
     key,
     embedding_batch_size,
+    cache=True,
 ):
+    """
+    `cache=False` bypasses EMBEDDING_CACHE, for documents being ingested which
+    are embedded once and would only evict the query embeddings.
+    """
     if embedding_engine == "":
-        return lambda query, prefix=None, user=None: embedding_function.encode(
+        func = lambda query, prefix=None, user=None: embedding_function.encode(
             query, **({"prompt": prefix} if prefix else {})
         ).tolist()
     elif embedding_engine in ["ollama", "openai"]:
-        func = lambda query, prefix=None, user=None: generate_embeddings(
+        generate = lambda query, prefix=None, user=None: generate_embeddings(
             engine=embedding_engine,
             model=embedding_model,
             text=query,
@@ -390,12 +568,17 @@ def get_embedding_function(
             else:
                 return func(query, prefix, user)
 
-        return lambda query, prefix=None, user=None: generate_multiple(
-            query, prefix, user, func
+        func = lambda query, prefix=None, user=None: generate_multiple(
+            query, prefix, user, generate
         )
     else:
         raise ValueError(f"Unknown embedding engine: {embedding_engine}")
 
+    if not cache:
+        return func
+
+    return EMBEDDING_CACHE.wrap(embedding_engine, embedding_model, func, url, key)
+
 
 def get_sources_from_files(
     request,
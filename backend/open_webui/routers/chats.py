@@ -1,14 +1,16 @@
 import json
 import logging
-from typing import Optional
+from typing import Iterator, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from open_webui.config import ENABLE_ADMIN_CHAT_ACCESS, ENABLE_ADMIN_EXPORT
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.env import SRC_LOG_LEVELS
 from open_webui.models.chats import (
     ChatForm,
     ChatImportForm,
+    ChatModel,
     ChatResponse,
     Chats,
     ChatTitleIdResponse,
@@ -18,12 +20,30 @@ from open_webui.models.tags import TagModel, Tags
 from open_webui.socket.main import get_event_emitter
 from open_webui.utils.access_control import has_permission
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.chat_encryption_proxy import prefetch_chat_encryption_key
+from open_webui.utils.user_encryption import prefetch_user_encryption_key
 from pydantic import BaseModel
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
-router = APIRouter()
+
+async def load_chat_encryption_keys(request: Request, user=Depends(get_verified_user)):
+    """
+    Load the keys of the chat and user in the path, which are not necessarily the
+    requesting user's, before the synchronous chat table reads them.
+    """
+    # Shared chats are stored under their share id
+    chat_id = request.path_params.get("id") or request.path_params.get("share_id")
+    if chat_id:
+        await prefetch_chat_encryption_key(chat_id)
+
+    user_id = request.path_params.get("user_id")
+    if user_id:
+        await prefetch_user_encryption_key(user_id)
+
+
+router = APIRouter(dependencies=[Depends(load_chat_encryption_keys)])
 
 ############################
 # GetChatList
@@ -195,12 +215,9 @@ async def get_chats_by_folder_id(folder_id: str, user=Depends(get_verified_user)
 ############################
 
 
-@router.get("/pinned", response_model=list[ChatResponse])
+@router.get("/pinned", response_model=list[ChatTitleIdResponse])
 async def get_user_pinned_chats(user=Depends(get_verified_user)):
-    return [
-        ChatResponse(**chat.model_dump())
-        for chat in Chats.get_pinned_chats_by_user_id(user.id)
-    ]
+    return Chats.get_pinned_chat_title_id_list_by_user_id(user.id)
 
 
 ############################
@@ -208,12 +225,28 @@ async def get_user_pinned_chats(user=Depends(get_verified_user)):
 ############################
 
 
+def stream_chat_responses(chats: Iterator[ChatModel], ndjson: bool) -> Iterator[str]:
+    """Serialize chats one at a time, as NDJSON or as the items of a JSON array."""
+    if ndjson:
+        for chat in chats:
+            yield ChatResponse(**chat.model_dump()).model_dump_json() + "\n"
+        return
+
+    yield "["
+    for idx, chat in enumerate(chats):
+        yield ("," if idx else "") + ChatResponse(**chat.model_dump()).model_dump_json()
+    yield "]"
+
+
 @router.get("/all", response_model=list[ChatResponse])
-async def get_user_chats(user=Depends(get_verified_user)):
-    return [
-        ChatResponse(**chat.model_dump())
-        for chat in Chats.get_chats_by_user_id(user.id)
-    ]
+async def get_user_chats(request: Request, user=Depends(get_verified_user)):
+    # Chats are decrypted page by page while the response is sent, the sync
+    # iterator runs in a worker thread so the event loop is never blocked
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+    return StreamingResponse(
+        stream_chat_responses(Chats.iter_chats_by_user_id(user.id), ndjson),
+        media_type="application/x-ndjson" if ndjson else "application/json",
+    )
 
 
 ############################
@@ -269,7 +302,7 @@ async def get_all_user_chats_in_db(user=Depends(get_admin_user)):
 async def get_archived_session_user_chat_list(
     user=Depends(get_verified_user), skip: int = 0, limit: int = 50
 ):
-    return Chats.get_archived_chat_list_by_user_id(user.id, skip, limit)
+    return Chats.get_archived_chat_title_id_list_by_user_id(user.id)
 
 
 ############################
@@ -95,7 +95,12 @@ def upload_file(
         id = str(uuid.uuid4())
         name = filename
         filename = f"{id}_{filename}"
-        contents, file_path = Storage.upload_file(file.file, filename)
+        max_size = request.app.state.config.FILE_MAX_SIZE
+        uploaded = Storage.upload_file(
+            file.file,
+            filename,
+            max_size=max_size * 1024 * 1024 if max_size else None,
+        )
 
         file_item = Files.insert_new_file(
             user.id,
@@ -103,11 +108,11 @@ def upload_file(
                 **{
                     "id": id,
                     "filename": name,
-                    "path": file_path,
+                    "path": uploaded.path,
                     "meta": {
                         "name": name,
                         "content_type": file.content_type,
-                        "size": len(contents),
+                        "size": uploaded.size,
                         "data": file_metadata,
                     },
                 }
@@ -121,7 +126,7 @@ def upload_file(
                     "audio/ogg",
                     "audio/x-m4a",
                 ]:
-                    file_path = Storage.get_file(file_path)
+                    file_path = Storage.get_file(uploaded.path)
                     result = transcribe(request, file_path)
 
                     process_file(
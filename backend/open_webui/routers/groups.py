@@ -16,6 +16,7 @@ from open_webui.constants import ERROR_MESSAGES
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.models import MODEL_CATALOG
 from open_webui.env import SRC_LOG_LEVELS
 
 
@@ -93,6 +94,7 @@ async def update_group_by_id(
 
         group = Groups.update_group_by_id(id, form_data)
         if group:
+            MODEL_CATALOG.invalidate()
             return group
         else:
             raise HTTPException(
@@ -117,6 +119,7 @@ async def delete_group_by_id(id: str, user=Depends(get_admin_user)):
     try:
         result = Groups.delete_group_by_id(id)
         if result:
+            MODEL_CATALOG.invalidate()
             return result
         else:
             raise HTTPException(
@@ -5,6 +5,7 @@ from typing import Optional
 
 from open_webui.models.memories import Memories, MemoryModel
 from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
+from open_webui.retrieval.bm25 import BM25_INDEXES
 from open_webui.utils.auth import get_verified_user
 from open_webui.env import SRC_LOG_LEVELS
 
@@ -64,6 +65,7 @@ async def add_memory(
             }
         ],
     )
+    BM25_INDEXES.drop(f"user-memory-{user.id}")
 
     return memory
 
@@ -99,6 +101,7 @@ async def reset_memory_from_vector_db(
     request: Request, user=Depends(get_verified_user)
 ):
     VECTOR_DB_CLIENT.delete_collection(f"user-memory-{user.id}")
+    BM25_INDEXES.drop(f"user-memory-{user.id}")
 
     memories = Memories.get_memories_by_user_id(user.id)
     VECTOR_DB_CLIENT.upsert(
@@ -134,6 +137,7 @@ async def delete_memory_by_user_id(user=Depends(get_verified_user)):
     if result:
         try:
             VECTOR_DB_CLIENT.delete_collection(f"user-memory-{user.id}")
+            BM25_INDEXES.drop(f"user-memory-{user.id}")
         except Exception as e:
             log.error(e)
         return True
@@ -176,6 +180,7 @@ async def update_memory_by_id(
                 }
             ],
         )
+        BM25_INDEXES.drop(f"user-memory-{user.id}")
 
     return memory
 
@@ -193,6 +198,7 @@ async def delete_memory_by_id(memory_id: str, user=Depends(get_verified_user)):
         VECTOR_DB_CLIENT.delete(
             collection_name=f"user-memory-{user.id}", ids=[memory_id]
         )
+        BM25_INDEXES.drop(f"user-memory-{user.id}")
         return True
 
     return False
@@ -1,14 +1,16 @@
 import asyncio
+import copy
 import hashlib
 import json
 import logging
 import time
+import uuid
 from pathlib import Path
 from typing import Literal, Optional, overload
 
 import aiohttp
+import redis
 import requests
-from aiocache import cached
 from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, StreamingResponse
@@ -24,7 +26,7 @@ from open_webui.env import (
 )
 from open_webui.models.models import Models
 from open_webui.models.users import UserModel
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import has_access, get_user_group_ids
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.misc import convert_logit_bias_input_to_json
 from open_webui.utils.payload import (
@@ -84,11 +86,14 @@ async def cleanup_http_session():
 ##########################################
 
 
-async def send_get_request(url, key=None, user: UserModel = None):
+async def send_get_request(
+    url, key=None, user: UserModel = None, timeout: Optional[int] = None
+):
     try:
         session = await get_http_session()  # Use shared connection pool
         async with session.get(
             url,
+            **({"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}),
             headers={
                 **({"Authorization": f"Bearer {key}"} if key else {}),
                 **(
@@ -203,6 +208,7 @@ async def update_config(
         for key, value in request.app.state.config.OPENAI_API_CONFIGS.items()
         if key in keys
     }
+    OPENAI_MODELS_REFRESHER.reset()
 
     return {
         "ENABLE_OPENAI_API": request.app.state.config.ENABLE_OPENAI_API,
@@ -321,8 +327,8 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
             url not in request.app.state.config.OPENAI_API_CONFIGS  # Legacy support
         ):
             request_tasks.append(
-                send_get_request(
-                    f"{url}/models",
+                OPENAI_MODELS_REFRESHER.fetch_models(
+                    url,
                     request.app.state.config.OPENAI_API_KEYS[idx],
                     user=user,
                 )
@@ -341,8 +347,8 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
             if enable:
                 if len(model_ids) == 0:
                     request_tasks.append(
-                        send_get_request(
-                            f"{url}/models",
+                        OPENAI_MODELS_REFRESHER.fetch_models(
+                            url,
                             request.app.state.config.OPENAI_API_KEYS[idx],
                             user=user,
                         )
@@ -401,31 +407,299 @@ async def get_all_models_responses(request: Request, user: UserModel) -> list:
 
 async def get_filtered_models(models, user):
     # Filter models based on user access control
+    user_group_ids = get_user_group_ids(user.id)
     filtered_models = []
     for model in models.get("data", []):
         model_info = Models.get_model_by_id(model["id"])
         if model_info:
             if user.id == model_info.user_id or has_access(
-                user.id, type="read", access_control=model_info.access_control
+                user.id,
+                type="read",
+                access_control=model_info.access_control,
+                user_group_ids=user_group_ids,
             ):
                 filtered_models.append(model)
     return filtered_models
 
 
-def _build_cache_key_with_user_role(*args, **kwargs):
-    """Build cache key that differentiates admin vs non-admin users for models"""
-    user = kwargs.get("user") or (args[1] if len(args) > 1 else None)
-    role = user.role if user else "unknown"
-    return f"models_{role}"
+class ModelsRefresher:
+    """
+    The merged model list of the OpenAI connections, served stale while it is
+    revalidated.
+
+    The list is fetched inline only when there is none yet or the connections
+    changed. Once older than `ttl` the last known list keeps being returned and
+    a background task refreshes it. When a `redis.asyncio` client is set, one
+    worker at a time refreshes and publishes the list through Redis, the others
+    pick it up from there.
+
+    Every endpoint has its health tracked: an endpoint failing to list its
+    models is backed off exponentially, from `backoff_secs` up to
+    `max_backoff_secs`, and its last successful list is used meanwhile.
+    """
+
+    REDIS_KEY = "open-webui:openai-models"
+    REDIS_VERSION_KEY = "open-webui:openai-models-version"
+    REDIS_LOCK_KEY = "open-webui:openai-models-refresh"
+
+    # KEYS: lock; ARGV: token of the worker that acquired it
+    RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(
+        self,
+        ttl: int,
+        timeout: Optional[int] = None,
+        backoff_secs: float = 5,
+        max_backoff_secs: float = 300,
+    ):
+        self.redis = None
+        self.ttl = ttl
+        self.timeout = timeout
+        self.backoff_secs = backoff_secs
+        self.max_backoff_secs = max_backoff_secs
+
+        self._models = None
+        self._models_by_id = {}
+        self._fingerprint = None
+        self._updated_at = 0.0
+        self._version = None
+
+        # url -> health of the endpoint and its last successful response
+        self._endpoints: dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _get_endpoint(self, url: str) -> dict:
+        return self._endpoints.setdefault(
+            url,
+            {
+                "failures": 0,
+                "retry_at": 0.0,
+                "last_success_at": None,
+                "last_error_at": None,
+                "latency_ms": None,
+                "response": None,
+            },
+        )
 
+    async def fetch_models(self, url: str, key: str = None, user: UserModel = None):
+        """
+        The response of `{url}/models`, or the last successful one while the
+        endpoint is failing.
+        """
+        endpoint = self._get_endpoint(url)
+
+        now = time.time()
+        if endpoint["retry_at"] <= now:
+            start = time.perf_counter()
+            response = await send_get_request(
+                f"{url}/models", key, user=user, timeout=self.timeout
+            )
+            endpoint["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
 
-@cached(ttl=MODELS_CACHE_TTL, key_builder=_build_cache_key_with_user_role)
-async def get_all_models(request: Request, user: UserModel) -> dict[str, list]:
-    log.info("get_all_models()")
+            if response is not None and not (
+                isinstance(response, dict) and "error" in response
+            ):
+                endpoint.update(
+                    failures=0, retry_at=0.0, last_success_at=now, response=response
+                )
+            else:
+                endpoint["failures"] += 1
+                endpoint["last_error_at"] = now
+                endpoint["retry_at"] = now + min(
+                    self.backoff_secs * 2 ** (endpoint["failures"] - 1),
+                    self.max_backoff_secs,
+                )
+                log.warning(
+                    f"Failed to list the models of {url}, "
+                    f"retrying in {endpoint['retry_at'] - now:.0f}s"
+                )
+
+                if endpoint["response"] is None:
+                    return response
+
+        # Copied, prefixes and tags are applied to the response in place
+        return copy.deepcopy(endpoint["response"])
+
+    def _get_fingerprint(self, request: Request) -> str:
+        config = request.app.state.config
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    config.OPENAI_API_BASE_URLS,
+                    config.OPENAI_API_KEYS,
+                    config.OPENAI_API_CONFIGS,
+                ],
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+
+    def _set(self, models: dict, fingerprint: str, updated_at: float):
+        self._models = models
+        self._models_by_id = {model["id"]: model for model in models["data"]}
+        self._fingerprint = fingerprint
+        self._updated_at = updated_at
+
+    async def _sync(self):
+        """Pick up the list published by another worker."""
+        if not self.redis:
+            return
+
+        try:
+            version = await self.redis.get(self.REDIS_VERSION_KEY)
+            if version is None or int(version) == self._version:
+                return
+
+            published = await self.redis.get(self.REDIS_KEY)
+        except redis.RedisError as e:
+            log.warning(f"Failed to read the OpenAI models: {e}")
+            return
+
+        self._version = int(version)
+        if published:
+            published = json.loads(published)
+            if published["updated_at"] > self._updated_at:
+                self._set(
+                    {"data": published["data"]},
+                    published["fingerprint"],
+                    published["updated_at"],
+                )
+
+    async def _publish(self):
+        if not self.redis:
+            return
+
+        try:
+            await self.redis.set(
+                self.REDIS_KEY,
+                json.dumps(
+                    {
+                        "data": self._models["data"],
+                        "fingerprint": self._fingerprint,
+                        "updated_at": self._updated_at,
+                    }
+                ),
+            )
+            self._version = await self.redis.incr(self.REDIS_VERSION_KEY)
+        except redis.RedisError as e:
+            log.warning(f"Failed to publish the OpenAI models: {e}")
+
+    async def _refresh(self, request: Request, user: UserModel, fingerprint: str):
+        models = await fetch_all_models(request, user=user)
+        self._set(models, fingerprint, time.time())
+        await self._publish()
+
+    async def _acquire_refresh_lock(self) -> Optional[str]:
+        """
+        The token of the Redis refresh lock, None if another worker holds it.
+        Without Redis, or when it fails, every worker refreshes on its own.
+        """
+        token = str(uuid.uuid4())
+        if not self.redis:
+            return token
 
+        try:
+            if await self.redis.set(
+                self.REDIS_LOCK_KEY, token, nx=True, ex=max(self.timeout or 0, 60)
+            ):
+                return token
+            return None
+        except redis.RedisError as e:
+            log.warning(f"Failed to lock the OpenAI models refresh: {e}")
+            return token
+
+    async def _release_refresh_lock(self, token: str):
+        if not self.redis:
+            return
+
+        try:
+            # The lock may have expired and been taken by another worker since
+            await self.redis.register_script(self.RELEASE_LOCK_SCRIPT)(
+                keys=[self.REDIS_LOCK_KEY], args=[token]
+            )
+        except redis.RedisError as e:
+            log.warning(f"Failed to unlock the OpenAI models refresh: {e}")
+
+    async def _refresh_in_background(
+        self, request: Request, user: UserModel, fingerprint: str
+    ):
+        token = await self._acquire_refresh_lock()
+        if token is None:
+            # Another worker is already refreshing, it will publish the list
+            return
+
+        try:
+            async with self._lock:
+                if time.time() - self._updated_at > self.ttl:
+                    await self._refresh(request, user, fingerprint)
+        except Exception as e:
+            log.exception(f"Error refreshing the OpenAI models: {e}")
+        finally:
+            await self._release_refresh_lock(token)
+
+    def _schedule_refresh(self, request: Request, user: UserModel, fingerprint: str):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+
+        self._refresh_task = asyncio.create_task(
+            self._refresh_in_background(request, user, fingerprint)
+        )
+
+    async def get(self, request: Request, user: UserModel) -> dict:
+        fingerprint = self._get_fingerprint(request)
+        await self._sync()
+
+        if self._models is None or self._fingerprint != fingerprint:
+            async with self._lock:
+                if self._models is None or self._fingerprint != fingerprint:
+                    await self._refresh(request, user, fingerprint)
+        elif time.time() - self._updated_at > self.ttl:
+            self._schedule_refresh(request, user, fingerprint)
+
+        request.app.state.OPENAI_MODELS = self._models_by_id
+        return self._models
+
+    def reset(self):
+        """Forget the health of the endpoints, e.g. after the connections changed."""
+        self._endpoints.clear()
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        return {
+            "models": len(self._models_by_id),
+            "age_seconds": round(now - self._updated_at, 1) if self._models else None,
+            "refreshing": self._refresh_task is not None
+            and not self._refresh_task.done(),
+            "endpoints": {
+                url: {
+                    **{k: v for k, v in endpoint.items() if k != "response"},
+                    "backoff_seconds": max(round(endpoint["retry_at"] - now, 1), 0),
+                }
+                for url, endpoint in self._endpoints.items()
+            },
+        }
+
+
+OPENAI_MODELS_REFRESHER = ModelsRefresher(
+    ttl=MODELS_CACHE_TTL, timeout=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST
+)
+
+
+async def get_all_models(request: Request, user: UserModel) -> dict[str, list]:
     if not request.app.state.config.ENABLE_OPENAI_API:
         return {"data": []}
 
+    return await OPENAI_MODELS_REFRESHER.get(request, user=user)
+
+
+async def fetch_all_models(request: Request, user: UserModel) -> dict[str, list]:
+    log.info("fetch_all_models()")
+
     responses = await get_all_models_responses(request, user=user)
 
     def extract_data(response):
@@ -476,7 +750,6 @@ async def get_all_models(request: Request, user: UserModel) -> dict[str, list]:
     models = {"data": merge_models_lists(map(extract_data, responses))}
     log.debug(f"models: {models}")
 
-    request.app.state.OPENAI_MODELS = {model["id"]: model for model in models["data"]}
     return models
 
 
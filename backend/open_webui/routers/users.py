@@ -21,6 +21,7 @@ from pydantic import BaseModel
 
 from open_webui.utils.auth import get_admin_user, get_password_hash, get_verified_user
 from open_webui.utils.access_control import get_permissions
+from open_webui.utils.chat_encryption_proxy import prefetch_chat_encryption_key
 
 
 log = logging.getLogger(__name__)
@@ -251,6 +252,7 @@ async def get_user_by_id(user_id: str, user=Depends(get_verified_user)):
     # If it is, get the user_id from the chat
     if user_id.startswith("shared-"):
         chat_id = user_id.replace("shared-", "")
+        await prefetch_chat_encryption_key(chat_id)
         chat = Chats.get_chat_by_id(chat_id)
         if chat:
             user_id = chat.user_id
@@ -267,7 +269,7 @@ async def get_user_by_id(user_id: str, user=Depends(get_verified_user)):
             **{
                 "name": user.name,
                 "profile_image_url": user.profile_image_url,
-                "active": get_active_status_by_user_id(user_id),
+                "active": await get_active_status_by_user_id(user_id),
             }
         )
     else:
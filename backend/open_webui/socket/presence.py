@@ -0,0 +1,95 @@
+import asyncio
+import logging
+
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.socket.utils import SocketPool
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["SOCKET"])
+
+
+class PresenceBroadcaster:
+    """
+    Broadcasts changes of the connected users and models in use as deltas
+    instead of the full lists.
+
+    Changes are collected for `debounce_secs` and sent as one delta per event,
+    numbered by `SocketPool.next_sequence` so every worker shares the same
+    sequence:
+
+    - `user-list`: {"seq", "joined", "left"}
+    - `usage`: {"seq", "added", "removed"}
+
+    Snapshots ({"seq", "user_ids"} / {"seq", "models"}) are only sent to the
+    client asking for one, on connect or when it notices a gap in the sequence.
+    Clients apply deltas idempotently, so a snapshot already containing a change
+    followed by the delta of that change is harmless.
+    """
+
+    # event -> (snapshot key, added key, removed key)
+    EVENTS = {
+        "user-list": ("user_ids", "joined", "left"),
+        "usage": ("models", "added", "removed"),
+    }
+
+    def __init__(self, sio, pool: SocketPool, debounce_secs: float = 0.5):
+        self.sio = sio
+        self.pool = pool
+        self.debounce_secs = debounce_secs
+
+        # event -> {id: present}, the last change of an id wins
+        self._pending: dict[str, dict[str, bool]] = {event: {} for event in self.EVENTS}
+        self._flush_task = None
+
+    def user_joined(self, user_id: str):
+        self._queue("user-list", user_id, True)
+
+    def user_left(self, user_id: str):
+        self._queue("user-list", user_id, False)
+
+    def model_added(self, model_id: str):
+        self._queue("usage", model_id, True)
+
+    def model_removed(self, model_id: str):
+        self._queue("usage", model_id, False)
+
+    def _queue(self, event: str, id: str, present: bool):
+        self._pending[event][id] = present
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.debounce_secs)
+        try:
+            await self.flush()
+        except Exception as e:
+            log.exception(f"Error broadcasting presence changes: {e}")
+
+    async def flush(self):
+        for event, (_, added_key, removed_key) in self.EVENTS.items():
+            pending, self._pending[event] = self._pending[event], {}
+            if not pending:
+                continue
+
+            await self.sio.emit(
+                event,
+                {
+                    "seq": await self.pool.next_sequence(event),
+                    added_key: [id for id, present in pending.items() if present],
+                    removed_key: [id for id, present in pending.items() if not present],
+                },
+            )
+
+    async def send_snapshot(self, event: str, to: str):
+        snapshot_key = self.EVENTS[event][0]
+
+        # Read the sequence first: any delta numbered up to it was applied to the
+        # pool before, so the snapshot read afterwards already contains it
+        seq = await self.pool.get_sequence(event)
+        if event == "user-list":
+            data = await self.pool.get_user_ids()
+        else:
+            data = await self.pool.get_models_in_use()
+
+        await self.sio.emit(event, {"seq": seq, snapshot_key: data}, to=to)
@@ -1,5 +1,8 @@
 import json
+import time
 import uuid
+from typing import Optional
+
 from open_webui.utils.redis import get_redis_connection
 
 
@@ -10,82 +13,222 @@ class RedisLock:
         self.timeout_secs = timeout_secs
         self.lock_obtained = False
         self.redis = get_redis_connection(
-            redis_url, redis_sentinels, decode_responses=True
+            redis_url, redis_sentinels, decode_responses=True, async_mode=True
         )
 
-    def aquire_lock(self):
+    async def aquire_lock(self):
         # nx=True will only set this key if it _hasn't_ already been set
-        self.lock_obtained = self.redis.set(
+        self.lock_obtained = await self.redis.set(
             self.lock_name, self.lock_id, nx=True, ex=self.timeout_secs
         )
         return self.lock_obtained
 
-    def renew_lock(self):
+    async def renew_lock(self):
         # xx=True will only set this key if it _has_ already been set
-        return self.redis.set(
+        return await self.redis.set(
             self.lock_name, self.lock_id, xx=True, ex=self.timeout_secs
         )
 
-    def release_lock(self):
-        lock_value = self.redis.get(self.lock_name)
+    async def release_lock(self):
+        lock_value = await self.redis.get(self.lock_name)
         if lock_value and lock_value == self.lock_id:
-            self.redis.delete(self.lock_name)
+            await self.redis.delete(self.lock_name)
 
 
-class RedisDict:
-    def __init__(self, name, redis_url, redis_sentinels=[]):
-        self.name = name
+class SocketPool:
+    """
+    In-process store of the Socket.IO sessions, the sessions of each connected
+    user and the models in use.
+
+    Model usage is kept as the last time each model was reported and expires
+    `usage_ttl` seconds later without any cleanup pass. Writes report whether
+    they changed the set of connected users or models in use, and `sequence`
+    numbers the resulting broadcasts per event.
+    """
+
+    def __init__(self, usage_ttl: int):
+        self.usage_ttl = usage_ttl
+
+        self._sessions: dict[str, dict] = {}
+        self._user_sessions: dict[str, set[str]] = {}
+        self._usage: dict[str, float] = {}
+        self._sequences: dict[str, int] = {}
+
+    async def add_session(self, sid: str, user: dict) -> bool:
+        """Add a session, returns whether it is the first one of the user."""
+        self._sessions[sid] = user
+
+        joined = user["id"] not in self._user_sessions
+        self._user_sessions.setdefault(user["id"], set()).add(sid)
+        return joined
+
+    async def remove_session(self, sid: str) -> tuple[Optional[dict], bool]:
+        """
+        Remove a session, returns its user and whether it was the last session
+        of that user.
+        """
+        user = self._sessions.pop(sid, None)
+        if user is None:
+            return None, False
+
+        session_ids = self._user_sessions.get(user["id"], set())
+        session_ids.discard(sid)
+        if not session_ids:
+            self._user_sessions.pop(user["id"], None)
+            return user, True
+
+        return user, False
+
+    async def get_session(self, sid: str) -> Optional[dict]:
+        return self._sessions.get(sid)
+
+    async def get_sessions(self, sids: list[str]) -> list[Optional[dict]]:
+        return [self._sessions.get(sid) for sid in sids]
+
+    async def get_user_ids(self) -> list[str]:
+        return list(self._user_sessions.keys())
+
+    async def get_user_session_ids(self, user_id: str) -> list[str]:
+        return list(self._user_sessions.get(user_id, ()))
+
+    async def is_user_active(self, user_id: str) -> bool:
+        return user_id in self._user_sessions
+
+    async def touch_model_usage(self, model_id: str) -> bool:
+        """Record that a model is in use, returns whether it was not already."""
+        now = time.time()
+        updated_at = self._usage.get(model_id)
+
+        self._usage[model_id] = now
+        return updated_at is None or updated_at < now - self.usage_ttl
+
+    async def get_models_in_use(self) -> list[str]:
+        expired_before = time.time() - self.usage_ttl
+        for model_id in [
+            model_id
+            for model_id, updated_at in self._usage.items()
+            if updated_at < expired_before
+        ]:
+            del self._usage[model_id]
+
+        return list(self._usage.keys())
+
+    async def next_sequence(self, name: str) -> int:
+        self._sequences[name] = self._sequences.get(name, 0) + 1
+        return self._sequences[name]
+
+    async def get_sequence(self, name: str) -> int:
+        return self._sequences.get(name, 0)
+
+
+class RedisSocketPool(SocketPool):
+    """
+    `SocketPool` shared by all workers through Redis, using `redis.asyncio` so
+    handlers never block the event loop.
+
+    - sessions: hash `{prefix}:session_pool` of sid -> user JSON
+    - users: set `{prefix}:user_set` of connected user ids and one set
+      `{prefix}:user_sessions:{user_id}` of sids per user, updated atomically
+      so concurrent connects and disconnects of the same user cannot race
+    - usage: sorted set `{prefix}:usage_zset` of model id -> last report time,
+      trimmed by score on every write
+
+    The user and usage keys are not the `user_pool` / `usage_pool` hashes of
+    older versions, so a Redis still holding those does not fail with WRONGTYPE.
+    - sequences: counters `{prefix}:sequence:{name}` shared by all workers
+    """
+
+    # KEYS: session pool, user pool, user sessions prefix; ARGV: sid
+    REMOVE_SESSION_SCRIPT = """
+local user = redis.call('HGET', KEYS[1], ARGV[1])
+if not user then
+    return {false, 0}
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+
+local user_id = cjson.decode(user)['id']
+local user_sessions = KEYS[3] .. user_id
+redis.call('SREM', user_sessions, ARGV[1])
+if redis.call('SCARD', user_sessions) == 0 then
+    return {user, redis.call('SREM', KEYS[2], user_id)}
+end
+return {user, 0}
+"""
+
+    def __init__(
+        self,
+        redis_url: str,
+        redis_sentinels: list = [],
+        usage_ttl: int = 3,
+        prefix: str = "open-webui",
+    ):
+        super().__init__(usage_ttl)
         self.redis = get_redis_connection(
-            redis_url, redis_sentinels, decode_responses=True
+            redis_url, redis_sentinels, decode_responses=True, async_mode=True
         )
 
-    def __setitem__(self, key, value):
-        serialized_value = json.dumps(value)
-        self.redis.hset(self.name, key, serialized_value)
+        self.session_pool_key = f"{prefix}:session_pool"
+        self.user_pool_key = f"{prefix}:user_set"
+        self.user_sessions_prefix = f"{prefix}:user_sessions:"
+        self.usage_pool_key = f"{prefix}:usage_zset"
+        self.sequence_prefix = f"{prefix}:sequence:"
+
+        self._remove_session = self.redis.register_script(self.REMOVE_SESSION_SCRIPT)
 
-    def __getitem__(self, key):
-        value = self.redis.hget(self.name, key)
-        if value is None:
-            raise KeyError(key)
-        return json.loads(value)
+    async def add_session(self, sid: str, user: dict) -> bool:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.session_pool_key, sid, json.dumps(user))
+            pipe.sadd(self.user_sessions_prefix + user["id"], sid)
+            pipe.sadd(self.user_pool_key, user["id"])
+            *_, joined = await pipe.execute()
 
-    def __delitem__(self, key):
-        result = self.redis.hdel(self.name, key)
-        if result == 0:
-            raise KeyError(key)
+        return bool(joined)
+
+    async def remove_session(self, sid: str) -> tuple[Optional[dict], bool]:
+        user, left = await self._remove_session(
+            keys=[self.session_pool_key, self.user_pool_key, self.user_sessions_prefix],
+            args=[sid],
+        )
+        return (json.loads(user) if user else None), bool(left)
 
-    def __contains__(self, key):
-        return self.redis.hexists(self.name, key)
+    async def get_session(self, sid: str) -> Optional[dict]:
+        user = await self.redis.hget(self.session_pool_key, sid)
+        return json.loads(user) if user else None
 
-    def __len__(self):
-        return self.redis.hlen(self.name)
+    async def get_sessions(self, sids: list[str]) -> list[Optional[dict]]:
+        if not sids:
+            return []
 
-    def keys(self):
-        return self.redis.hkeys(self.name)
+        users = await self.redis.hmget(self.session_pool_key, sids)
+        return [json.loads(user) if user else None for user in users]
 
-    def values(self):
-        return [json.loads(v) for v in self.redis.hvals(self.name)]
+    async def get_user_ids(self) -> list[str]:
+        return list(await self.redis.smembers(self.user_pool_key))
 
-    def items(self):
-        return [(k, json.loads(v)) for k, v in self.redis.hgetall(self.name).items()]
+    async def get_user_session_ids(self, user_id: str) -> list[str]:
+        return list(await self.redis.smembers(self.user_sessions_prefix + user_id))
 
-    def get(self, key, default=None):
-        try:
-            return self[key]
-        except KeyError:
-            return default
+    async def is_user_active(self, user_id: str) -> bool:
+        return bool(await self.redis.sismember(self.user_pool_key, user_id))
 
-    def clear(self):
-        self.redis.delete(self.name)
+    async def touch_model_usage(self, model_id: str) -> bool:
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(self.usage_pool_key, "-inf", now - self.usage_ttl)
+            pipe.zadd(self.usage_pool_key, {model_id: now})
+            _, added = await pipe.execute()
+
+        return bool(added)
+
+    async def get_models_in_use(self) -> list[str]:
+        return list(
+            await self.redis.zrangebyscore(
+                self.usage_pool_key, time.time() - self.usage_ttl, "+inf"
+            )
+        )
 
-    def update(self, other=None, **kwargs):
-        if other is not None:
-            for k, v in other.items() if hasattr(other, "items") else other:
-                self[k] = v
-        for k, v in kwargs.items():
-            self[k] = v
+    async def next_sequence(self, name: str) -> int:
+        return await self.redis.incr(self.sequence_prefix + name)
 
-    def setdefault(self, key, default=None):
-        if key not in self:
-            self[key] = default
-        return self[key]
+    async def get_sequence(self, name: str) -> int:
+        return int(await self.redis.get(self.sequence_prefix + name) or 0)
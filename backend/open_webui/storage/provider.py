@@ -2,10 +2,13 @@ import os
 import shutil
 import json
 import logging
+import hashlib
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Tuple
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from open_webui.config import (
@@ -37,6 +40,23 @@ from open_webui.env import SRC_LOG_LEVELS
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
+# Uploads are read, hashed and written in chunks of this size, and sent to the
+# object stores in parts of UPLOAD_PART_SIZE, so they are never held in memory
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+
+
+@dataclass
+class UploadedFile:
+    """An uploaded file, without its contents."""
+
+    # Path or URL of the file in the storage provider
+    path: str
+    # Copy of the file in UPLOAD_DIR
+    local_path: str
+    size: int
+    sha256: str
+
 
 class StorageProvider(ABC):
     @abstractmethod
@@ -44,7 +64,9 @@ class StorageProvider(ABC):
         pass
 
     @abstractmethod
-    def upload_file(self, file: BinaryIO, filename: str) -> Tuple[bytes, str]:
+    def upload_file(
+        self, file: BinaryIO, filename: str, max_size: Optional[int] = None
+    ) -> UploadedFile:
         pass
 
     @abstractmethod
@@ -58,14 +80,47 @@ class StorageProvider(ABC):
 
 class LocalStorageProvider(StorageProvider):
     @staticmethod
-    def upload_file(file: BinaryIO, filename: str) -> Tuple[bytes, str]:
-        contents = file.read()
-        if not contents:
-            raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+    def upload_file(
+        file: BinaryIO, filename: str, max_size: Optional[int] = None
+    ) -> UploadedFile:
+        """
+        Handles uploading of the file to local storage, `max_size` is the
+        largest accepted size in bytes.
+        """
         file_path = f"{UPLOAD_DIR}/{filename}"
-        with open(file_path, "wb") as f:
-            f.write(contents)
-        return contents, file_path
+        tmp_path = f"{file_path}.part"
+
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                while chunk := file.read(UPLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise ValueError(
+                            ERROR_MESSAGES.FILE_TOO_LARGE(
+                                size=f"{max_size // (1024 * 1024)}MB"
+                            )
+                        )
+
+                    sha256.update(chunk)
+                    f.write(chunk)
+
+            if not size:
+                raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return UploadedFile(
+            path=file_path,
+            local_path=file_path,
+            size=size,
+            sha256=sha256.hexdigest(),
+        )
 
     @staticmethod
     def get_file(file_path: str) -> str:
@@ -130,17 +185,27 @@ class S3StorageProvider(StorageProvider):
 
         self.bucket_name = S3_BUCKET_NAME
         self.key_prefix = S3_KEY_PREFIX if S3_KEY_PREFIX else ""
+        self.transfer_config = TransferConfig(
+            multipart_threshold=UPLOAD_PART_SIZE,
+            multipart_chunksize=UPLOAD_PART_SIZE,
+        )
 
-    def upload_file(self, file: BinaryIO, filename: str) -> Tuple[bytes, str]:
+    def upload_file(
+        self, file: BinaryIO, filename: str, max_size: Optional[int] = None
+    ) -> UploadedFile:
         """Handles uploading of the file to S3 storage."""
-        _, file_path = LocalStorageProvider.upload_file(file, filename)
+        uploaded = LocalStorageProvider.upload_file(file, filename, max_size)
         try:
             s3_key = os.path.join(self.key_prefix, filename)
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_key)
-            return (
-                open(file_path, "rb").read(),
-                "s3://" + self.bucket_name + "/" + s3_key,
+            # Streams the local copy, in a multipart upload for large files
+            self.s3_client.upload_file(
+                uploaded.local_path,
+                self.bucket_name,
+                s3_key,
+                Config=self.transfer_config,
             )
+            uploaded.path = "s3://" + self.bucket_name + "/" + s3_key
+            return uploaded
         except ClientError as e:
             raise RuntimeError(f"Error uploading file to S3: {e}")
 
@@ -207,13 +272,17 @@ class GCSStorageProvider(StorageProvider):
             self.gcs_client = storage.Client()
         self.bucket = self.gcs_client.bucket(GCS_BUCKET_NAME)
 
-    def upload_file(self, file: BinaryIO, filename: str) -> Tuple[bytes, str]:
+    def upload_file(
+        self, file: BinaryIO, filename: str, max_size: Optional[int] = None
+    ) -> UploadedFile:
         """Handles uploading of the file to GCS storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename)
+        uploaded = LocalStorageProvider.upload_file(file, filename, max_size)
         try:
-            blob = self.bucket.blob(filename)
-            blob.upload_from_filename(file_path)
-            return contents, "gs://" + self.bucket_name + "/" + filename
+            # A chunk size makes large files a resumable upload sent in parts
+            blob = self.bucket.blob(filename, chunk_size=UPLOAD_PART_SIZE)
+            blob.upload_from_filename(uploaded.local_path)
+            uploaded.path = "gs://" + self.bucket_name + "/" + filename
+            return uploaded
         except GoogleCloudError as e:
             raise RuntimeError(f"Error uploading file to GCS: {e}")
 
@@ -265,25 +334,36 @@ class AzureStorageProvider(StorageProvider):
         if storage_key:
             # Configure using the Azure Storage Account Endpoint and Key
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=storage_key
+                account_url=self.endpoint,
+                credential=storage_key,
+                max_single_put_size=UPLOAD_PART_SIZE,
+                max_block_size=UPLOAD_PART_SIZE,
             )
         else:
             # Configure using the Azure Storage Account Endpoint and DefaultAzureCredential
             # If the key is not configured, then the DefaultAzureCredential will be used to support Managed Identity authentication
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=DefaultAzureCredential()
+                account_url=self.endpoint,
+                credential=DefaultAzureCredential(),
+                max_single_put_size=UPLOAD_PART_SIZE,
+                max_block_size=UPLOAD_PART_SIZE,
             )
         self.container_client = self.blob_service_client.get_container_client(
             self.container_name
         )
 
-    def upload_file(self, file: BinaryIO, filename: str) -> Tuple[bytes, str]:
+    def upload_file(
+        self, file: BinaryIO, filename: str, max_size: Optional[int] = None
+    ) -> UploadedFile:
         """Handles uploading of the file to Azure Blob Storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename)
+        uploaded = LocalStorageProvider.upload_file(file, filename, max_size)
         try:
             blob_client = self.container_client.get_blob_client(filename)
-            blob_client.upload_blob(contents, overwrite=True)
-            return contents, f"{self.endpoint}/{self.container_name}/{filename}"
+            # Streams the local copy, staged as blocks for large files
+            with open(uploaded.local_path, "rb") as f:
+                blob_client.upload_blob(f, length=uploaded.size, overwrite=True)
+            uploaded.path = f"{self.endpoint}/{self.container_name}/{filename}"
+            return uploaded
         except Exception as e:
             raise RuntimeError(f"Error uploading file to Azure Blob Storage: {e}")
 
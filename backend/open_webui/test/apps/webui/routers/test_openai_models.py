@@ -0,0 +1,151 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from open_webui.routers import openai
+from open_webui.routers.openai import ModelsRefresher
+
+
+class FakeRedis:
+    """The few `redis.asyncio` commands used by `ModelsRefresher`."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def register_script(self, script):
+        async def release_lock(keys, args):
+            if self.data.get(keys[0]) == args[0]:
+                del self.data[keys[0]]
+                return 1
+            return 0
+
+        return release_lock
+
+
+def make_request():
+    config = SimpleNamespace(
+        OPENAI_API_BASE_URLS=["http://provider"],
+        OPENAI_API_KEYS=["key"],
+        OPENAI_API_CONFIGS={},
+    )
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(config=config)))
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    fetches = []
+
+    async def fetch_all_models(request, user):
+        fetches.append(True)
+        return {"data": [{"id": f"model-{len(fetches)}"}]}
+
+    monkeypatch.setattr(openai, "fetch_all_models", fetch_all_models)
+    return fetches
+
+
+def test_serves_stale_models_while_refreshing(fetches):
+    refresher = ModelsRefresher(ttl=60)
+    request = make_request()
+
+    async def run():
+        assert (await refresher.get(request, user=None))["data"][0]["id"] == "model-1"
+        assert (await refresher.get(request, user=None))["data"][0]["id"] == "model-1"
+        assert len(fetches) == 1
+
+        # Expired, the last list is returned and refreshed in the background
+        refresher._updated_at -= 61
+        assert (await refresher.get(request, user=None))["data"][0]["id"] == "model-1"
+        assert refresher.get_stats()["refreshing"]
+        await refresher._refresh_task
+        assert (await refresher.get(request, user=None))["data"][0]["id"] == "model-2"
+
+        # The connections changed, fetched inline
+        request.app.state.config.OPENAI_API_KEYS = ["other"]
+        assert (await refresher.get(request, user=None))["data"][0]["id"] == "model-3"
+
+    asyncio.run(run())
+
+
+def test_refresh_lock_is_released_by_its_owner_only(fetches):
+    refresher = ModelsRefresher(ttl=60)
+    refresher.redis = FakeRedis()
+    request = make_request()
+
+    async def run():
+        await refresher.get(request, user=None)
+        refresher._updated_at -= 61
+
+        # Another worker is refreshing, its lock is left alone
+        refresher.redis.data[refresher.REDIS_LOCK_KEY] = "other"
+        await refresher.get(request, user=None)
+        await refresher._refresh_task
+        assert len(fetches) == 1
+        assert refresher.redis.data[refresher.REDIS_LOCK_KEY] == "other"
+
+        del refresher.redis.data[refresher.REDIS_LOCK_KEY]
+        await refresher.get(request, user=None)
+        await refresher._refresh_task
+        assert len(fetches) == 2
+        assert refresher.REDIS_LOCK_KEY not in refresher.redis.data
+
+        # Another worker picks up the published list
+        other = ModelsRefresher(ttl=60)
+        other.redis = refresher.redis
+        other._set({"data": []}, refresher._fingerprint, 0)
+        assert (await other.get(request, user=None))["data"][0]["id"] == "model-2"
+        assert len(fetches) == 2
+
+    asyncio.run(run())
+
+
+def test_failing_endpoints_are_backed_off(monkeypatch):
+    responses = [{"data": [{"id": "model"}]}, None, {"error": "down"}, None]
+    calls = []
+
+    async def send_get_request(url, key=None, user=None, timeout=None):
+        calls.append(url)
+        return responses[len(calls) - 1]
+
+    monkeypatch.setattr(openai, "send_get_request", send_get_request)
+    refresher = ModelsRefresher(ttl=60, backoff_secs=5, max_backoff_secs=8)
+    url = "http://provider"
+
+    async def run():
+        assert await refresher.fetch_models(url) == {"data": [{"id": "model"}]}
+
+        # Failing, the last successful response is used meanwhile
+        assert await refresher.fetch_models(url) == {"data": [{"id": "model"}]}
+        endpoint = refresher._endpoints[url]
+        assert endpoint["failures"] == 1
+        backoff = endpoint["retry_at"] - endpoint["last_error_at"]
+        assert backoff == 5
+
+        # Not requested again until the backoff is over
+        assert await refresher.fetch_models(url) == {"data": [{"id": "model"}]}
+        assert len(calls) == 2
+
+        endpoint["retry_at"] = 0
+        await refresher.fetch_models(url)
+        assert endpoint["retry_at"] - endpoint["last_error_at"] == 8
+        assert refresher.get_stats()["endpoints"][url]["failures"] == 2
+
+        # Responses are copies, prefixes are applied to them in place
+        (await refresher.fetch_models(url))["data"].clear()
+        endpoint["retry_at"] = 0
+        assert await refresher.fetch_models(url) == {"data": [{"id": "model"}]}
+        assert endpoint["failures"] == 3
+
+    asyncio.run(run())
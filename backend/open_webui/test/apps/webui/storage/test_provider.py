@@ -1,3 +1,4 @@
+import hashlib
 import io
 import os
 import boto3
@@ -66,14 +67,31 @@ class TestLocalStorageProvider:
 
     def test_upload_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        contents, file_path = self.Storage.upload_file(self.file_bytesio, self.filename)
+        uploaded = self.Storage.upload_file(self.file_bytesio, self.filename)
         assert (upload_dir / self.filename).exists()
         assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert contents == self.file_content
-        assert file_path == str(upload_dir / self.filename)
+        assert uploaded.size == len(self.file_content)
+        assert uploaded.sha256 == hashlib.sha256(self.file_content).hexdigest()
+        assert uploaded.path == str(upload_dir / self.filename)
+        assert uploaded.local_path == uploaded.path
         with pytest.raises(ValueError):
             self.Storage.upload_file(self.file_bytesio_empty, self.filename)
 
+    def test_upload_file_max_size(self, monkeypatch, tmp_path):
+        upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        monkeypatch.setattr(provider, "UPLOAD_CHUNK_SIZE", 4)
+        with pytest.raises(ValueError):
+            self.Storage.upload_file(
+                io.BytesIO(self.file_content), self.filename, max_size=8
+            )
+        assert list(upload_dir.iterdir()) == []
+
+        uploaded = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.filename, max_size=12
+        )
+        assert (upload_dir / self.filename).read_bytes() == self.file_content
+        assert uploaded.size == len(self.file_content)
+
     def test_get_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
         file_path = str(upload_dir / self.filename)
@@ -116,7 +134,7 @@ class TestS3StorageProvider:
         with pytest.raises(Exception):
             self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        contents, s3_file_path = self.Storage.upload_file(
+        uploaded = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
         object = self.s3_client.Object(self.Storage.bucket_name, self.filename)
@@ -124,17 +142,17 @@ class TestS3StorageProvider:
         # local checks
         assert (upload_dir / self.filename).exists()
         assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert contents == self.file_content
-        assert s3_file_path == "s3://" + self.Storage.bucket_name + "/" + self.filename
+        assert uploaded.size == len(self.file_content)
+        assert uploaded.path == "s3://" + self.Storage.bucket_name + "/" + self.filename
         with pytest.raises(ValueError):
             self.Storage.upload_file(self.file_bytesio_empty, self.filename)
 
     def test_get_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        contents, s3_file_path = self.Storage.upload_file(
+        s3_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
-        )
+        ).path
         file_path = self.Storage.get_file(s3_file_path)
         assert file_path == str(upload_dir / self.filename)
         assert (upload_dir / self.filename).exists()
@@ -142,9 +160,9 @@ class TestS3StorageProvider:
     def test_delete_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        contents, s3_file_path = self.Storage.upload_file(
+        s3_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
-        )
+        ).path
         assert (upload_dir / self.filename).exists()
         self.Storage.delete_file(s3_file_path)
         assert not (upload_dir / self.filename).exists()
@@ -229,7 +247,7 @@ class TestGCSStorageProvider:
         with pytest.raises(Exception):
             self.Storage.bucket = monkeypatch(self.Storage, "bucket", None)
             self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
-        contents, gcs_file_path = self.Storage.upload_file(
+        uploaded = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
         object = self.Storage.bucket.get_blob(self.filename)
@@ -237,26 +255,26 @@ class TestGCSStorageProvider:
         # local checks
         assert (upload_dir / self.filename).exists()
         assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert contents == self.file_content
-        assert gcs_file_path == "gs://" + self.Storage.bucket_name + "/" + self.filename
+        assert uploaded.size == len(self.file_content)
+        assert uploaded.path == "gs://" + self.Storage.bucket_name + "/" + self.filename
         # test error if file is empty
         with pytest.raises(ValueError):
             self.Storage.upload_file(self.file_bytesio_empty, self.filename)
 
     def test_get_file(self, monkeypatch, tmp_path, setup):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        contents, gcs_file_path = self.Storage.upload_file(
+        gcs_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
-        )
+        ).path
         file_path = self.Storage.get_file(gcs_file_path)
         assert file_path == str(upload_dir / self.filename)
         assert (upload_dir / self.filename).exists()
 
     def test_delete_file(self, monkeypatch, tmp_path, setup):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        contents, gcs_file_path = self.Storage.upload_file(
+        gcs_file_path = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
-        )
+        ).path
         # ensure that local directory has the uploaded file as well
         assert (upload_dir / self.filename).exists()
         assert self.Storage.bucket.get_blob(self.filename).name == self.filename
@@ -348,18 +366,21 @@ class TestAzureStorageProvider:
         # Reset side effect and create container
         self.Storage.container_client.get_blob_client.side_effect = None
         self.Storage.create_container()
-        contents, azure_file_path = self.Storage.upload_file(
+        uploaded = self.Storage.upload_file(
             io.BytesIO(self.file_content), self.filename
         )
 
         # Assertions
         self.Storage.container_client.get_blob_client.assert_called_with(self.filename)
-        self.Storage.container_client.get_blob_client().upload_blob.assert_called_once_with(
-            self.file_content, overwrite=True
-        )
-        assert contents == self.file_content
+        upload_blob = self.Storage.container_client.get_blob_client().upload_blob
+        upload_blob.assert_called_once()
+        assert upload_blob.call_args.kwargs == {
+            "length": len(self.file_content),
+            "overwrite": True,
+        }
+        assert uploaded.size == len(self.file_content)
         assert (
-            azure_file_path
+            uploaded.path
             == f"https://myaccount.blob.core.windows.net/{self.Storage.container_name}/{self.filename}"
         )
         assert (upload_dir / self.filename).exists()
@@ -0,0 +1,186 @@
+import random
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from open_webui.models import groups
+from open_webui.models.groups import Group, GroupForm, GroupMember, GroupUpdateForm
+from open_webui.utils import oauth
+from open_webui.utils.access_control import has_access, has_access_many
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@pytest.fixture
+def Groups(monkeypatch):
+    """The group table on an in-memory database."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    groups.Base.metadata.create_all(
+        engine, tables=[Group.__table__, GroupMember.__table__]
+    )
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    @contextmanager
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(groups, "get_db", get_db)
+    return groups.Groups
+
+
+def create_group(Groups, name, user_ids):
+    group = Groups.insert_new_group("admin", GroupForm(name=name, description=""))
+    return Groups.update_group_by_id(
+        group.id, GroupUpdateForm(name=name, description="", user_ids=user_ids)
+    )
+
+
+def assert_members_match(Groups):
+    """The membership table holds exactly the members of `Group.user_ids`."""
+    with groups.get_db() as db:
+        members = {
+            (member.group_id, member.user_id) for member in db.query(GroupMember)
+        }
+
+    assert members == {
+        (group.id, user_id)
+        for group in Groups.get_groups()
+        for user_id in group.user_ids
+    }
+
+
+def legacy_has_access(Groups, user_id, type, access_control):
+    """The check before the membership table, on the JSON member lists."""
+    if access_control is None:
+        return type == "read"
+
+    user_group_ids = [
+        group.id for group in Groups.get_groups() if user_id in group.user_ids
+    ]
+    permission_access = access_control.get(type, {})
+    permitted_group_ids = permission_access.get("group_ids", [])
+    permitted_user_ids = permission_access.get("user_ids", [])
+
+    return user_id in permitted_user_ids or any(
+        group_id in permitted_group_ids for group_id in user_group_ids
+    )
+
+
+def test_access_checks_match_json_member_lists(Groups):
+    rng = random.Random(0)
+    user_ids = [f"user-{i}" for i in range(8)]
+    group_ids = [
+        create_group(Groups, f"group-{i}", rng.sample(user_ids, rng.randrange(4))).id
+        for i in range(6)
+    ] + ["deleted-group"]
+
+    def random_access():
+        return {
+            "group_ids": rng.sample(group_ids, rng.randrange(3)),
+            "user_ids": rng.sample(user_ids, rng.randrange(2)),
+        }
+
+    access_controls = [None, {}, {"read": {}}] + [
+        {"read": random_access(), "write": random_access()} for _ in range(40)
+    ]
+
+    for user_id in user_ids + ["outsider"]:
+        user_group_ids = Groups.get_group_ids_by_member_id(user_id)
+        for type in ["read", "write"]:
+            expected = [
+                legacy_has_access(Groups, user_id, type, access_control)
+                for access_control in access_controls
+            ]
+
+            assert [
+                has_access(user_id, type, access_control)
+                for access_control in access_controls
+            ] == expected
+            assert [
+                has_access(user_id, type, access_control, user_group_ids)
+                for access_control in access_controls
+            ] == expected
+            assert has_access_many(user_id, type, access_controls) == expected
+
+
+def test_has_access_many_looks_up_groups_once(Groups, monkeypatch):
+    group = create_group(Groups, "group", ["user"])
+    lookups = []
+    get_group_ids = Groups.get_group_ids_by_member_id
+    monkeypatch.setattr(
+        Groups,
+        "get_group_ids_by_member_id",
+        lambda user_id: lookups.append(user_id) or get_group_ids(user_id),
+    )
+
+    access_control = {"read": {"group_ids": [group.id]}}
+    assert has_access_many("user", "read", [access_control] * 10) == [True] * 10
+    assert lookups == ["user"]
+
+    # Public resources need no lookup at all
+    assert has_access_many("user", "read", [None] * 10) == [True] * 10
+    assert lookups == ["user"]
+
+
+def test_mutators_keep_members_in_sync(Groups):
+    first = create_group(Groups, "first", ["a", "b", "b"])
+    second = create_group(Groups, "second", ["b", "c"])
+    assert_members_match(Groups)
+    assert Groups.get_group_ids_by_member_id("b") == {first.id, second.id}
+
+    # Updates without user_ids keep the members
+    Groups.update_group_by_id(first.id, GroupUpdateForm(name="first", description="x"))
+    assert Groups.get_group_by_id(first.id).user_ids == ["a", "b", "b"]
+    assert_members_match(Groups)
+
+    Groups.update_group_by_id(
+        first.id, GroupUpdateForm(name="first", description="", user_ids=["c"])
+    )
+    assert_members_match(Groups)
+    assert Groups.get_group_ids_by_member_id("a") == set()
+
+    Groups.remove_user_from_all_groups("c")
+    assert_members_match(Groups)
+    assert Groups.get_groups_by_member_id("c") == []
+
+    Groups.delete_group_by_id(second.id)
+    assert_members_match(Groups)
+    assert Groups.get_group_ids_by_member_id("b") == set()
+
+    create_group(Groups, "third", ["a"])
+    Groups.delete_all_groups()
+    assert_members_match(Groups)
+    assert Groups.get_group_ids_by_member_id("a") == set()
+
+
+def test_oauth_group_sync_keeps_members_in_sync(Groups, monkeypatch):
+    monkeypatch.setattr(
+        oauth, "auth_manager_config", SimpleNamespace(OAUTH_GROUPS_CLAIM="groups")
+    )
+
+    engineering = create_group(Groups, "engineering", ["other"])
+    sales = create_group(Groups, "sales", ["user"])
+    create_group(Groups, "support", [])
+
+    user = SimpleNamespace(id="user")
+    oauth.OAuthManager(app=None).update_user_groups(
+        user, {"groups": ["engineering", "support"]}, default_permissions={}
+    )
+
+    assert_members_match(Groups)
+    assert {group.name for group in Groups.get_groups_by_member_id("user")} == {
+        "engineering",
+        "support",
+    }
+    assert Groups.get_group_by_id(engineering.id).user_ids == ["other", "user"]
+    assert has_access("user", "read", {"read": {"group_ids": [engineering.id]}})
+    assert not has_access("user", "read", {"read": {"group_ids": [sales.id]}})
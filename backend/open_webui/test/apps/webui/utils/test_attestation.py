@@ -0,0 +1,274 @@
+import asyncio
+import json
+
+import aiohttp
+import pytest
+from open_webui.utils import attestation
+from open_webui.utils.attestation import AttestationClient
+
+BASE_URL = "http://provider"
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    async def json(self):
+        if not isinstance(self.body, dict):
+            raise aiohttp.ContentTypeError(None, ())
+        return self.body
+
+    async def text(self):
+        return self.body if isinstance(self.body, str) else json.dumps(self.body)
+
+
+class FakeSession:
+    """
+    The pooled provider session, answering signature and report requests.
+
+    `delays` holds the seconds before each chat completion id is answered and
+    `responses` a (status, body) or an exception to raise instead.
+    """
+
+    def __init__(self):
+        self.delays = {}
+        self.responses = {}
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+
+    def get(self, url, headers, params):
+        self.requests.append(url.removeprefix(BASE_URL))
+        return self._get(url.rsplit("/", 1)[-1])
+
+    @staticmethod
+    def signature(chat_completion_id):
+        return {"text": chat_completion_id, "signature": f"sig-{chat_completion_id}"}
+
+    async def _respond(self, id):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(id, 0))
+        finally:
+            self.in_flight -= 1
+
+        response = self.responses.get(id)
+        if isinstance(response, Exception):
+            raise response
+        if response is not None:
+            return FakeResponse(*response)
+        if id == "report":
+            return FakeResponse(200, {"report": len(self.requests)})
+        return FakeResponse(200, self.signature(id))
+
+    def _get(self, id):
+        session = self
+
+        class Request:
+            async def __aenter__(self):
+                return await session._respond(id)
+
+            async def __aexit__(self, *args):
+                pass
+
+        return Request()
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+
+    async def get_http_session():
+        return session
+
+    monkeypatch.setattr(attestation, "get_http_session", get_http_session)
+    return session
+
+
+async def collect(client, chat_completion_ids):
+    return [
+        json.loads(line)
+        async for line in client.stream_signatures(
+            BASE_URL, "key", "model", chat_completion_ids
+        )
+    ]
+
+
+def test_stream_yields_cached_signatures_first(session):
+    client = AttestationClient(report_ttl=60, signature_cache_size=16)
+    session.delays = {"a": 0.03, "c": 0.01}
+
+    async def run():
+        for id in ["b", "d"]:
+            await client.get_signature(BASE_URL, "key", "model", id)
+        return await collect(client, ["a", "b", "c", "d", "a"])
+
+    lines = asyncio.run(run())
+
+    assert [line["chat_completion_id"] for line in lines] == ["b", "d", "c", "a"]
+    assert lines[0] == {"chat_completion_id": "b", "signature": session.signature("b")}
+    # Duplicated and cached ids are not requested again
+    assert sorted(session.requests) == [
+        "/signature/a",
+        "/signature/b",
+        "/signature/c",
+        "/signature/d",
+    ]
+
+
+def test_stream_bounds_parallel_requests(session):
+    client = AttestationClient(
+        report_ttl=60, signature_cache_size=64, max_parallelism=3
+    )
+    ids = [f"id-{i}" for i in range(20)]
+    session.delays = {id: 0.01 for id in ids}
+
+    lines = asyncio.run(collect(client, ids))
+
+    assert sorted(line["chat_completion_id"] for line in lines) == sorted(ids)
+    assert session.peak == 3
+
+
+def test_stream_reports_errors_per_line(session):
+    client = AttestationClient(report_ttl=60, signature_cache_size=16)
+    session.responses = {
+        "missing": (404, {"detail": "Not found"}),
+        "offline": aiohttp.ClientConnectionError("refused"),
+        "broken": (200, "not json"),
+        "unsigned": (200, {"error": "not signed yet"}),
+    }
+
+    lines = asyncio.run(
+        collect(client, ["ok", "missing", "offline", "broken", "unsigned"])
+    )
+    lines = {line.pop("chat_completion_id"): line for line in lines}
+
+    assert lines["ok"] == {"signature": session.signature("ok")}
+    assert lines["missing"] == {
+        "error": "Model provider returned error: 404",
+        "status": 404,
+    }
+    assert lines["offline"] == {
+        "error": "Unable to connect to model provider",
+        "status": 503,
+    }
+    assert lines["broken"]["status"] == 500
+    assert lines["unsigned"] == {"signature": {"error": "not signed yet"}}
+
+    # Errors are not cached, the next request asks the provider again
+    assert client.get_cached_signature(BASE_URL, "model", "ok", "ecdsa")
+    assert client.get_cached_signature(BASE_URL, "model", "unsigned", "ecdsa") is None
+    assert client.get_cached_signature(BASE_URL, "model", "missing", "ecdsa") is None
+
+
+def test_stream_cancels_pending_requests_on_disconnect(session):
+    client = AttestationClient(
+        report_ttl=60, signature_cache_size=64, max_parallelism=2
+    )
+    ids = [f"id-{i}" for i in range(10)]
+    session.delays = {id: 0.05 for id in ids}
+    session.delays["id-0"] = 0
+
+    async def run():
+        stream = client.stream_signatures(BASE_URL, "key", "model", ids)
+        first = json.loads(await stream.__anext__())
+        # The client goes away after the first line
+        await stream.aclose()
+
+        sent = len(session.requests)
+        await asyncio.sleep(0.1)
+        return first, sent
+
+    first, sent = asyncio.run(run())
+
+    assert first["chat_completion_id"] == "id-0"
+    # Requests waiting for a slot are never sent
+    assert sent <= 3
+    assert len(session.requests) == sent
+
+
+def test_concurrent_signature_requests_are_shared(session):
+    client = AttestationClient(report_ttl=60, signature_cache_size=16)
+    session.delays = {"a": 0.01}
+
+    async def run():
+        return await asyncio.gather(
+            *[client.get_signature(BASE_URL, "key", "model", "a") for _ in range(5)]
+        )
+
+    assert asyncio.run(run()) == [session.signature("a")] * 5
+    assert session.requests == ["/signature/a"]
+
+
+def test_signature_cache_evicts_least_recently_used(session):
+    client = AttestationClient(report_ttl=60, signature_cache_size=2)
+
+    async def run(*ids):
+        for id in ids:
+            await client.get_signature(BASE_URL, "key", "model", id)
+
+    asyncio.run(run("a", "b"))
+    # "a" is used again, "b" is the least recently used signature
+    asyncio.run(run("a", "c"))
+    assert len(session.requests) == 3
+
+    asyncio.run(run("a", "c"))
+    assert len(session.requests) == 3
+    asyncio.run(run("b"))
+    assert session.requests[-1] == "/signature/b"
+
+    # Signatures are kept per model and signing algorithm
+    assert client.get_cached_signature(BASE_URL, "other", "b", "ecdsa") is None
+    assert client.get_cached_signature(BASE_URL, "model", "b", "ed25519") is None
+
+
+def test_report_is_refreshed_in_the_background(session, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(attestation.time, "time", lambda: now[0])
+    client = AttestationClient(report_ttl=60, signature_cache_size=16)
+
+    async def get_report():
+        report = await client.get_attestation_report(BASE_URL, "key", "model")
+        await asyncio.gather(*client._background_tasks)
+        return report
+
+    assert asyncio.run(get_report()) == {"report": 1}
+
+    now[0] += 59
+    assert asyncio.run(get_report()) == {"report": 1}
+    assert len(session.requests) == 1
+
+    # Stale, returned while a newer one is requested
+    now[0] += 2
+    assert asyncio.run(get_report()) == {"report": 1}
+    assert len(session.requests) == 2
+    assert asyncio.run(get_report()) == {"report": 2}
+
+    # Too old to be returned, requested right away
+    now[0] += 120
+    assert asyncio.run(get_report()) == {"report": 3}
+    assert session.requests == ["/attestation/report"] * 3
+
+
+def test_failed_report_refresh_keeps_the_cached_report(session, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(attestation.time, "time", lambda: now[0])
+    client = AttestationClient(report_ttl=60, signature_cache_size=16)
+
+    async def get_report():
+        report = await client.get_attestation_report(BASE_URL, "key", "model")
+        await asyncio.gather(*client._background_tasks)
+        return report
+
+    assert asyncio.run(get_report()) == {"report": 1}
+
+    now[0] += 90
+    session.responses = {"report": (502, {})}
+    assert asyncio.run(get_report()) == {"report": 1}
+    assert asyncio.run(get_report()) == {"report": 1}
+
+    now[0] += 60
+    with pytest.raises(attestation.HTTPException):
+        asyncio.run(get_report())
@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+from open_webui.retrieval.bm25 import BM25Index, BM25IndexStore
+
+DOCS = {
+    "1": "the quick brown fox jumps over the lazy dog",
+    "2": "the lazy cat sleeps all day",
+    "3": "a quick test of the index",
+    "4": "foxes and dogs are not cats",
+}
+
+
+def get_result(docs):
+    return SimpleNamespace(
+        ids=[list(docs.keys())],
+        documents=[list(docs.values())],
+        metadatas=[[{"file_id": f"file-{id}"} for id in docs]],
+    )
+
+
+def test_scores_match_rank_bm25():
+    from rank_bm25 import BM25Okapi
+
+    index = BM25Index()
+    for id, text in DOCS.items():
+        index.add(id, text, {})
+
+    okapi = BM25Okapi([text.split() for text in DOCS.values()])
+    for query in ["quick fox", "the lazy dog", "cats"]:
+        expected = dict(zip(DOCS.keys(), okapi.get_scores(query.split())))
+        for score, id, _, _ in index.search(query, k=10):
+            assert abs(score - expected[id]) < 1e-9
+
+
+def test_remove_keeps_index_consistent():
+    index = BM25Index()
+    for id, text in DOCS.items():
+        index.add(id, text, {"file_id": f"file-{id}"})
+
+    index.remove("1")
+    assert index.remove_where({"file_id": "file-3"}) == ["3"]
+
+    assert [id for _, id, _, _ in index.search("quick fox lazy", k=10)] == ["2"]
+    assert index.total_length == sum(index.doc_lengths.values())
+    assert "fox" not in index.postings
+
+
+def test_store_builds_once_and_follows_the_log(tmp_path):
+    fetches = []
+
+    def fetch():
+        fetches.append(True)
+        return get_result(DOCS)
+
+    store = BM25IndexStore(tmp_path, maxsize=2)
+
+    # Changes to collections without an index are not logged
+    store.add("kb", [{"id": "0", "text": "ignored", "metadata": {}}])
+    assert not (tmp_path / "kb.jsonl").exists()
+
+    assert [id for _, id, _, _ in store.search("kb", "fox", 10, fetch)] == ["1"]
+    store.add("kb", [{"id": "5", "text": "a fox in the snow", "metadata": {}}])
+    store.delete("kb", filter={"file_id": "file-1"})
+    assert [id for _, id, _, _ in store.search("kb", "fox", 10, fetch)] == ["5"]
+
+    # Another worker reads the same log
+    other = BM25IndexStore(tmp_path, maxsize=2)
+    assert [id for _, id, _, _ in other.search("kb", "fox", 10, fetch)] == ["5"]
+    assert len(fetches) == 1
+
+    store.drop("kb")
+    assert [id for _, id, _, _ in store.search("kb", "fox", 10, fetch)] == ["1"]
+    assert len(fetches) == 2
+    assert store.search("missing", "fox", 10, lambda: None) is None
+
+
+def test_store_replays_changes_made_while_building(tmp_path):
+    store = BM25IndexStore(tmp_path, maxsize=2)
+    fetches = []
+
+    def fetch():
+        fetches.append(True)
+        if len(fetches) == 1:
+            # The collection is fetched without holding the lock of its log
+            store.add("kb", [{"id": "5", "text": "a fox in the snow", "metadata": {}}])
+            store.delete("kb", ids=["1"])
+        return get_result(DOCS)
+
+    assert [id for _, id, _, _ in store.search("kb", "fox", 10, fetch)] == ["5"]
+    assert not (tmp_path / "kb.pending").exists()
+    assert len(fetches) == 1
+
+
+def test_store_discards_builds_dropped_while_fetching(tmp_path):
+    store = BM25IndexStore(tmp_path, maxsize=2)
+    fetches = []
+
+    def fetch():
+        fetches.append(True)
+        if len(fetches) == 1:
+            store.drop("kb")
+            return get_result({"0": "an outdated fox"})
+        return get_result(DOCS)
+
+    assert [id for _, id, _, _ in store.search("kb", "fox", 10, fetch)] == ["1"]
+    assert len(fetches) == 2
@@ -0,0 +1,322 @@
+import asyncio
+import base64
+import json
+import secrets
+from contextlib import contextmanager
+
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from open_webui.internal.db import Base
+from open_webui.models import chat_messages, chat_search_tokens
+from open_webui.models.chat_messages import ChatMessage, ChatMessages
+from open_webui.models.chat_search_tokens import ChatSearchToken
+from open_webui.models.chats import Chat, ChatForm
+from open_webui.models.user_data_keys import UserDataKeyModel
+from open_webui.test.util.mock_key_service import mock_key_service
+from open_webui.utils import chat_encryption_proxy, user_encryption
+from open_webui.utils.chat_encryption_proxy import (
+    assemble_chat_messages,
+    is_message_storage_chat,
+    split_chat_messages,
+)
+from open_webui.utils.user_encryption import EncryptionError, encrypt_message_data
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+def test_split_and_assemble_chat_messages():
+    messages = {
+        "a": {"id": "a", "parentId": None, "childrenIds": ["b"], "content": "hi"},
+        "b": {"id": "b", "parentId": "a", "childrenIds": [], "content": "hello"},
+    }
+    chat = {
+        "title": "Chat",
+        "history": {"messages": messages, "currentId": "b"},
+        "messages": [messages["a"], messages["b"]],
+    }
+
+    skeleton, split_messages = split_chat_messages(chat)
+
+    assert is_message_storage_chat(skeleton)
+    assert not is_message_storage_chat(chat)
+    assert split_messages == messages
+    assert "content" not in str(skeleton)
+    assert skeleton["history"]["messages"]["b"] == {
+        "parentId": "a",
+        "childrenIds": [],
+    }
+
+    assert assemble_chat_messages(skeleton, split_messages) == chat
+
+
+class InMemoryUserDataKeys:
+    def __init__(self):
+        self.keys = {}
+
+    def get_user_data_key_by_user_id(self, user_id):
+        return self.keys.get(user_id)
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    """An encryption proxy with per-message storage on an in-memory database."""
+    monkeypatch.setenv("ENABLE_CHAT_ENCRYPTION", "true")
+    monkeypatch.setenv("ENABLE_CHAT_MESSAGE_STORAGE", "true")
+    monkeypatch.setenv("ENABLE_CHAT_SEARCH_INDEX", "false")
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(
+        engine,
+        tables=[Chat.__table__, ChatMessage.__table__, ChatSearchToken.__table__],
+    )
+    get_db = contextmanager(
+        lambda: (yield from get_session(sessionmaker(bind=engine, autoflush=False)))
+    )
+    monkeypatch.setattr(chat_encryption_proxy, "get_db", get_db)
+    monkeypatch.setattr(chat_messages, "get_db", get_db)
+    monkeypatch.setattr(chat_search_tokens, "get_db", get_db)
+
+    store = InMemoryUserDataKeys()
+    monkeypatch.setattr(user_encryption, "UserDataKeys", store)
+
+    with mock_key_service(monkeypatch) as key_service:
+        store.keys["user"] = UserDataKeyModel(
+            user_id="user", encrypted_data_key=key_service.wrap_key()
+        )
+        yield chat_encryption_proxy.ChatTableEncryptionProxy()
+
+
+def get_session(session_factory):
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def make_chat(*contents):
+    messages = {}
+    for i, content in enumerate(contents):
+        messages[str(i)] = {
+            "id": str(i),
+            "parentId": str(i - 1) if i else None,
+            "childrenIds": [str(i + 1)] if i + 1 < len(contents) else [],
+            "content": content,
+        }
+    return {
+        "title": "Chat",
+        "history": {"messages": messages, "currentId": str(len(contents) - 1)},
+    }
+
+
+def test_failed_split_storage_drops_message_rows(proxy, monkeypatch):
+    chat = proxy.insert_new_chat("user", ChatForm(chat=make_chat("hi", "hello")))
+    assert len(ChatMessages.get_messages_by_chat_id(chat.id)) == 2
+
+    def fail(*args, **kwargs):
+        raise EncryptionError("failed")
+
+    # The chat is stored whole instead, its message rows would be stale
+    monkeypatch.setattr(chat_encryption_proxy, "encrypt_message_data", fail)
+    proxy.update_chat_by_id(chat.id, make_chat("hi", "changed"))
+
+    assert ChatMessages.get_messages_by_chat_id(chat.id) == []
+    assert proxy.get_messages_by_chat_id(chat.id)["1"]["content"] == "changed"
+    assert proxy.get_message_by_id_and_message_id(chat.id, "1")["content"] == (
+        "changed"
+    )
+    assert proxy.get_chat_by_id(chat.id).chat == make_chat("hi", "changed")
+
+
+def test_whole_chat_ignores_message_rows(proxy):
+    chat = proxy.insert_new_chat("user", ChatForm(chat=make_chat("hi", "hello")))
+
+    # Written by a worker with per-message storage off
+    proxy._message_storage_enabled = False
+    proxy.update_chat_by_id(chat.id, make_chat("hi", "changed"))
+    assert ChatMessages.get_messages_by_chat_id(chat.id) == []
+
+    # Rows left behind by an interrupted write are never read for whole chats
+    data, digest = encrypt_message_data({"content": "stale"}, "user")
+    ChatMessages.upsert_message(chat.id, "1", "user", data, digest)
+
+    assert proxy.get_messages_by_chat_id(chat.id)["1"]["content"] == "changed"
+    assert proxy.get_message_by_id_and_message_id(chat.id, "1")["content"] == (
+        "changed"
+    )
+
+
+def test_whole_chat_writes_skip_message_rows(proxy, monkeypatch):
+    proxy._message_storage_enabled = False
+    chat = proxy.insert_new_chat("user", ChatForm(chat=make_chat("hi")))
+
+    deletes = []
+    delete_messages = ChatMessages.delete_messages_by_chat_id
+    monkeypatch.setattr(
+        ChatMessages,
+        "delete_messages_by_chat_id",
+        lambda chat_id, db=None: deletes.append(chat_id)
+        or delete_messages(chat_id, db=db),
+    )
+
+    # Never stored split, there are no message rows to drop
+    proxy.update_chat_by_id(chat.id, make_chat("hi", "hello"))
+    assert deletes == []
+
+    proxy._message_storage_enabled = True
+    proxy.update_chat_by_id(chat.id, make_chat("hi", "hello", "split"))
+    assert deletes == []
+    assert len(ChatMessages.get_messages_by_chat_id(chat.id)) == 3
+
+    proxy._message_storage_enabled = False
+    proxy.update_chat_by_id(chat.id, make_chat("hi", "whole"))
+    assert deletes == [chat.id]
+    assert ChatMessages.get_messages_by_chat_id(chat.id) == []
+
+
+def test_replaced_message_content_is_reindexed(proxy):
+    proxy._search_index_enabled = True
+    chat = proxy.insert_new_chat("user", ChatForm(chat=make_chat("hi", "")))
+
+    def search(text):
+        return [
+            chat.id for chat in proxy.get_chats_by_user_id_and_search_text("user", text)
+        ]
+
+    # Streamed content only grows, its words are added
+    for content in ["quantum", "quantum physics"]:
+        proxy.save_message_to_chat_by_id_and_message_id(
+            chat.id, "1", {"content": content}, append=True
+        )
+    assert search("physics") == [chat.id]
+
+    proxy.save_message_to_chat_by_id_and_message_id(
+        chat.id, "1", {"content": "classical mechanics"}
+    )
+    assert search("quantum") == []
+    assert search("mechanics") == [chat.id]
+    assert search("hi") == [chat.id]
+
+
+def test_backfill_search_index(proxy):
+    # Written before the search index existed
+    chat = proxy.insert_new_chat("user", ChatForm(chat=make_chat("quantum")))
+    empty = proxy.insert_new_chat("user", ChatForm(chat={"title": ""}))
+
+    proxy._search_index_enabled = True
+    assert proxy.get_chats_by_user_id_and_search_text("user", "quantum") == []
+
+    assert proxy.index_unindexed_chats(limit=1) == 1
+    assert proxy.index_unindexed_chats() == 1
+    # Chats without any word are indexed too
+    assert proxy.index_unindexed_chats() == 0
+
+    assert [
+        chat.id
+        for chat in proxy.get_chats_by_user_id_and_search_text("user", "quantum")
+    ] == [chat.id]
+    assert {
+        chat.id for chat in proxy.get_chats_by_user_id_and_search_text("user", "")
+    } == {chat.id, empty.id}
+
+
+def encrypt_legacy(data, user_id):
+    key = user_encryption._get_encryption_service()._get_user_encryption_key(user_id)
+    nonce = secrets.token_bytes(12)
+    return base64.b64encode(
+        nonce + AESGCM(key).encrypt(nonce, json.dumps(data).encode(), None)
+    ).decode()
+
+
+def insert_legacy_chat(chat_data):
+    with chat_encryption_proxy.get_db() as db:
+        db.add(
+            Chat(
+                id="legacy",
+                user_id="user",
+                title=encrypt_legacy({"title": "Legacy"}, "user"),
+                chat=encrypt_legacy(chat_data, "user"),
+                created_at=0,
+                updated_at=0,
+            )
+        )
+        db.commit()
+
+
+def get_stored_chat(id):
+    with chat_encryption_proxy.get_db() as db:
+        return db.get(Chat, id)
+
+
+def test_legacy_chats_are_migrated_on_read(proxy):
+    insert_legacy_chat(make_chat("hi"))
+
+    chat = proxy.get_chat_by_id("legacy")
+    assert chat.chat == make_chat("hi")
+    assert chat.title == "Legacy"
+
+    stored = get_stored_chat("legacy")
+    assert user_encryption.is_envelope(stored.chat)
+    assert user_encryption.is_envelope(stored.title)
+    assert proxy.get_chat_by_id("legacy").chat == make_chat("hi")
+
+
+def test_legacy_migration_keeps_concurrent_writes(proxy, monkeypatch):
+    insert_legacy_chat(make_chat("hi"))
+
+    read = proxy._create_chat_model_from_db_record
+
+    def read_then_write(chat_record, messages=None):
+        chat_model = read(chat_record, messages)
+        # Another request saves the chat before the migration is written
+        proxy.update_chat_by_id("legacy", make_chat("hi", "newer"))
+        return chat_model
+
+    with monkeypatch.context() as patch:
+        patch.setattr(proxy, "_create_chat_model_from_db_record", read_then_write)
+        assert proxy.get_chat_by_id("legacy").chat == make_chat("hi")
+
+    assert proxy.get_chat_by_id("legacy").chat == make_chat("hi", "newer")
+    assert len(ChatMessages.get_messages_by_chat_id("legacy")) == 2
+
+
+def test_cold_key_cache_on_event_loop_fails_closed(proxy, monkeypatch):
+    chat = proxy.insert_new_chat("user", ChatForm(chat=make_chat("hi")))
+    service = user_encryption._get_encryption_service()
+    service.clear_cache()
+
+    async def handler():
+        # Lookups on the loop never wait for the key service
+        with monkeypatch.context() as patch:
+            patch.setattr(service._key_cache, "set", lambda user_id, key: None)
+
+            assert proxy.get_chat_by_id(chat.id) is None
+            assert proxy.update_chat_by_id(chat.id, make_chat("leaked")) is None
+            assert (
+                proxy.insert_new_chat("user", ChatForm(chat=make_chat("leaked")))
+                is None
+            )
+            assert not proxy.save_message_to_chat_by_id_and_message_id(
+                chat.id, "0", {"content": "leaked"}
+            )
+
+        # Loaded ahead, the synchronous calls only hit the key cache
+        await chat_encryption_proxy.prefetch_chat_encryption_key(chat.id)
+        return proxy.get_chat_by_id(chat.id)
+
+    assert asyncio.run(handler()).chat == make_chat("hi")
+
+    with chat_encryption_proxy.get_db() as db:
+        stored = db.query(Chat).all()
+        stored_messages = db.query(ChatMessage).all()
+
+    assert [row.id for row in stored] == [chat.id]
+    for value in [stored[0].chat, stored[0].title] + [
+        message.data for message in stored_messages
+    ]:
+        assert user_encryption.is_envelope(value)
@@ -0,0 +1,111 @@
+from open_webui.retrieval import utils
+from open_webui.retrieval.utils import EmbeddingCache
+
+
+class FakeEmbeddings:
+    """An embedding function recording the texts of each call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, query, prefix=None, user=None):
+        self.calls.append(list(query))
+        return [[float(len(text)), float(ord(text[0]))] for text in query]
+
+
+def test_only_missing_texts_are_embedded_once():
+    cache = EmbeddingCache(maxsize=16, ttl=60)
+    embed = FakeEmbeddings()
+    func = cache.wrap("openai", "model", embed, "http://a", "key")
+
+    assert func("ab") == [2.0, 97.0]
+    assert func(["ab", "cde", "fg", "cde"]) == [
+        [2.0, 97.0],
+        [3.0, 99.0],
+        [2.0, 102.0],
+        [3.0, 99.0],
+    ]
+    # Cached and duplicated texts are not sent again, the rest in one call
+    assert embed.calls == [["ab"], ["cde", "fg"]]
+
+    assert func(["fg", "ab"]) == [[2.0, 102.0], [2.0, 97.0]]
+    assert len(embed.calls) == 2
+
+
+def test_entries_are_keyed_by_endpoint_and_prefix():
+    cache = EmbeddingCache(maxsize=16, ttl=60)
+    embed = FakeEmbeddings()
+
+    cache.wrap("openai", "model", embed, "http://a", "key")("ab")
+    cache.wrap("openai", "model", embed, "http://b", "key")("ab")
+    cache.wrap("openai", "model", embed, "http://a", "other")("ab")
+    cache.wrap("openai", "model", embed, "http://a", "key")("ab", prefix="query")
+    assert len(embed.calls) == 4
+
+    cache.wrap("openai", "model", embed, "http://a", "key")("ab")
+    assert len(embed.calls) == 4
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(utils.time, "monotonic", lambda: now[0])
+
+    cache = EmbeddingCache(maxsize=16, ttl=60)
+    embed = FakeEmbeddings()
+    func = cache.wrap("openai", "model", embed)
+
+    func("ab")
+    now[0] += 59
+    func("ab")
+    assert len(embed.calls) == 1
+
+    now[0] += 2
+    func("ab")
+    assert len(embed.calls) == 2
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = EmbeddingCache(maxsize=2, ttl=60)
+    embed = FakeEmbeddings()
+    func = cache.wrap("openai", "model", embed)
+
+    func(["a", "b"])
+    # "a" is used again, "b" is the least recently used one
+    func("a")
+    func("c")
+    assert embed.calls == [["a", "b"], ["c"]]
+
+    func(["a", "c"])
+    assert len(embed.calls) == 2
+    func("b")
+    assert embed.calls[-1] == ["b"]
+
+
+def test_failed_batch_is_not_cached():
+    cache = EmbeddingCache(maxsize=16, ttl=60)
+    calls = []
+
+    def embed(query, prefix=None, user=None):
+        calls.append(list(query))
+        return None
+
+    func = cache.wrap("openai", "model", embed)
+    assert func(["a", "b"]) is None
+    assert func(["a", "b"]) is None
+    assert calls == [["a", "b"], ["a", "b"]]
+
+
+def test_ingestion_bypasses_the_cache(monkeypatch):
+    embed = FakeEmbeddings()
+    monkeypatch.setattr(
+        utils, "generate_embeddings", lambda text, **kwargs: embed(text)
+    )
+    monkeypatch.setattr(utils, "EMBEDDING_CACHE", EmbeddingCache(maxsize=16, ttl=60))
+
+    func = utils.get_embedding_function(
+        "openai", "model", None, "http://a", "key", 8, cache=False
+    )
+    func(["ab", "cd"])
+    func(["ab", "cd"])
+    assert len(embed.calls) == 2
+    assert not utils.EMBEDDING_CACHE._items
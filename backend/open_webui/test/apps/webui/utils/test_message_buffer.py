@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import pytest
+from open_webui.utils import message_buffer
+from open_webui.utils.message_buffer import (
+    MESSAGE_WRITE_BUFFER_STATS,
+    MessageWriteBuffer,
+    get_message_write_buffer_stats,
+)
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    saved = []
+    monkeypatch.setattr(
+        message_buffer.Chats,
+        "save_message_to_chat_by_id_and_message_id",
+        lambda chat_id, message_id, message, append=False: saved.append(dict(message))
+        or True,
+    )
+    MESSAGE_WRITE_BUFFER_STATS.reset()
+    return saved
+
+
+def test_flushes_on_byte_threshold(saved):
+    buffer = MessageWriteBuffer("chat", "message", flush_interval=60, flush_bytes=10)
+
+    buffer.add({"content": "hello"})
+    buffer.add({"content": "hello wor"})
+    assert saved == []
+
+    # 10 bytes of new content since the last write
+    buffer.add({"content": "hello world"})
+    assert saved == [{"content": "hello world"}]
+    assert not buffer.has_pending
+
+
+def test_flushes_on_interval(saved):
+    buffer = MessageWriteBuffer(
+        "chat", "message", flush_interval=0.05, flush_bytes=1000
+    )
+
+    buffer.add({"content": "a"})
+    assert saved == []
+
+    time.sleep(0.06)
+    buffer.add({"content": "ab"})
+    assert saved == [{"content": "ab"}]
+
+
+def test_flushes_stalled_stream_on_timer(saved):
+    async def run():
+        buffer = MessageWriteBuffer(
+            "chat", "message", flush_interval=0.05, flush_bytes=1000
+        )
+        buffer.add({"content": "a"})
+        assert saved == []
+
+        await asyncio.sleep(0.1)
+        assert saved == [{"content": "a"}]
+
+    asyncio.run(run())
+
+
+def test_flushes_at_stream_end(saved):
+    buffer = MessageWriteBuffer("chat", "message", flush_interval=60, flush_bytes=1000)
+
+    for content in ["a", "ab", "abc"]:
+        buffer.add({"content": content})
+    buffer.add({"model": "m"})
+    assert saved == []
+
+    buffer.flush()
+    assert saved == [{"content": "abc", "model": "m"}]
+
+    # Nothing left to write
+    buffer.flush()
+    assert len(saved) == 1
+
+    stats = get_message_write_buffer_stats()
+    assert stats["updates"] == 4
+    assert stats["flushes"] == 1
+    assert stats["coalescing_ratio"] == 4
+
+
+def test_failed_flush_keeps_updates_and_loads_the_key(monkeypatch):
+    results = [False, True]
+    saved = []
+    monkeypatch.setattr(
+        message_buffer.Chats,
+        "save_message_to_chat_by_id_and_message_id",
+        lambda chat_id, message_id, message, append=False: saved.append(dict(message))
+        or results.pop(0),
+    )
+    loaded = []
+
+    async def prefetch_user_encryption_key(user_id):
+        loaded.append(user_id)
+
+    monkeypatch.setattr(
+        message_buffer, "prefetch_user_encryption_key", prefetch_user_encryption_key
+    )
+
+    async def run():
+        buffer = MessageWriteBuffer(
+            "chat", "message", "user", flush_interval=60, flush_bytes=1000
+        )
+        buffer.add({"content": "a", "model": "m"})
+        await buffer.aflush()
+        assert buffer.has_pending
+
+        # Newer fields win over the ones kept from the failed write
+        buffer.add({"content": "ab"})
+        await buffer.aflush()
+        assert not buffer.has_pending
+
+    asyncio.run(run())
+
+    assert saved == [{"content": "a", "model": "m"}, {"content": "ab", "model": "m"}]
+    assert loaded == ["user", "user"]
@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from open_webui.utils import models as models_utils
+from open_webui.utils.models import ModelCatalog
+
+
+class FakeConfig:
+    def __init__(self):
+        self.listeners = {}
+        self.published = []
+
+    def add_invalidation_listener(self, name, listener):
+        self.listeners.setdefault(name, []).append(listener)
+
+    def publish_invalidation(self, name):
+        self.published.append(name)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    groups = {"alice": {"a"}, "bob": {"a"}, "carol": {"b"}, "dave": set()}
+    rows = {
+        "public": SimpleNamespace(id="public", user_id="admin", access_control=None),
+        "group-a": SimpleNamespace(
+            id="group-a",
+            user_id="admin",
+            access_control={"read": {"group_ids": ["a"], "user_ids": []}},
+        ),
+        "private": SimpleNamespace(
+            id="private",
+            user_id="carol",
+            access_control={"read": {"group_ids": [], "user_ids": ["dave"]}},
+        ),
+    }
+    loads = []
+
+    def get_all_models():
+        loads.append(True)
+        return list(rows.values())
+
+    monkeypatch.setattr(models_utils.Models, "get_all_models", get_all_models)
+    monkeypatch.setattr(
+        models_utils, "get_user_group_ids", lambda user_id: groups[user_id]
+    )
+
+    catalog = ModelCatalog(maxsize=8)
+    catalog.rows = rows
+    catalog.loads = loads
+    catalog.all_models = [
+        {"id": id, "name": id, "tags": []}
+        for id in ["public", "group-a", "private", "unknown"]
+    ]
+    return catalog
+
+
+def get_model_ids(catalog, user_id=None, model_order_list=None):
+    models = asyncio.run(
+        catalog.get_models(
+            catalog.all_models,
+            model_order_list or [],
+            user=SimpleNamespace(id=user_id, role="user") if user_id else None,
+        )
+    )
+    return [model["id"] for model in models]
+
+
+def test_group_signatures_are_memoised(catalog):
+    assert get_model_ids(catalog, "alice") == ["public", "group-a"]
+    assert get_model_ids(catalog, "bob") == ["public", "group-a"]
+    # Users with the same groups share one entry
+    assert len(catalog._visible) == 1
+
+    assert get_model_ids(catalog, "dave") == ["public", "private"]
+    assert len(catalog._visible) == 2
+    assert len(catalog.loads) == 1
+
+
+def test_owner_and_user_grants(catalog):
+    # The owner and the users granted by id, not through their groups
+    assert get_model_ids(catalog, "carol") == ["public", "private"]
+    assert get_model_ids(catalog, "dave") == ["public", "private"]
+    assert "private" not in get_model_ids(catalog, "alice")
+
+    # Admins get every model, unknown ones too
+    assert get_model_ids(catalog, model_order_list=["unknown"]) == [
+        "unknown",
+        "group-a",
+        "private",
+        "public",
+    ]
+
+
+def test_invalidation(catalog):
+    config = FakeConfig()
+    catalog.attach(config)
+
+    assert "group-a" not in get_model_ids(catalog, "carol")
+    get_model_ids(catalog, "carol")
+    assert len(catalog.loads) == 1
+
+    catalog.rows["group-a"].access_control["read"]["group_ids"].append("b")
+    catalog.invalidate()
+    assert config.published == ["models"]
+    assert "group-a" in get_model_ids(catalog, "carol")
+    assert len(catalog.loads) == 2
+
+    # Invalidated by another worker
+    catalog.rows["group-a"].access_control = {"read": {"group_ids": []}}
+    for listener in config.listeners["models"]:
+        listener()
+    assert "group-a" not in get_model_ids(catalog, "carol")
+    assert len(catalog.loads) == 3
+
+    # A new list from `get_all_models` is a new catalog as well
+    catalog.all_models = list(catalog.all_models)
+    get_model_ids(catalog, "carol")
+    assert len(catalog.loads) == 4
@@ -0,0 +1,127 @@
+import random
+import time
+
+from open_webui.models.models import ModelMeta, ModelModel, ModelParams
+from open_webui.utils.models import apply_custom_models
+
+
+def make_custom_model(id, base_model_id=None, is_active=True, action_ids=None):
+    return ModelModel(
+        id=id,
+        user_id="user",
+        base_model_id=base_model_id,
+        name=f"Custom {id}",
+        params=ModelParams(),
+        meta=ModelMeta(**({"actionIds": action_ids} if action_ids else {})),
+        is_active=is_active,
+        updated_at=0,
+        created_at=0,
+    )
+
+
+def test_overrides_and_hides_base_models():
+    models = [
+        {"id": "gpt-4o", "name": "gpt-4o", "owned_by": "openai"},
+        {"id": "llama3:7b", "name": "llama3:7b", "owned_by": "ollama"},
+        {"id": "llama3:70b", "name": "llama3:70b", "owned_by": "ollama"},
+        {"id": "mistral:7b", "name": "mistral:7b", "owned_by": "openai"},
+    ]
+
+    result = apply_custom_models(
+        models,
+        [
+            make_custom_model("gpt-4o", action_ids=["action"]),
+            make_custom_model("llama3", is_active=False),
+            # Only Ollama models are matched without their tag
+            make_custom_model("mistral", is_active=False),
+        ],
+    )
+
+    assert [model["id"] for model in result] == ["gpt-4o", "mistral:7b"]
+    assert result[0]["name"] == "Custom gpt-4o"
+    assert result[0]["info"]["id"] == "gpt-4o"
+    assert result[0]["action_ids"] == ["action"]
+    # The given list is left as is
+    assert len(models) == 4
+
+
+def test_appends_presets_owned_by_their_base_model():
+    models = [
+        {"id": "llama3:7b", "name": "llama3:7b", "owned_by": "ollama"},
+        {"id": "pipe", "name": "pipe", "owned_by": "openai", "pipe": {"type": "pipe"}},
+    ]
+
+    result = apply_custom_models(
+        models,
+        [
+            make_custom_model("assistant", base_model_id="llama3"),
+            make_custom_model("piped", base_model_id="pipe", action_ids=["action"]),
+            make_custom_model("nested", base_model_id="piped"),
+            make_custom_model("orphan", base_model_id="missing"),
+            make_custom_model("inactive", base_model_id="pipe", is_active=False),
+            make_custom_model("llama3:7b", base_model_id="pipe"),
+        ],
+    )
+
+    presets = {model["id"]: model for model in result if model.get("preset")}
+    assert list(presets) == ["assistant", "piped", "nested", "orphan"]
+    assert presets["assistant"]["owned_by"] == "ollama"
+    assert "pipe" not in presets["assistant"]
+    assert presets["piped"]["pipe"] == {"type": "pipe"}
+    assert presets["piped"]["action_ids"] == ["action"]
+    assert presets["nested"]["pipe"] == {"type": "pipe"}
+    assert presets["orphan"]["owned_by"] == "openai"
+
+
+def test_large_catalog_is_linear():
+    models, custom_models = generate_catalog(5000, 5000)
+
+    start = time.perf_counter()
+    result = apply_custom_models(models, custom_models)
+    elapsed = time.perf_counter() - start
+
+    # The nested loops took several seconds for this many models
+    assert elapsed < 1
+    assert len(result) == len(models) - 1250 + 2500
+
+
+def generate_catalog(num_models: int, num_custom_models: int):
+    models = [
+        {
+            "id": f"model-{i}:latest" if i % 2 else f"model-{i}",
+            "name": f"model-{i}",
+            "owned_by": "ollama" if i % 2 else "openai",
+        }
+        for i in range(num_models)
+    ]
+
+    custom_models = []
+    for i in range(num_custom_models):
+        if i % 2:
+            # Presets on a random base model
+            custom_models.append(
+                make_custom_model(
+                    f"preset-{i}",
+                    base_model_id=f"model-{random.randrange(num_models)}",
+                )
+            )
+        else:
+            # Overrides, one in two hiding its model
+            custom_models.append(make_custom_model(f"model-{i}", is_active=bool(i % 4)))
+
+    return models, custom_models
+
+
+if __name__ == "__main__":
+    # Microbenchmark: python -m open_webui.test.apps.webui.utils.test_models_overlay
+    for num_models, num_custom_models in [(500, 500), (1500, 1500), (5000, 5000)]:
+        models, custom_models = generate_catalog(num_models, num_custom_models)
+
+        start = time.perf_counter()
+        apply_custom_models(models, custom_models)
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"{num_models} models, {num_custom_models} custom models: "
+            f"{elapsed * 1000:.1f}ms"
+        )
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from open_webui.retrieval.executor import RetrievalExecutor
+
+
+def test_map_keeps_order_and_bounds_parallelism():
+    executor = RetrievalExecutor(max_workers=8, max_parallelism=3)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(item):
+        with lock:
+            running.append(item)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(item)
+        return item * 2
+
+    assert executor.map(work, range(10)) == [item * 2 for item in range(10)]
+    assert max(peak) <= 3
+    assert executor.get_stats()["tasks"] == 10
+
+
+def test_nested_map_on_saturated_pool():
+    # Every pool thread runs an outer task that maps again, the callers have to
+    # run the inner items themselves instead of waiting on the pool
+    executor = RetrievalExecutor(max_workers=2, max_parallelism=4)
+
+    def outer(item):
+        return sum(executor.map(lambda inner: item * inner, range(5)))
+
+    futures = [executor.pool.submit(outer, item) for item in range(4)]
+    assert [future.result(timeout=5) for future in futures] == [
+        item * 10 for item in range(4)
+    ]
+
+
+def test_stage_timing():
+    executor = RetrievalExecutor(max_workers=1, max_parallelism=1)
+    with executor.stage("search"):
+        pass
+    with executor.stage("search"):
+        pass
+
+    assert executor.get_stats()["stages"]["search"]["count"] == 2
@@ -0,0 +1,198 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.responses import StreamingResponse
+from open_webui.utils import message_buffer
+from open_webui.utils.message_buffer import MessageWriteBuffer
+from open_webui.utils.misc import (
+    get_stream_chunk_content,
+    get_stream_chunk_ids,
+    has_partial_start_tag,
+)
+
+
+def chunk(delta, **kwargs):
+    return json.dumps(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+            **kwargs,
+        }
+    )
+
+
+def test_get_stream_chunk_content():
+    assert get_stream_chunk_content(chunk({"content": "Hello"})) == "Hello"
+    assert get_stream_chunk_content(chunk({"content": 'say "hi"\né'})) == 'say "hi"\né'
+    assert (
+        get_stream_chunk_content(chunk({"content": "x", "reasoning_content": None}))
+        == "x"
+    )
+    assert get_stream_chunk_content(chunk({"content": "x"}, usage=None)) == "x"
+
+    # Anything but a plain content delta takes the regular path
+    assert get_stream_chunk_content(chunk({"role": "assistant"})) is None
+    assert get_stream_chunk_content(chunk({"content": ""})) is None
+    assert get_stream_chunk_content(chunk({"content": None})) is None
+    assert (
+        get_stream_chunk_content(chunk({"content": "x", "reasoning_content": "y"}))
+        is None
+    )
+    assert (
+        get_stream_chunk_content(chunk({"content": "x", "tool_calls": [{"index": 0}]}))
+        is None
+    )
+    assert get_stream_chunk_content(chunk({"content": "x"}, usage={})) is None
+    assert get_stream_chunk_content('{"selected_model_id": "m"}') is None
+    assert get_stream_chunk_content("[DONE]") is None
+
+
+def test_get_stream_chunk_ids():
+    assert get_stream_chunk_ids(chunk({"content": "Hello"}, model="gpt-4o")) == {
+        "id": "chatcmpl-1",
+        "model": "gpt-4o",
+    }
+    # Quotes in the content are escaped and never taken for a key
+    assert get_stream_chunk_ids(
+        json.dumps(
+            {
+                "choices": [{"delta": {"content": '{"id": "fake", "model": "x"}'}}],
+                "id": "chatcmpl-2",
+            }
+        )
+    ) == {"id": "chatcmpl-2"}
+    assert get_stream_chunk_ids('{"choices": [{"delta": {"content": "x"}}]}') == {}
+
+
+def test_has_partial_start_tag():
+    tags = ["think", "|begin_of_thought|"]
+
+    assert not has_partial_start_tag("a < b", tags)
+    assert not has_partial_start_tag("<b>bold</b>", tags)
+    assert has_partial_start_tag("Hello <", tags)
+    assert has_partial_start_tag("Hello <thi", tags)
+    assert has_partial_start_tag('Hello <think type="x', tags)
+    assert has_partial_start_tag("Hello <|begin_of", tags)
+
+
+def test_message_write_buffer_add_delta(monkeypatch):
+    saved = []
+    monkeypatch.setattr(
+        message_buffer.Chats,
+        "save_message_to_chat_by_id_and_message_id",
+        lambda chat_id, message_id, message, append=False: saved.append(message)
+        or True,
+    )
+
+    built = []
+    parts = []
+
+    def get_message():
+        built.append(len(parts))
+        return {"content": "".join(parts)}
+
+    buffer = MessageWriteBuffer("chat", "message", flush_interval=60, flush_bytes=10)
+    for part in ["abc", "def", "ghij", "k"]:
+        parts.append(part)
+        buffer.add_delta(len(part), get_message)
+
+    # The message is only built once the buffered deltas reach `flush_bytes`
+    assert built == [3]
+    assert saved == [{"content": "abcdefghij"}]
+    assert buffer.has_pending
+
+    buffer.add({"model": "m"})
+    buffer.flush()
+    assert saved[-1] == {"content": "abcdefghijk", "model": "m"}
+    assert not buffer.has_pending
+
+
+class FakeChats:
+    def save_message_to_chat_by_id_and_message_id(
+        self, chat_id, message_id, message, append=False
+    ):
+        return True
+
+    def get_message_by_id_and_message_id(self, chat_id, message_id):
+        return None
+
+    def get_messages_by_chat_id(self, chat_id):
+        return None
+
+    def get_chat_title_by_id(self, chat_id):
+        return "Chat"
+
+
+@pytest.mark.parametrize("realtime_save", [False, True])
+def test_stream_mixes_fast_and_regular_chunks(monkeypatch, realtime_save):
+    # Imported here, the chat response handling pulls in the retrieval stack
+    from open_webui.utils import middleware
+
+    events = []
+    tasks = []
+
+    async def event_emitter(event):
+        events.append(event)
+
+    async def noop(*args, **kwargs):
+        return True
+
+    monkeypatch.setattr(middleware, "ENABLE_REALTIME_CHAT_SAVE", realtime_save)
+    monkeypatch.setattr(middleware, "Chats", FakeChats())
+    monkeypatch.setattr(message_buffer, "Chats", FakeChats())
+    monkeypatch.setattr(middleware, "get_event_emitter", lambda metadata: event_emitter)
+    monkeypatch.setattr(middleware, "get_event_call", lambda metadata: noop)
+    monkeypatch.setattr(middleware, "get_sorted_filter_functions", lambda model: [])
+    monkeypatch.setattr(middleware, "get_active_status_by_user_id", noop)
+    monkeypatch.setattr(middleware, "prefetch_user_encryption_key", noop)
+    monkeypatch.setattr(message_buffer, "prefetch_user_encryption_key", noop)
+    monkeypatch.setattr(
+        middleware, "create_task", lambda coroutine, id: (tasks.append(coroutine), None)
+    )
+
+    async def body():
+        # A plain delta, a regular one with a tag, then a plain one again
+        for delta in [
+            {"role": "assistant"},
+            {"content": "Hello"},
+            {"content": " <b>world</b>\n"},
+            {"content": "again"},
+        ]:
+            yield f"data: {chunk(delta)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    async def run():
+        await middleware.process_chat_response(
+            SimpleNamespace(),
+            StreamingResponse(body(), media_type="text/event-stream"),
+            {"model": "m", "messages": [{"role": "user", "content": "hi"}]},
+            SimpleNamespace(id="user", email="", name="", role="user"),
+            {"session_id": "session", "chat_id": "chat", "message_id": "message"},
+            {},
+            [],
+            None,
+        )
+        await tasks[0]
+
+    asyncio.run(run())
+
+    # What the client shows, appending deltas and replacing with snapshots
+    content = ""
+    for event in events:
+        data = event["data"]
+        if data.get("done"):
+            break
+        if "choices" in data:
+            content += data["choices"][0]["delta"].get("content") or ""
+        if "content" in data:
+            content = data["content"]
+
+    assert content == "Hello <b>world</b>\nagain"
+    # Plain deltas before the first snapshot still take the fast path
+    assert events[1]["data"] == {
+        "id": "chatcmpl-1",
+        "choices": [{"delta": {"content": "Hello"}}],
+    }
@@ -0,0 +1,249 @@
+import asyncio
+
+import pytest
+from open_webui.models.user_data_keys import UserDataKeyModel
+from open_webui.test.util.mock_key_service import mock_key_service
+from open_webui.utils import user_encryption
+
+
+class InMemoryUserDataKeys:
+    def __init__(self):
+        self.keys = {}
+
+    def get_user_data_key_by_user_id(self, user_id):
+        return self.keys.get(user_id)
+
+    def get_user_data_keys_by_user_ids(self, user_ids):
+        return [self.keys[user_id] for user_id in user_ids if user_id in self.keys]
+
+    def create_user_data_key(self, user_id, encrypted_data_key):
+        self.keys[user_id] = UserDataKeyModel(
+            user_id=user_id, encrypted_data_key=encrypted_data_key
+        )
+        return self.keys[user_id]
+
+
+@pytest.fixture
+def user_data_keys(monkeypatch):
+    store = InMemoryUserDataKeys()
+    monkeypatch.setattr(user_encryption, "UserDataKeys", store)
+    return store
+
+
+def add_users(key_service, store, count):
+    user_ids = [f"user-{i}" for i in range(count)]
+    for user_id in user_ids:
+        store.create_user_data_key(user_id, key_service.wrap_key())
+    return user_ids
+
+
+def test_key_cache_lru_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(user_encryption.time, "monotonic", lambda: now[0])
+
+    evicted = []
+    cache = user_encryption.KeyCache(max_size=2, ttl=60)
+    cache.add_eviction_hook(lambda user_id, reason: evicted.append((user_id, reason)))
+
+    cache.set("a", b"a")
+    cache.set("b", b"b")
+    assert cache.get("a") == b"a"
+
+    # "b" is the least recently used key
+    cache.set("c", b"c")
+    assert cache.get("b") is None
+    assert evicted == [("b", "capacity")]
+
+    now[0] += 59
+    assert cache.get("a") == b"a"
+    # Reading a key does not extend its lifetime
+    now[0] += 2
+    assert cache.get("a") is None
+    assert evicted[-1] == ("a", "expired")
+    assert "a" not in cache
+
+    cache.set("d", b"d")
+    cache.evict("c")
+    assert evicted[-1] == ("c", "explicit")
+    cache.clear()
+    assert evicted[-1] == ("d", "explicit")
+    assert len(cache) == 0
+
+
+def test_key_cache_without_limits(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(user_encryption.time, "monotonic", lambda: now[0])
+
+    cache = user_encryption.KeyCache(max_size=0, ttl=None)
+    for i in range(100):
+        cache.set(str(i), b"key")
+
+    now[0] += 10**6
+    assert len(cache) == 100
+    assert cache.get("0") == b"key"
+
+
+def test_concurrent_lookups_are_coalesced(monkeypatch, user_data_keys):
+    with mock_key_service(monkeypatch) as key_service:
+        (user_id,) = add_users(key_service, user_data_keys, 1)
+        service = user_encryption._get_encryption_service()
+
+        decrypt = key_service.decrypt_data_key
+
+        async def slow_decrypt(encrypted_key):
+            # Keeps the first lookup in flight while the others arrive
+            await asyncio.sleep(0.05)
+            return await decrypt(encrypted_key)
+
+        monkeypatch.setattr(key_service, "decrypt_data_key", slow_decrypt)
+
+        async def lookup():
+            return await asyncio.gather(
+                *[service.get_user_encryption_key_async(user_id) for _ in range(10)],
+                # Worker threads waiting on the same key join the same lookup
+                *[
+                    asyncio.to_thread(service._get_user_encryption_key, user_id)
+                    for _ in range(5)
+                ],
+            )
+
+        keys = asyncio.run(lookup())
+
+        assert len(set(keys)) == 1
+        assert key_service.calls["/keys/decrypt"] == 1
+        assert not service._pending_keys
+        assert service._get_user_encryption_key(user_id) == keys[0]
+        assert key_service.calls["/keys/decrypt"] == 1
+
+
+def test_lookup_on_event_loop_does_not_wait(monkeypatch, user_data_keys):
+    with mock_key_service(monkeypatch) as key_service:
+        (user_id,) = add_users(key_service, user_data_keys, 1)
+        service = user_encryption._get_encryption_service()
+
+        async def handler():
+            # A synchronous lookup from a request handler on a cache miss
+            with pytest.raises(user_encryption.EncryptionError):
+                service._get_user_encryption_key(user_id)
+
+            # The key is loaded in the background for the next lookups
+            for _ in range(100):
+                if user_id in service._key_cache:
+                    break
+                await asyncio.sleep(0.01)
+            return service._get_user_encryption_key(user_id)
+
+        assert len(asyncio.run(handler())) == 32
+        assert key_service.calls["/keys/decrypt"] == 1
+
+
+def test_batch_unwrap(monkeypatch, user_data_keys):
+    with mock_key_service(monkeypatch, batch_size=4) as key_service:
+        user_ids = add_users(key_service, user_data_keys, 10)
+        service = user_encryption._get_encryption_service()
+
+        keys = service.get_user_encryption_keys(user_ids + ["unknown"])
+
+        assert sorted(keys) == sorted(user_ids)
+        assert all(len(key) == 32 for key in keys.values())
+        assert key_service.calls["/keys/decrypt/batch"] == 3
+        assert key_service.calls["/keys/decrypt"] == 0
+
+        # Everything is served from the cache afterwards
+        assert service.get_user_encryption_keys(user_ids) == keys
+        assert key_service.calls["/keys/decrypt/batch"] == 3
+
+
+def test_batch_unwrap_without_batch_endpoint(monkeypatch, user_data_keys):
+    with mock_key_service(monkeypatch, supports_batch=False) as key_service:
+        user_ids = add_users(key_service, user_data_keys, 5)
+        service = user_encryption._get_encryption_service()
+
+        keys = service.get_user_encryption_keys(user_ids)
+
+        assert sorted(keys) == sorted(user_ids)
+        assert key_service.calls["/keys/decrypt"] == 5
+        assert not key_service.supports_batch
+
+
+def test_prewarm_keys(monkeypatch, user_data_keys):
+    from open_webui.models.users import Users
+
+    with mock_key_service(monkeypatch) as key_service:
+        user_ids = add_users(key_service, user_data_keys, 3)
+        monkeypatch.setattr(Users, "get_active_user_ids", lambda since: user_ids[:2])
+        service = user_encryption._get_encryption_service()
+
+        assert asyncio.run(service.prewarm_keys(active_within=600)) == 2
+        assert user_ids[0] in service._key_cache
+        assert user_ids[2] not in service._key_cache
+        assert key_service.calls["/keys/decrypt/batch"] == 1
+
+
+def test_envelope_round_trip(monkeypatch):
+    key = bytes(range(32))
+    plaintext = b'{"content":"' + b"hello world " * 500 + b'"}'
+
+    # Not compressed by default
+    envelope = user_encryption.seal_envelope(key, plaintext)
+    assert len(envelope) > len(plaintext)
+    assert user_encryption.open_envelope(key, envelope) == plaintext
+
+    monkeypatch.setattr(user_encryption, "CHAT_ENCRYPTION_COMPRESSION", "deflate")
+    envelope = user_encryption.seal_envelope(key, plaintext)
+
+    assert user_encryption.is_envelope(envelope)
+    assert len(envelope) < len(plaintext)
+    assert user_encryption.open_envelope(key, envelope) == plaintext
+
+    with pytest.raises(user_encryption.EncryptionError):
+        user_encryption.open_envelope(bytes(32), envelope)
+
+
+def test_decrypt_legacy_format(monkeypatch, user_data_keys):
+    import base64
+    import json
+    import secrets
+
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    with mock_key_service(monkeypatch) as key_service:
+        (user_id,) = add_users(key_service, user_data_keys, 1)
+        service = user_encryption._get_encryption_service()
+        key = service._get_user_encryption_key(user_id)
+
+        nonce = secrets.token_bytes(12)
+        legacy = base64.b64encode(
+            nonce + AESGCM(key).encrypt(nonce, json.dumps({"a": 1}).encode(), None)
+        ).decode()
+
+        assert user_encryption.is_legacy_encrypted_data(legacy)
+        assert service.decrypt_data(legacy, user_id) == {"a": 1}
+
+        envelope = service.encrypt_data({"a": 1}, user_id)
+        assert not user_encryption.is_legacy_encrypted_data(envelope)
+        assert service.decrypt_data(envelope, user_id) == {"a": 1}
+
+
+def test_search_tokens(monkeypatch, user_data_keys):
+    assert user_encryption.normalize_search_words("Zürich, ZURICH! re-run") == {
+        "zurich",
+        "re",
+        "run",
+    }
+    assert user_encryption.expand_search_prefixes(["quantum"]) == {
+        "qua",
+        "quan",
+        "quant",
+        "quantu",
+        "quantum",
+    }
+
+    with mock_key_service(monkeypatch) as key_service:
+        user_a, user_b = add_users(key_service, user_data_keys, 2)
+
+        index = user_encryption.get_search_index_tokens(["Quantum research"], user_a)
+        query = user_encryption.get_search_query_tokens("QUANT", user_a)
+
+        assert query <= index
+        assert not user_encryption.get_search_query_tokens("quant", user_b) & index
@@ -0,0 +1,72 @@
+import base64
+import secrets
+from contextlib import contextmanager
+from typing import Optional
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from open_webui.utils.user_encryption import KeyServiceClient, KeyServiceError
+
+
+class LocalKeyService(KeyServiceClient):
+    """
+    In-process stand-in for the external key service.
+
+    Data keys are wrapped with a random master key instead of a TEE-held one. All
+    endpoints used by `KeyServiceClient` are served without any network I/O and
+    every call is counted in `calls` so tests can assert on round trips.
+    """
+
+    def __init__(self, supports_batch: bool = True, batch_size: int = 100):
+        super().__init__("http://local-key-service", batch_size=batch_size)
+        self.batch_endpoint = supports_batch
+        self.calls = {"/keys": 0, "/keys/decrypt": 0, "/keys/decrypt/batch": 0}
+
+        self._master_key = AESGCM(secrets.token_bytes(32))
+
+    def wrap_key(self, key: Optional[bytes] = None) -> str:
+        key = key or secrets.token_bytes(32)
+        nonce = secrets.token_bytes(12)
+        return base64.b64encode(
+            nonce + self._master_key.encrypt(nonce, key.hex().encode(), None)
+        ).decode()
+
+    def _unwrap_key(self, encrypted_key: str) -> str:
+        try:
+            data = base64.b64decode(encrypted_key)
+            return self._master_key.decrypt(data[:12], data[12:], None).decode()
+        except Exception:
+            raise KeyServiceError(400, "Invalid key")
+
+    async def _post(self, path: str, payload: Optional[dict] = None) -> dict:
+        if path not in self.calls or (
+            path == "/keys/decrypt/batch" and not self.batch_endpoint
+        ):
+            raise KeyServiceError(404, "Not Found")
+
+        self.calls[path] += 1
+
+        if path == "/keys":
+            return {"key": self.wrap_key()}
+        elif path == "/keys/decrypt":
+            return {"decryptedKey": self._unwrap_key(payload["key"])}
+        else:
+            return {"decryptedKeys": [self._unwrap_key(key) for key in payload["keys"]]}
+
+
+@contextmanager
+def mock_key_service(monkeypatch, **kwargs):
+    """Route the global encryption service through a `LocalKeyService`."""
+    from open_webui.utils import user_encryption
+
+    monkeypatch.setenv("KEY_SERVICE_BASE_URL", "http://local-key-service")
+    monkeypatch.setattr(user_encryption, "_user_encryption_service", None)
+
+    service = user_encryption._get_encryption_service()
+    key_service = LocalKeyService(**kwargs)
+    service._key_client = key_service
+
+    try:
+        yield key_service
+    finally:
+        key_service.close()
+        monkeypatch.setattr(user_encryption, "_user_encryption_service", None)
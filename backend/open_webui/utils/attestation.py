@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Union
+
+import aiohttp
+from fastapi import HTTPException, status
+from open_webui.env import (
+    ATTESTATION_REPORT_CACHE_TTL,
+    SIGNATURE_BATCH_MAX_PARALLELISM,
+    SIGNATURE_CACHE_SIZE,
+    SRC_LOG_LEVELS,
+)
+from open_webui.routers.openai import get_http_session
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class AttestationClient:
+    """
+    Attestation reports and chat completion signatures of the model providers,
+    requested through the pooled session of the OpenAI router.
+
+    Signatures never change once issued, the last `signature_cache_size` are
+    kept by (base url, model, chat completion id, signing algo). Attestation
+    reports are kept `report_ttl` seconds per (base url, model); for as long
+    again the cached report is returned while a background task refreshes it.
+
+    Concurrent requests for the same signature or report share one request to
+    the provider. `get_signatures` requests at most `max_parallelism`
+    signatures of a batch at once.
+    """
+
+    def __init__(
+        self, report_ttl: int, signature_cache_size: int, max_parallelism: int = 8
+    ):
+        self.report_ttl = report_ttl
+        self.signature_cache_size = signature_cache_size
+        self.max_parallelism = max_parallelism
+
+        # (base url, model) -> (report, fetched at)
+        self._reports: dict[tuple[str, str], tuple[dict, float]] = {}
+        self._signatures: OrderedDict[tuple[str, str, str, str], dict] = OrderedDict()
+
+        self._pending: dict[tuple, asyncio.Future] = {}
+        self._background_tasks: set[asyncio.Task] = set()
+
+    async def _get_json(self, url: str, key: str, params: dict) -> dict:
+        session = await get_http_session()
+        async with session.get(
+            url,
+            headers={
+                "Authorization": f"Bearer {key}",
+                "Content-Type": "application/json",
+            },
+            params=params,
+        ) as response:
+            if response.status != 200:
+                raise HTTPException(
+                    status_code=response.status,
+                    detail=f"Model provider returned error: {response.status}",
+                )
+
+            # Handle responses that return JSON but with text/plain content-type
+            try:
+                return await response.json()
+            except Exception as json_error:
+                log.warning(f"Failed to parse response as JSON: {json_error}")
+                # Try to read as text and parse manually
+                text_content = await response.text()
+                try:
+                    return json.loads(text_content)
+                except json.JSONDecodeError as e:
+                    log.error(f"Failed to parse response text as JSON: {e}")
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"Invalid JSON response from model provider: {text_content}",
+                    )
+
+    async def _fetch_once(self, key: tuple, fetch: Callable[[], Awaitable[dict]]):
+        """Run `fetch` once for all the concurrent callers with the same `key`."""
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._pending[key] = future
+
+            def done(future: asyncio.Future):
+                self._pending.pop(key, None)
+                # Raised to the callers, retrieved so it is not logged as unhandled
+                if not future.cancelled():
+                    future.exception()
+
+            future.add_done_callback(done)
+
+        # A caller going away does not cancel the request of the others
+        return await asyncio.shield(future)
+
+    def get_cached_signature(
+        self, base_url: str, model: str, chat_completion_id: str, signing_algo: str
+    ):
+        cache_key = (base_url, model, chat_completion_id, signing_algo)
+        signature = self._signatures.get(cache_key)
+        if signature is not None:
+            self._signatures.move_to_end(cache_key)
+        return signature
+
+    async def get_signature(
+        self,
+        base_url: str,
+        key: str,
+        model: str,
+        chat_completion_id: str,
+        signing_algo: str = "ecdsa",
+    ) -> dict:
+        signature = self.get_cached_signature(
+            base_url, model, chat_completion_id, signing_algo
+        )
+        if signature is not None:
+            return signature
+
+        cache_key = (base_url, model, chat_completion_id, signing_algo)
+        signature = await self._fetch_once(
+            ("signature", *cache_key),
+            lambda: self._get_json(
+                f"{base_url}/signature/{chat_completion_id}",
+                key,
+                {"model": model, "signing_algo": signing_algo},
+            ),
+        )
+
+        # Only actual signatures, not errors returned with a 200
+        if isinstance(signature, dict) and signature.get("signature"):
+            self._signatures[cache_key] = signature
+            self._signatures.move_to_end(cache_key)
+            while len(self._signatures) > self.signature_cache_size:
+                self._signatures.popitem(last=False)
+
+        return signature
+
+    async def get_signatures(
+        self,
+        base_url: str,
+        key: str,
+        model: str,
+        chat_completion_ids: list[str],
+        signing_algo: str = "ecdsa",
+    ) -> AsyncIterator[tuple[str, Union[dict, Exception]]]:
+        """
+        Yield (chat completion id, signature or error) as they are available,
+        the cached signatures first.
+        """
+        missing = []
+        for chat_completion_id in dict.fromkeys(chat_completion_ids):
+            signature = self.get_cached_signature(
+                base_url, model, chat_completion_id, signing_algo
+            )
+            if signature is not None:
+                yield chat_completion_id, signature
+            else:
+                missing.append(chat_completion_id)
+
+        semaphore = asyncio.Semaphore(self.max_parallelism)
+
+        async def fetch(chat_completion_id: str):
+            async with semaphore:
+                try:
+                    return chat_completion_id, await self.get_signature(
+                        base_url, key, model, chat_completion_id, signing_algo
+                    )
+                except Exception as e:
+                    return chat_completion_id, e
+
+        tasks = [
+            asyncio.create_task(fetch(chat_completion_id))
+            for chat_completion_id in missing
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # The client went away, drop the requests not sent yet
+            for task in tasks:
+                task.cancel()
+
+    async def stream_signatures(
+        self,
+        base_url: str,
+        key: str,
+        model: str,
+        chat_completion_ids: list[str],
+        signing_algo: str = "ecdsa",
+    ) -> AsyncIterator[str]:
+        """
+        `get_signatures` as JSON lines, either
+        {"chat_completion_id", "signature": MessageSignature} or
+        {"chat_completion_id", "error", "status"}.
+        """
+        async for chat_completion_id, result in self.get_signatures(
+            base_url, key, model, chat_completion_ids, signing_algo
+        ):
+            if isinstance(result, HTTPException):
+                line = {"error": result.detail, "status": result.status_code}
+            elif isinstance(result, aiohttp.ClientError):
+                log.error(f"Error connecting to model provider: {result}")
+                line = {
+                    "error": "Unable to connect to model provider",
+                    "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+                }
+            elif isinstance(result, Exception):
+                log.error(f"Error getting signature: {result}")
+                line = {
+                    "error": "Internal server error",
+                    "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                }
+            else:
+                line = {"signature": result}
+
+            yield json.dumps({"chat_completion_id": chat_completion_id, **line}) + "\n"
+
+    async def _refresh_report(self, base_url: str, key: str, model: str) -> dict:
+        report = await self._fetch_once(
+            ("report", base_url, model),
+            lambda: self._get_json(
+                f"{base_url}/attestation/report", key, {"model": model}
+            ),
+        )
+        self._reports[(base_url, model)] = (report, time.time())
+        return report
+
+    async def _refresh_report_in_background(self, base_url: str, key: str, model: str):
+        try:
+            await self._refresh_report(base_url, key, model)
+        except Exception as e:
+            log.warning(f"Failed to refresh the attestation report of {model}: {e}")
+
+    async def get_attestation_report(self, base_url: str, key: str, model: str) -> dict:
+        cached = self._reports.get((base_url, model))
+        if cached is not None:
+            report, fetched_at = cached
+            age = time.time() - fetched_at
+
+            if age < self.report_ttl:
+                return report
+
+            if age < 2 * self.report_ttl:
+                if ("report", base_url, model) not in self._pending:
+                    task = asyncio.create_task(
+                        self._refresh_report_in_background(base_url, key, model)
+                    )
+                    self._background_tasks.add(task)
+                    task.add_done_callback(self._background_tasks.discard)
+                return report
+
+        return await self._refresh_report(base_url, key, model)
+
+
+ATTESTATION_CLIENT = AttestationClient(
+    report_ttl=ATTESTATION_REPORT_CACHE_TTL,
+    signature_cache_size=SIGNATURE_CACHE_SIZE,
+    max_parallelism=SIGNATURE_BATCH_MAX_PARALLELISM,
+)
@@ -1,4 +1,7 @@
+import asyncio
 import logging
+import threading
+import time
 import uuid
 import jwt
 import base64
@@ -21,6 +24,7 @@ from open_webui.env import (
     TRUSTED_SIGNATURE_KEY,
     STATIC_DIR,
     SRC_LOG_LEVELS,
+    USER_LAST_ACTIVE_FLUSH_INTERVAL,
 )
 
 from fastapi import BackgroundTasks, Depends, HTTPException, Request, Response, status
@@ -143,6 +147,42 @@ def create_api_key():
     return f"sk-{key}"
 
 
+class LastActiveWriter:
+    """
+    Aggregates the last active timestamps of authenticated users in memory and
+    writes them with a single UPDATE per `flush`, instead of one UPDATE and
+    re-SELECT per request.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, user_id: str) -> None:
+        with self._lock:
+            self._pending[user_id] = int(time.time())
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if pending and not Users.update_users_last_active_by_ids(pending):
+            # Keep the timestamps for the next flush unless newer ones arrived
+            with self._lock:
+                self._pending = {**pending, **self._pending}
+
+
+LAST_ACTIVE_WRITER = LastActiveWriter()
+
+
+async def periodic_last_active_flush(
+    interval: float = USER_LAST_ACTIVE_FLUSH_INTERVAL,
+):
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(LAST_ACTIVE_WRITER.flush)
+
+
 def get_http_authorization_cred(auth_header: Optional[str]):
     if not auth_header:
         return None
@@ -206,17 +246,16 @@ def get_current_user(
         )
 
     if data is not None and "id" in data:
-        user = Users.get_user_by_id(data["id"])
+        user = Users.get_user_by_id_cached(data["id"])
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=ERROR_MESSAGES.INVALID_TOKEN,
             )
         else:
-            # Refresh the user's last active timestamp asynchronously
-            # to prevent blocking the request
+            # Refresh the user's last active timestamp with the next batched write
             if background_tasks:
-                background_tasks.add_task(Users.update_user_last_active_by_id, user.id)
+                LAST_ACTIVE_WRITER.touch(user.id)
         return user
     else:
         raise HTTPException(
@@ -234,7 +273,7 @@ def get_current_user_by_api_key(api_key: str):
             detail=ERROR_MESSAGES.INVALID_TOKEN,
         )
     else:
-        Users.update_user_last_active_by_id(user.id)
+        LAST_ACTIVE_WRITER.touch(user.id)
 
     return user
 
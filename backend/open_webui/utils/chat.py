@@ -26,7 +26,10 @@ from open_webui.routers.pipelines import (
     process_pipeline_outlet_filter,
 )
 from open_webui.socket.main import get_event_call, get_event_emitter, sio
-from open_webui.utils.filter import get_sorted_filter_ids, process_filter_functions
+from open_webui.utils.filter import (
+    get_sorted_filter_functions,
+    process_filter_functions,
+)
 from open_webui.utils.models import check_model_access, get_all_models
 from open_webui.utils.payload import convert_payload_openai_to_ollama
 from open_webui.utils.plugin import load_function_module_by_id
@@ -320,10 +323,7 @@ async def chat_completed(request: Request, form_data: dict, user: Any):
     }
 
     try:
-        filter_functions = [
-            Functions.get_function_by_id(filter_id)
-            for filter_id in get_sorted_filter_ids(model)
-        ]
+        filter_functions = get_sorted_filter_functions(model)
 
         result, _ = await process_filter_functions(
             request=request,
@@ -1,22 +1,156 @@
+import asyncio
+import json
 import logging
+import os
+import threading
 import time
 import uuid
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Iterator, Optional
 
 from open_webui.internal.db import get_db
-from open_webui.models.chats import Chat, ChatForm, ChatImportForm, ChatModel, ChatTable
+from open_webui.models.chat_messages import ChatMessageModel, ChatMessages
+from open_webui.models.chat_search_tokens import ChatSearchToken, ChatSearchTokens
+from open_webui.models.chats import (
+    Chat,
+    ChatForm,
+    ChatImportForm,
+    ChatModel,
+    ChatTable,
+    ChatTitleIdResponse,
+)
 from open_webui.utils.user_encryption import (
     EncryptionError,
     UserEncryptionConfig,
     decrypt_chat_data,
     decrypt_title_data,
     encrypt_chat_data,
+    encrypt_message_data,
     encrypt_title_data,
+    get_search_index_tokens,
+    get_search_query_tokens,
+    is_legacy_encrypted_data,
+    prefetch_user_encryption_key,
 )
+from sqlalchemy import Text, cast, or_, update
+from sqlalchemy.sql import exists
 
 log = logging.getLogger(__name__)
 
 
+####################
+# Bulk decryption
+####################
+
+# AES-GCM and decompression release the GIL, so bulk reads decrypt pages of chats
+# on a bounded pool shared by all requests instead of one row at a time.
+CHAT_DECRYPTION_WORKERS = int(
+    os.getenv("CHAT_DECRYPTION_WORKERS", str(min(8, os.cpu_count() or 1)))
+)
+CHAT_DECRYPTION_PAGE_SIZE = int(os.getenv("CHAT_DECRYPTION_PAGE_SIZE", "50"))
+
+_decryption_pool: Optional[ThreadPoolExecutor] = None
+_decryption_pool_lock = threading.Lock()
+
+
+def get_decryption_pool() -> ThreadPoolExecutor:
+    global _decryption_pool
+
+    with _decryption_pool_lock:
+        if _decryption_pool is None:
+            _decryption_pool = ThreadPoolExecutor(
+                max_workers=CHAT_DECRYPTION_WORKERS,
+                thread_name_prefix="chat-decryption",
+            )
+        return _decryption_pool
+
+
+####################
+# Per-message storage
+####################
+
+# Marker stored in the chat row when its messages live in the chat_message table
+MESSAGE_STORAGE_KEY = "_message_storage"
+MESSAGE_STORAGE_VERSION = 1
+
+# Message fields that make up the history tree and stay in the chat row
+MESSAGE_TREE_FIELDS = ("parentId", "childrenIds")
+
+
+def _get_message_tree_node(message: dict) -> dict:
+    return {field: message[field] for field in MESSAGE_TREE_FIELDS if field in message}
+
+
+def get_chat_search_texts(title: str, chat_data: dict) -> list[str]:
+    """Collect the plaintext of a chat that is covered by the blind search index."""
+    messages = (chat_data.get("history") or {}).get("messages") or {}
+    return [title] + [message.get("content") for message in messages.values()]
+
+
+def is_message_storage_chat(chat_data) -> bool:
+    """Check if decrypted chat data is a skeleton whose messages are stored separately."""
+    return isinstance(chat_data, dict) and isinstance(
+        chat_data.get(MESSAGE_STORAGE_KEY), dict
+    )
+
+
+def split_chat_messages(chat_data: dict) -> tuple[dict, dict]:
+    """
+    Split chat data into a skeleton and its messages.
+
+    The skeleton keeps everything but the message bodies: `history.currentId`, the
+    tree fields of every message and the ids of the `messages` list, which is
+    rebuilt from the history on read.
+    """
+    history = chat_data.get("history") or {}
+    messages = history.get("messages") or {}
+
+    skeleton = {key: value for key, value in chat_data.items() if key != "history"}
+    skeleton["history"] = {
+        **{key: value for key, value in history.items() if key != "messages"},
+        "messages": {
+            id: _get_message_tree_node(message) for id, message in messages.items()
+        },
+    }
+
+    storage = {"version": MESSAGE_STORAGE_VERSION}
+    message_list = chat_data.get("messages")
+    if isinstance(message_list, list) and all(
+        isinstance(message, dict) and message.get("id") in messages
+        for message in message_list
+    ):
+        storage["message_ids"] = [message["id"] for message in message_list]
+        skeleton.pop("messages", None)
+
+    skeleton[MESSAGE_STORAGE_KEY] = storage
+    return skeleton, messages
+
+
+def assemble_chat_messages(skeleton: dict, messages: dict) -> dict:
+    """Rebuild the chat data split by `split_chat_messages`."""
+    chat_data = {
+        key: value for key, value in skeleton.items() if key != MESSAGE_STORAGE_KEY
+    }
+    storage = skeleton.get(MESSAGE_STORAGE_KEY) or {}
+
+    history = dict(chat_data.get("history") or {})
+    history["messages"] = {
+        id: {**messages.get(id, {}), **node}
+        for id, node in (history.get("messages") or {}).items()
+    }
+    chat_data["history"] = history
+
+    if "message_ids" in storage:
+        chat_data["messages"] = [
+            history["messages"][id]
+            for id in storage["message_ids"]
+            if id in history["messages"]
+        ]
+
+    return chat_data
+
+
 class ChatTableEncryptionProxy(ChatTable):
     """
     Encryption proxy for ChatTable that transparently encrypts/decrypts chat data.
@@ -28,6 +162,13 @@ class ChatTableEncryptionProxy(ChatTable):
     def __init__(self):
         super().__init__()
         self._encryption_enabled = UserEncryptionConfig.is_encryption_enabled()
+        self._message_storage_enabled = (
+            self._encryption_enabled
+            and UserEncryptionConfig.is_message_storage_enabled()
+        )
+        self._search_index_enabled = (
+            self._encryption_enabled and UserEncryptionConfig.is_search_index_enabled()
+        )
 
         # Log configuration status
         UserEncryptionConfig.log_config_status()
@@ -42,7 +183,9 @@ class ChatTableEncryptionProxy(ChatTable):
             f"ChatTableEncryptionProxy initialized with per-user encryption {log_level}{env_hint}"
         )
 
-    def _create_chat_model_from_db_record(self, db_record) -> ChatModel:
+    def _create_chat_model_from_db_record(
+        self, db_record, messages: Optional[list[ChatMessageModel]] = None
+    ) -> ChatModel:
         """Create ChatModel from database record, handling encrypted data."""
         chat_data = db_record.chat
         title_data = db_record.title
@@ -51,6 +194,9 @@ class ChatTableEncryptionProxy(ChatTable):
         if isinstance(chat_data, str):
             try:
                 chat_data = decrypt_chat_data(chat_data, db_record.user_id)
+                chat_data = self._load_chat_messages(
+                    db_record.id, db_record.user_id, chat_data, messages
+                )
             except Exception as e:
                 log.error(f"Failed to decrypt chat data for {db_record.id}: {e}")
                 # Return None to indicate failure - let caller handle it
@@ -62,8 +208,7 @@ class ChatTableEncryptionProxy(ChatTable):
                 title_data = decrypt_title_data(title_data, db_record.user_id)
             except Exception as e:
                 log.error(f"Failed to decrypt title data for {db_record.id}: {e}")
-                # Fallback to original title if decryption fails
-                title_data = db_record.title
+                return None
 
         return ChatModel(
             id=db_record.id,
@@ -79,32 +224,197 @@ class ChatTableEncryptionProxy(ChatTable):
             folder_id=db_record.folder_id,
         )
 
-    def _store_encrypted_chat(self, chat_record, chat_data: dict, user_id: str) -> None:
+    def _store_encrypted_chat(
+        self, db, chat_record, chat_data: dict, user_id: str
+    ) -> None:
         """Store chat data in database record, encrypting if enabled."""
+        # Whole-chat records never read message rows, drop those of a split chat
+        # or of a failed split write
+        if self._message_storage_enabled or self._is_split_chat_record(chat_record):
+            ChatMessages.delete_messages_by_chat_id(chat_record.id, db=db)
+
         if self._encryption_enabled:
+            # Raises EncryptionError rather than storing the chat unencrypted
+            chat_record.chat = encrypt_chat_data(chat_data, user_id)
+        else:
+            chat_record.chat = chat_data
+
+    def _is_split_chat_record(self, chat_record) -> bool:
+        """Whether the chat stored in `chat_record` has its messages in separate rows."""
+        if not isinstance(chat_record.chat, str):
+            # Unencrypted chats are never split
+            return is_message_storage_chat(chat_record.chat)
+
+        try:
+            return is_message_storage_chat(
+                decrypt_chat_data(chat_record.chat, chat_record.user_id)
+            )
+        except Exception:
+            # Unreadable, its message rows may be stale
+            return True
+
+    def _load_chat_messages(
+        self,
+        chat_id: str,
+        user_id: str,
+        chat_data: dict,
+        messages: Optional[list[ChatMessageModel]] = None,
+    ) -> dict:
+        """Reassemble a chat skeleton with its separately stored messages."""
+        if not is_message_storage_chat(chat_data):
+            return chat_data
+
+        if messages is None:
+            messages = ChatMessages.get_messages_by_chat_id(chat_id)
+
+        return assemble_chat_messages(
+            chat_data,
+            {
+                message.id: decrypt_chat_data(message.data, user_id)
+                for message in messages
+            },
+        )
+
+    def _store_chat_messages(
+        self, db, chat_record, chat_data: dict, user_id: str
+    ) -> None:
+        """
+        Store a chat as a skeleton in its row and one encrypted row per message.
+
+        Only messages whose content changed since they were last stored are
+        re-encrypted and written; messages no longer in the history are deleted.
+        The rows are written in the session `db` of the chat row, the caller
+        commits both at once.
+        """
+        skeleton, messages = split_chat_messages(chat_data)
+        digests = ChatMessages.get_digests_by_chat_id(chat_record.id, db=db)
+
+        changed = {}
+        for id, message in messages.items():
+            data, digest = encrypt_message_data(message, user_id, digests.get(id))
+            if data is not None:
+                changed[id] = (data, digest)
+        skeleton_data = encrypt_chat_data(skeleton, user_id)
+
+        ChatMessages.sync_messages(
+            chat_record.id, user_id, changed, keep=set(messages.keys()), db=db
+        )
+        chat_record.chat = skeleton_data
+
+    def _store_chat(self, db, chat_record, chat_data: dict, user_id: str) -> None:
+        """Store chat data, splitting its messages into separate rows if enabled."""
+        if self._message_storage_enabled:
             try:
-                chat_record.chat = encrypt_chat_data(chat_data, user_id)
-            except EncryptionError as e:
+                self._store_chat_messages(db, chat_record, chat_data, user_id)
+                return
+            except Exception as e:
                 log.error(
-                    f"Encryption failed, falling back to unencrypted storage: {e}"
+                    f"Per-message storage failed for chat {chat_record.id}, storing it whole: {e}"
                 )
-                chat_record.chat = chat_data
-        else:
-            chat_record.chat = chat_data
+
+        self._store_encrypted_chat(db, chat_record, chat_data, user_id)
 
     def _store_encrypted_title(self, chat_record, title: str, user_id: str) -> None:
         """Store title data in database record, encrypting if enabled."""
         if self._encryption_enabled:
-            try:
-                chat_record.title = encrypt_title_data(title, user_id)
-            except EncryptionError as e:
-                log.error(
-                    f"Title encryption failed, falling back to unencrypted storage: {e}"
-                )
-                chat_record.title = title
+            # Raises EncryptionError rather than storing the title unencrypted
+            chat_record.title = encrypt_title_data(title, user_id)
         else:
             chat_record.title = title
 
+    def _index_chat(
+        self, chat_id: str, user_id: str, title: str, chat_data: dict
+    ) -> bool:
+        """Bring the blind search index of a chat in line with its content."""
+        if not self._search_index_enabled:
+            return False
+
+        try:
+            ChatSearchTokens.sync_tokens(
+                chat_id,
+                user_id,
+                get_search_index_tokens(
+                    get_chat_search_texts(title, chat_data), user_id
+                ),
+            )
+            return True
+        except Exception as e:
+            log.error(f"Failed to update search index for chat {chat_id}: {e}")
+            return False
+
+    def index_unindexed_chats(self, limit: int = 100) -> int:
+        """
+        Index up to `limit` chats written before the search index existed and
+        return how many were indexed.
+        """
+        if not self._search_index_enabled:
+            return 0
+
+        with get_db() as db:
+            chat_records = (
+                db.query(Chat)
+                .filter(~exists().where(ChatSearchToken.chat_id == Chat.id))
+                .limit(limit)
+                .all()
+            )
+
+        indexed = 0
+        for chat_record in chat_records:
+            chat_model = self._create_chat_model_from_db_record(chat_record)
+            if chat_model is not None and self._index_chat(
+                chat_model.id, chat_model.user_id, chat_model.title, chat_model.chat
+            ):
+                indexed += 1
+        return indexed
+
+    def _migrate_legacy_record(self, db, chat_record, chat_model: ChatModel) -> None:
+        """
+        Re-encrypt a chat stored in the legacy base64 format as an envelope.
+
+        The row is only updated while it still holds the legacy values that were
+        decrypted, a concurrent write is never overwritten with older content.
+        """
+        if not self._encryption_enabled:
+            return
+
+        # Decryption failures surface as empty values, never overwrite with those
+        migrate_chat = bool(chat_model.chat) and is_legacy_encrypted_data(
+            chat_record.chat
+        )
+        migrate_title = bool(chat_model.title) and is_legacy_encrypted_data(
+            chat_record.title
+        )
+        if not (migrate_chat or migrate_title):
+            return
+
+        # Encrypted on a copy, the loaded record would be written unconditionally
+        migrated = SimpleNamespace(id=chat_record.id, chat=None, title=None)
+        conditions = [Chat.id == chat_record.id]
+        values = {}
+
+        try:
+            if migrate_chat:
+                self._store_chat(db, migrated, chat_model.chat, chat_record.user_id)
+                # Legacy ciphertext is a plain base64 JSON string
+                conditions.append(cast(Chat.chat, Text) == json.dumps(chat_record.chat))
+                values["chat"] = migrated.chat
+            if migrate_title:
+                self._store_encrypted_title(
+                    migrated, chat_model.title, chat_record.user_id
+                )
+                conditions.append(Chat.title == chat_record.title)
+                values["title"] = migrated.title
+
+            result = db.execute(update(Chat).where(*conditions).values(**values))
+            if result.rowcount:
+                db.commit()
+            else:
+                # Written since it was read, its message rows are rolled back too
+                db.rollback()
+        except Exception as e:
+            db.rollback()
+            log.warning(f"Failed to migrate chat {chat_record.id} encryption: {e}")
+
     # Override INSERT/UPDATE methods
 
     def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
@@ -126,13 +436,15 @@ class ChatTableEncryptionProxy(ChatTable):
                 )
 
                 # Store encrypted chat and title data
-                self._store_encrypted_chat(chat_record, form_data.chat, user_id)
+                self._store_chat(db, chat_record, form_data.chat, user_id)
                 self._store_encrypted_title(chat_record, title, user_id)
 
                 db.add(chat_record)
                 db.commit()
                 db.refresh(chat_record)
 
+                self._index_chat(id, user_id, title, form_data.chat)
+
                 # Return ChatModel with decrypted data
                 return ChatModel(
                     id=chat_record.id,
@@ -149,9 +461,9 @@ class ChatTableEncryptionProxy(ChatTable):
                 )
 
         except Exception as e:
+            # Never falls back to the parent method, it stores the chat unencrypted
             log.error(f"Error in encrypted insert_new_chat: {e}")
-            # Fallback to parent method
-            return super().insert_new_chat(user_id, form_data)
+            return None
 
     def import_chat(
         self, user_id: str, form_data: ChatImportForm
@@ -176,13 +488,15 @@ class ChatTableEncryptionProxy(ChatTable):
                 title = chat.get("title", "New Chat")
 
                 # Store encrypted chat and title data
-                self._store_encrypted_chat(chat_item, chat, chat_item.user_id)
+                self._store_chat(db, chat_item, chat, chat_item.user_id)
                 self._store_encrypted_title(chat_item, title, chat_item.user_id)
 
                 chat_item.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat_item)
 
+                self._index_chat(id, chat_item.user_id, title, chat)
+
                 # Return ChatModel with decrypted data
                 return ChatModel(
                     id=chat_item.id,
@@ -200,7 +514,7 @@ class ChatTableEncryptionProxy(ChatTable):
 
         except Exception as e:
             log.error(f"Error in encrypted update_chat_by_id: {e}")
-            return super().update_chat_by_id(id, chat)
+            return None
 
     def upsert_message_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, message: dict
@@ -211,6 +525,19 @@ class ChatTableEncryptionProxy(ChatTable):
                 id, message_id, message
             )
 
+        if self._message_storage_enabled:
+            if not self.save_message_to_chat_by_id_and_message_id(
+                id, message_id, message
+            ):
+                return None
+            return self.get_chat_by_id(id)
+
+        return self._upsert_whole_chat_message(id, message_id, message)
+
+    def _upsert_whole_chat_message(
+        self, id: str, message_id: str, message: dict
+    ) -> Optional[ChatModel]:
+        """Upsert a message by decrypting and rewriting the whole chat."""
         try:
             # Get current chat and decrypt it first
             current_chat = self.get_chat_by_id(id)
@@ -241,10 +568,94 @@ class ChatTableEncryptionProxy(ChatTable):
 
         except Exception as e:
             log.error(f"Error in encrypted upsert_message: {e}")
-            return super().upsert_message_to_chat_by_id_and_message_id(
+            return None
+
+    def save_message_to_chat_by_id_and_message_id(
+        self, id: str, message_id: str, message: dict, append: bool = False
+    ) -> bool:
+        """
+        Override to update a single message row instead of rewriting the chat.
+
+        Only the changed message is decrypted and re-encrypted. The chat skeleton
+        is rewritten only when the history tree or `currentId` changes, so
+        streaming updates of one message cost O(message) instead of O(chat).
+        """
+        if not self._message_storage_enabled:
+            return super().save_message_to_chat_by_id_and_message_id(
                 id, message_id, message
             )
 
+        try:
+            with get_db() as db:
+                chat_item = db.get(Chat, id)
+                if not chat_item:
+                    return False
+
+                user_id = chat_item.user_id
+                skeleton = (
+                    decrypt_chat_data(chat_item.chat, user_id)
+                    if isinstance(chat_item.chat, str)
+                    else chat_item.chat
+                )
+
+                if not is_message_storage_chat(skeleton):
+                    # Whole-chat record, rewriting it converts it to split storage
+                    return (
+                        self._upsert_whole_chat_message(id, message_id, message)
+                        is not None
+                    )
+
+                # Sanitize message content for null characters
+                if isinstance(message.get("content"), str):
+                    message["content"] = message["content"].replace("\x00", "")
+
+                stored = ChatMessages.get_message(id, message_id, db=db)
+                if stored is not None:
+                    message = {**decrypt_chat_data(stored.data, user_id), **message}
+
+                data, digest = encrypt_message_data(
+                    message, user_id, stored.digest if stored else None
+                )
+                if data is not None:
+                    ChatMessages.upsert_message(
+                        id, message_id, user_id, data, digest, db=db
+                    )
+
+                history = skeleton.setdefault("history", {})
+                tree = history.setdefault("messages", {})
+                node = _get_message_tree_node(message)
+
+                if (
+                    tree.get(message_id) != node
+                    or history.get("currentId") != message_id
+                ):
+                    tree[message_id] = node
+                    history["currentId"] = message_id
+                    chat_item.chat = encrypt_chat_data(skeleton, user_id)
+
+                chat_item.updated_at = int(time.time())
+                db.commit()
+
+            if self._search_index_enabled and "content" in message:
+                if append:
+                    # Streaming only appends words, there are no stale tokens
+                    ChatSearchTokens.add_tokens(
+                        id,
+                        user_id,
+                        get_search_index_tokens([message.get("content")], user_id),
+                    )
+                else:
+                    # Replaced content may drop words, the whole chat is re-indexed
+                    chat = self.get_chat_by_id(id)
+                    if chat:
+                        self._index_chat(id, user_id, chat.title, chat.chat)
+
+            return True
+
+        except Exception as e:
+            log.error(f"Error in encrypted save_message: {e}")
+            return False
+
     # Override RETRIEVAL methods
 
     def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
@@ -255,11 +666,14 @@ class ChatTableEncryptionProxy(ChatTable):
                 if not chat_item:
                     return None
 
-                return self._create_chat_model_from_db_record(chat_item)
+                chat_model = self._create_chat_model_from_db_record(chat_item)
+                if chat_model is not None:
+                    self._migrate_legacy_record(db, chat_item, chat_model)
+                return chat_model
 
         except Exception as e:
             log.error(f"Error in get_chat_by_id: {e}")
-            return super().get_chat_by_id(id)
+            return None
 
     def get_chat_by_id_and_user_id(self, id: str, user_id: str) -> Optional[ChatModel]:
         """Override to decrypt chat data after retrieving."""
@@ -269,11 +683,14 @@ class ChatTableEncryptionProxy(ChatTable):
                 if not chat_item:
                     return None
 
-                return self._create_chat_model_from_db_record(chat_item)
+                chat_model = self._create_chat_model_from_db_record(chat_item)
+                if chat_model is not None:
+                    self._migrate_legacy_record(db, chat_item, chat_model)
+                return chat_model
 
         except Exception as e:
             log.error(f"Error in get_chat_by_id_and_user_id: {e}")
-            return super().get_chat_by_id_and_user_id(id, user_id)
+            return None
 
     def get_chat_by_share_id(self, id: str) -> Optional[ChatModel]:
         """Override to decrypt chat data after retrieving."""
@@ -284,7 +701,11 @@ class ChatTableEncryptionProxy(ChatTable):
         result = super().get_chat_by_share_id(id)
         if result and isinstance(result.chat, str):
             try:
-                result.chat = decrypt_chat_data(result.chat, result.user_id)
+                result.chat = self._load_chat_messages(
+                    result.id,
+                    result.user_id,
+                    decrypt_chat_data(result.chat, result.user_id),
+                )
             except Exception as e:
                 log.error(f"Failed to decrypt shared chat {id}: {e}")
                 return None
@@ -295,12 +716,30 @@ class ChatTableEncryptionProxy(ChatTable):
         self, chat_models: list[ChatModel]
     ) -> list[ChatModel]:
         """Decrypt a list of chat models."""
-        decrypted_models = []
         for model in chat_models:
-            # Decrypt chat data if needed
             if isinstance(model.chat, str):
                 try:
                     model.chat = decrypt_chat_data(model.chat, model.user_id)
+                except Exception as e:
+                    log.error(f"Failed to decrypt chat {model.id}: {e}")
+                    model.chat = None
+
+        # Load the messages of all split chats in one query
+        messages = ChatMessages.get_messages_by_chat_ids(
+            [model.id for model in chat_models if is_message_storage_chat(model.chat)]
+        )
+
+        decrypted_models = []
+        for model in chat_models:
+            # Skip chats whose data could not be decrypted
+            if model.chat is None:
+                continue
+
+            if model.id in messages:
+                try:
+                    model.chat = self._load_chat_messages(
+                        model.id, model.user_id, model.chat, messages[model.id]
+                    )
                 except Exception as e:
                     log.error(f"Failed to decrypt chat {model.id}: {e}")
                     # Skip corrupted chats instead of crashing
@@ -318,23 +757,76 @@ class ChatTableEncryptionProxy(ChatTable):
             decrypted_models.append(model)
         return decrypted_models
 
+    def _get_chat_models(self, query) -> list[ChatModel]:
+        """Decrypt the chats returned by a query, loading their messages in one batch."""
+        chat_records = query.all()
+        messages = ChatMessages.get_messages_by_chat_ids(
+            [chat_record.id for chat_record in chat_records]
+        )
+
+        chat_models = []
+        for chat_record in chat_records:
+            chat_model = self._create_chat_model_from_db_record(
+                chat_record, messages[chat_record.id]
+            )
+            if chat_model is not None:  # Skip corrupted/undecryptable chats
+                chat_models.append(chat_model)
+
+        return chat_models
+
+    def _get_chat_title_id_list(self, query) -> list[ChatTitleIdResponse]:
+        """Override to decrypt only the titles, never the chat bodies."""
+        if not self._encryption_enabled:
+            return super()._get_chat_title_id_list(query)
+
+        all_chats = query.with_entities(
+            Chat.id, Chat.user_id, Chat.title, Chat.updated_at, Chat.created_at
+        ).all()
+
+        results = []
+        for id, user_id, title, updated_at, created_at in all_chats:
+            if isinstance(title, str):
+                try:
+                    title = decrypt_title_data(title, user_id)
+                except Exception as e:
+                    log.error(f"Failed to decrypt title for chat {id}: {e}")
+                    # Keep original title if decryption fails
+                    pass
+
+            results.append(
+                ChatTitleIdResponse(
+                    id=id, title=title, updated_at=updated_at, created_at=created_at
+                )
+            )
+
+        return results
+
     def get_chat_list_by_user_id(
         self,
         user_id: str,
         include_archived: bool = False,
-        filter: Optional[dict] = None,
         skip: int = 0,
         limit: int = 50,
     ) -> list[ChatModel]:
         """Override to decrypt chat data after retrieving."""
-        results = super().get_chat_list_by_user_id(
-            user_id, include_archived, filter, skip, limit
-        )
-        return (
-            self._decrypt_chat_models_list(results)
-            if self._encryption_enabled
-            else results
-        )
+        if not self._encryption_enabled:
+            return super().get_chat_list_by_user_id(
+                user_id, include_archived, skip, limit
+            )
+
+        with get_db() as db:
+            query = db.query(Chat).filter_by(user_id=user_id)
+            if not include_archived:
+                query = query.filter_by(archived=False)
+
+            query = query.order_by(Chat.updated_at.desc())
+
+            if skip:
+                query = query.offset(skip)
+            if limit:
+                query = query.limit(limit)
+
+            return self._get_chat_models(query)
 
     def get_archived_chat_list_by_user_id(
         self,
@@ -346,135 +838,109 @@ class ChatTableEncryptionProxy(ChatTable):
         if not self._encryption_enabled:
             return super().get_archived_chat_list_by_user_id(user_id, skip, limit)
 
-        try:
-            with get_db() as db:
-                all_chats = (
-                    db.query(Chat)
-                    .filter_by(user_id=user_id, archived=True)
-                    .order_by(Chat.updated_at.desc())
-                )
+        return self.get_archived_chats_by_user_id(user_id)
 
-                chat_models = []
-                for chat_record in all_chats:
-                    chat_model = self._create_chat_model_from_db_record(chat_record)
-                    if chat_model is not None:  # Skip corrupted/undecryptable chats
-                        chat_models.append(chat_model)
+    def _iter_decrypted_chat_pages(self, pages) -> Iterator[ChatModel]:
+        """
+        Decrypt pages of chat records on the decryption pool.
 
-                return chat_models
+        The next page is decrypted while the current one is consumed, and at most
+        two pages are held in memory, however many chats there are.
+        """
+        pool = get_decryption_pool()
 
-        except Exception as e:
-            log.error(f"Error in get_archived_chat_list_by_user_id: {e}")
-            # Fallback: try parent method but handle potential validation errors
-            try:
-                results = super().get_archived_chat_list_by_user_id(
-                    user_id, skip, limit
+        def submit(chat_records):
+            messages = ChatMessages.get_messages_by_chat_ids(
+                [chat_record.id for chat_record in chat_records]
+            )
+            return [
+                pool.submit(
+                    self._create_chat_model_from_db_record,
+                    chat_record,
+                    messages[chat_record.id],
                 )
-                return self._decrypt_chat_models_list(results)
-            except Exception as fallback_error:
-                log.error(f"Fallback also failed: {fallback_error}")
-                return []
+                for chat_record in chat_records
+            ]
+
+        pending = None
+        for chat_records in pages:
+            futures = submit(chat_records)
+            if pending is not None:
+                yield from self._collect_decrypted_chats(pending)
+            pending = futures
+
+        if pending is not None:
+            yield from self._collect_decrypted_chats(pending)
+
+    def _collect_decrypted_chats(self, futures) -> Iterator[ChatModel]:
+        for future in futures:
+            chat_model = future.result()
+            if chat_model is not None:  # Skip corrupted/undecryptable chats
+                yield chat_model
+
+    def iter_chats(
+        self, page_size: int = CHAT_DECRYPTION_PAGE_SIZE
+    ) -> Iterator[ChatModel]:
+        """Override to decrypt pages of chats in parallel."""
+        if not self._encryption_enabled:
+            yield from super().iter_chats(page_size)
+            return
+
+        yield from self._iter_decrypted_chat_pages(
+            self._iter_chat_record_pages(page_size=page_size)
+        )
+
+    def iter_chats_by_user_id(
+        self, user_id: str, page_size: int = CHAT_DECRYPTION_PAGE_SIZE
+    ) -> Iterator[ChatModel]:
+        """Override to decrypt pages of chats in parallel."""
+        if not self._encryption_enabled:
+            yield from super().iter_chats_by_user_id(user_id, page_size)
+            return
+
+        yield from self._iter_decrypted_chat_pages(
+            self._iter_chat_record_pages((Chat.user_id == user_id,), page_size)
+        )
 
     def get_chats(self, skip: int = 0, limit: int = 50) -> list[ChatModel]:
         """Override to decrypt chat data after retrieving."""
-        results = super().get_chats(skip, limit)
-        return (
-            self._decrypt_chat_models_list(results)
-            if self._encryption_enabled
-            else results
-        )
+        if not self._encryption_enabled:
+            return super().get_chats(skip, limit)
+
+        return list(self.iter_chats())
 
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         """Override to decrypt chat data after retrieving."""
         if not self._encryption_enabled:
             return super().get_chats_by_user_id(user_id)
 
-        try:
-            with get_db() as db:
-                all_chats = (
-                    db.query(Chat)
-                    .filter_by(user_id=user_id)
-                    .order_by(Chat.updated_at.desc())
-                )
-
-                chat_models = []
-                for chat_record in all_chats:
-                    chat_model = self._create_chat_model_from_db_record(chat_record)
-                    if chat_model is not None:  # Skip corrupted/undecryptable chats
-                        chat_models.append(chat_model)
-
-                return chat_models
-
-        except Exception as e:
-            log.error(f"Error in get_chats_by_user_id: {e}")
-            # Fallback: try parent method but handle potential validation errors
-            try:
-                results = super().get_chats_by_user_id(user_id)
-                return self._decrypt_chat_models_list(results)
-            except Exception as fallback_error:
-                log.error(f"Fallback also failed: {fallback_error}")
-                return []
+        return list(self.iter_chats_by_user_id(user_id))
 
     def get_pinned_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         """Override to decrypt chat data after retrieving."""
         if not self._encryption_enabled:
             return super().get_pinned_chats_by_user_id(user_id)
 
-        try:
-            with get_db() as db:
-                all_chats = (
-                    db.query(Chat)
-                    .filter_by(user_id=user_id, pinned=True, archived=False)
-                    .order_by(Chat.updated_at.desc())
-                )
-
-                chat_models = []
-                for chat_record in all_chats:
-                    chat_model = self._create_chat_model_from_db_record(chat_record)
-                    if chat_model is not None:  # Skip corrupted/undecryptable chats
-                        chat_models.append(chat_model)
-
-                return chat_models
-
-        except Exception as e:
-            log.error(f"Error in get_pinned_chats_by_user_id: {e}")
-            # Fallback: try parent method but handle potential validation errors
-            try:
-                results = super().get_pinned_chats_by_user_id(user_id)
-                return self._decrypt_chat_models_list(results)
-            except Exception as fallback_error:
-                log.error(f"Fallback also failed: {fallback_error}")
-                return []
+        with get_db() as db:
+            query = (
+                db.query(Chat)
+                .filter_by(user_id=user_id, pinned=True, archived=False)
+                .order_by(Chat.updated_at.desc())
+            )
+            return self._get_chat_models(query)
 
     def get_archived_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         """Override to decrypt chat data after retrieving."""
         if not self._encryption_enabled:
             return super().get_archived_chats_by_user_id(user_id)
 
-        try:
-            with get_db() as db:
-                all_chats = (
-                    db.query(Chat)
-                    .filter_by(user_id=user_id, archived=True)
-                    .order_by(Chat.updated_at.desc())
-                )
-
-                chat_models = []
-                for chat_record in all_chats:
-                    chat_model = self._create_chat_model_from_db_record(chat_record)
-                    if chat_model is not None:  # Skip corrupted/undecryptable chats
-                        chat_models.append(chat_model)
-
-                return chat_models
-
-        except Exception as e:
-            log.error(f"Error in get_archived_chats_by_user_id: {e}")
-            # Fallback: try parent method but handle potential validation errors
-            try:
-                results = super().get_archived_chats_by_user_id(user_id)
-                return self._decrypt_chat_models_list(results)
-            except Exception as fallback_error:
-                log.error(f"Fallback also failed: {fallback_error}")
-                return []
+        with get_db() as db:
+            query = (
+                db.query(Chat)
+                .filter_by(user_id=user_id, archived=True)
+                .order_by(Chat.updated_at.desc())
+            )
+            return self._get_chat_models(query)
 
     def get_chats_by_user_id_and_search_text(
         self,
@@ -484,45 +950,77 @@ class ChatTableEncryptionProxy(ChatTable):
         skip: int = 0,
         limit: int = 60,
     ) -> list[ChatModel]:
+        """
+        Override to search encrypted chats through the blind token index.
+
+        Every word of the query must match a word, or the start of a word, in the
+        chat's title or messages. `tag:` filters work as for unencrypted chats.
+        """
         if not self._encryption_enabled:
             return super().get_chats_by_user_id_and_search_text(
                 user_id, search_text, include_archived, skip, limit
             )
 
-        raise NotImplementedError("Searching chats is not supported")
+        if not self._search_index_enabled:
+            raise NotImplementedError("Searching chats is not supported")
+
+        search_text, tag_ids = self._parse_search_text(search_text.lower().strip())
+        tokens = get_search_query_tokens(search_text, user_id)
+
+        with get_db() as db:
+            query = db.query(Chat).filter(Chat.user_id == user_id)
+
+            if not include_archived:
+                query = query.filter(Chat.archived == False)
+
+            if tokens:
+                query = query.filter(
+                    Chat.id.in_(ChatSearchTokens.get_chat_ids_query(user_id, tokens))
+                )
+
+            query = self._filter_by_tag_ids(query, db.bind.dialect.name, tag_ids)
+            query = query.order_by(Chat.updated_at.desc())
+
+            return self._get_chat_models(query.offset(skip).limit(limit))
 
     def get_chats_by_folder_id_and_user_id(
         self, folder_id: str, user_id: str
     ) -> list[ChatModel]:
         """Override to decrypt chat data after retrieving."""
-        results = super().get_chats_by_folder_id_and_user_id(folder_id, user_id)
-        return (
-            self._decrypt_chat_models_list(results)
-            if self._encryption_enabled
-            else results
-        )
+        return self.get_chats_by_folder_ids_and_user_id([folder_id], user_id)
 
     def get_chats_by_folder_ids_and_user_id(
         self, folder_ids: list[str], user_id: str
     ) -> list[ChatModel]:
         """Override to decrypt chat data after retrieving."""
-        results = super().get_chats_by_folder_ids_and_user_id(folder_ids, user_id)
-        return (
-            self._decrypt_chat_models_list(results)
-            if self._encryption_enabled
-            else results
-        )
+        if not self._encryption_enabled:
+            return super().get_chats_by_folder_ids_and_user_id(folder_ids, user_id)
+
+        with get_db() as db:
+            query = db.query(Chat).filter(
+                Chat.folder_id.in_(folder_ids), Chat.user_id == user_id
+            )
+            query = query.filter(or_(Chat.pinned == False, Chat.pinned == None))
+            query = query.filter_by(archived=False)
+
+            query = query.order_by(Chat.updated_at.desc())
+            return self._get_chat_models(query)
 
     def get_chat_list_by_chat_ids(
         self, chat_ids: list[str], skip: int = 0, limit: int = 50
     ) -> list[ChatModel]:
         """Override to decrypt chat data after retrieving."""
-        results = super().get_chat_list_by_chat_ids(chat_ids, skip, limit)
-        return (
-            self._decrypt_chat_models_list(results)
-            if self._encryption_enabled
-            else results
-        )
+        if not self._encryption_enabled:
+            return super().get_chat_list_by_chat_ids(chat_ids, skip, limit)
+
+        with get_db() as db:
+            query = (
+                db.query(Chat)
+                .filter(Chat.id.in_(chat_ids))
+                .filter_by(archived=False)
+                .order_by(Chat.updated_at.desc())
+            )
+            return self._get_chat_models(query)
 
     def get_chat_list_by_user_id_and_tag_name(
         self, user_id: str, tag_name: str, skip: int = 0, limit: int = 50
@@ -537,49 +1035,74 @@ class ChatTableEncryptionProxy(ChatTable):
             else results
         )
 
-    def get_chat_title_id_list_by_user_id(
-        self,
-        user_id: str,
-        include_archived: bool = False,
-        skip: Optional[int] = None,
-        limit: Optional[int] = None,
-    ):
-        """Override to decrypt titles in the title/id list."""
-        results = super().get_chat_title_id_list_by_user_id(
-            user_id, include_archived, skip, limit
-        )
+    # Helper methods for message extraction
+    def _get_stored_chat_data(self, db, id: str) -> Optional[tuple[str, dict]]:
+        """
+        Return the user id and decrypted chat data of a chat as stored, the
+        skeleton only for split chats.
+        """
+        chat_item = db.get(Chat, id)
+        if not chat_item:
+            return None
 
+        chat_data = chat_item.chat
+        if isinstance(chat_data, str):
+            chat_data = decrypt_chat_data(chat_data, chat_item.user_id)
+        return chat_item.user_id, chat_data
+
+    def get_messages_by_chat_id(self, id: str) -> Optional[dict]:
+        """Override to decrypt before extracting messages."""
         if not self._encryption_enabled:
-            return results
+            return super().get_messages_by_chat_id(id)
 
-        # Decrypt titles in the response
-        for item in results:
-            if isinstance(item.title, str):
-                try:
-                    item.title = decrypt_title_data(item.title, user_id)
-                except Exception as e:
-                    log.error(f"Failed to decrypt title for chat {item.id}: {e}")
-                    # Keep original title if decryption fails
-                    pass
+        try:
+            with get_db() as db:
+                stored = self._get_stored_chat_data(db, id)
+                if stored is None:
+                    return None
 
-        return results
+                user_id, chat_data = stored
+                if is_message_storage_chat(chat_data):
+                    chat_data = self._load_chat_messages(
+                        id,
+                        user_id,
+                        chat_data,
+                        ChatMessages.get_messages_by_chat_id(id, db=db),
+                    )
+                return chat_data.get("history", {}).get("messages", {}) or {}
 
-    # Helper methods for message extraction
-    def get_messages_by_chat_id(self, id: str) -> Optional[dict]:
-        """Override to decrypt before extracting messages."""
-        chat = self.get_chat_by_id(id)
-        if chat is None:
+        except Exception as e:
+            log.error(f"Failed to decrypt messages of chat {id}: {e}")
             return None
-        return chat.chat.get("history", {}).get("messages", {}) or {}
 
     def get_message_by_id_and_message_id(
         self, id: str, message_id: str
     ) -> Optional[dict]:
         """Override to decrypt before extracting message."""
-        chat = self.get_chat_by_id(id)
-        if chat is None:
+        if not self._encryption_enabled:
+            return super().get_message_by_id_and_message_id(id, message_id)
+
+        try:
+            with get_db() as db:
+                stored = self._get_stored_chat_data(db, id)
+                if stored is None:
+                    return None
+
+                user_id, chat_data = stored
+                messages = chat_data.get("history", {}).get("messages", {})
+                if not is_message_storage_chat(chat_data):
+                    return messages.get(message_id, {})
+
+                # Only the requested message row is read and decrypted
+                node = messages.get(message_id)
+                message = ChatMessages.get_message(id, message_id, db=db)
+                if node is None or message is None:
+                    return {}
+                return {**decrypt_chat_data(message.data, user_id), **node}
+
+        except Exception as e:
+            log.error(f"Failed to decrypt message {message_id} of chat {id}: {e}")
             return None
-        return chat.chat.get("history", {}).get("messages", {}).get(message_id, {})
 
     # Shared chat methods - delegate to parent with decryption
     def insert_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
@@ -617,3 +1140,81 @@ class ChatTableEncryptionProxy(ChatTable):
         except Exception as e:
             log.error(f"Error in encrypted toggle_chat_archive_by_id: {e}")
             return None
+
+    # Delete methods also remove separately stored messages and search tokens
+
+    def delete_chat_by_id(self, id: str) -> bool:
+        ChatMessages.delete_messages_by_chat_id(id)
+        ChatSearchTokens.delete_tokens_by_chat_id(id)
+        return super().delete_chat_by_id(id)
+
+    def delete_chat_by_id_and_user_id(self, id: str, user_id: str) -> bool:
+        result = super().delete_chat_by_id_and_user_id(id, user_id)
+        if result:
+            ChatMessages.delete_messages_by_chat_id(id)
+            ChatSearchTokens.delete_tokens_by_chat_id(id)
+        return result
+
+    def delete_chats_by_user_id(self, user_id: str) -> bool:
+        ChatMessages.delete_messages_by_user_id(user_id)
+        ChatSearchTokens.delete_tokens_by_user_id(user_id)
+        return super().delete_chats_by_user_id(user_id)
+
+    def delete_chats_by_user_id_and_folder_id(
+        self, user_id: str, folder_id: str
+    ) -> bool:
+        with get_db() as db:
+            chat_ids = [
+                chat_id
+                for (chat_id,) in db.query(Chat.id)
+                .filter_by(user_id=user_id, folder_id=folder_id)
+                .all()
+            ]
+
+        ChatMessages.delete_messages_by_chat_ids(chat_ids)
+        ChatSearchTokens.delete_tokens_by_chat_ids(chat_ids)
+        return super().delete_chats_by_user_id_and_folder_id(user_id, folder_id)
+
+
+def _get_chat_user_id(chat_id: str) -> Optional[str]:
+    with get_db() as db:
+        return db.query(Chat.user_id).filter_by(id=chat_id).scalar()
+
+
+async def prefetch_chat_encryption_key(chat_id: str) -> None:
+    """
+    Load the key of a chat's owner, who is not necessarily the requesting user,
+    before the synchronous proxy reads or writes the chat on the event loop.
+    """
+    if not UserEncryptionConfig.is_encryption_enabled():
+        return
+
+    try:
+        user_id = await asyncio.to_thread(_get_chat_user_id, chat_id)
+    except Exception as e:
+        log.warning(f"Failed to look up the owner of chat {chat_id}: {e}")
+        return
+
+    if user_id:
+        await prefetch_user_encryption_key(user_id)
+
+
+async def backfill_chat_search_index(batch_size: int = 100) -> None:
+    """Index the chats written before the search index existed, after startup."""
+    from open_webui.models.chats import Chats
+
+    if not isinstance(Chats, ChatTableEncryptionProxy):
+        return
+
+    total = 0
+    try:
+        # Stops once a whole batch fails, the rest is retried on the next start
+        while indexed := await asyncio.to_thread(
+            Chats.index_unindexed_chats, batch_size
+        ):
+            total += indexed
+    except Exception as e:
+        log.warning(f"Failed to backfill the chat search index: {e}")
+
+    if total:
+        log.info(f"Indexed {total} chats written before the search index existed")
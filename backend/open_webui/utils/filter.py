@@ -1,35 +1,184 @@
 import inspect
 import logging
+import threading
 
 from open_webui.utils.plugin import load_function_module_by_id
-from open_webui.models.functions import Functions
+from open_webui.models.functions import FunctionModel, Functions
 from open_webui.env import SRC_LOG_LEVELS
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
 
+class FilterRegistry:
+    """
+    The active filter functions and their priorities, loaded once per version,
+    with the priority-sorted filter ids memoised per set of model filter ids.
+
+    `invalidate` bumps the version whenever a function changes. Once attached to
+    the app config, the other workers are told through its Redis channel, so
+    the version is a local counter checked without any I/O.
+    """
+
+    INVALIDATION_NAME = "filters"
+
+    def __init__(self):
+        self.config = None
+
+        self._local_version = 0
+        self._version = None
+        self._functions: dict[str, FunctionModel] = {}
+        self._global_ids: list[str] = []
+        self._sorted_ids: dict[tuple[str, ...], list[str]] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, config) -> None:
+        """Share invalidations with the other workers through `config`."""
+        self.config = config
+        config.add_invalidation_listener(self.INVALIDATION_NAME, self._bump_version)
+
+    def get_version(self) -> int:
+        return self._local_version
+
+    def _bump_version(self) -> None:
+        self._local_version += 1
+
+    def invalidate(self) -> None:
+        self._bump_version()
+
+        if self.config:
+            self.config.publish_invalidation(self.INVALIDATION_NAME)
+
+    def _load(self, version: int) -> None:
+        functions = Functions.get_functions_by_type("filter", active_only=True)
+        valves = Functions.get_function_valves_by_ids(
+            [function.id for function in functions]
+        )
+
+        def get_priority(function):
+            return valves.get(function.id, {}).get("priority", 0)
+
+        functions.sort(key=get_priority)
+
+        self._functions = {function.id: function for function in functions}
+        self._global_ids = [function.id for function in functions if function.is_global]
+        self._sorted_ids = {}
+        self._version = version
+
+    def get_sorted_filter_ids(self, model: dict) -> list[str]:
+        model_filter_ids = ()
+        if "info" in model and "meta" in model["info"]:
+            model_filter_ids = tuple(
+                sorted(set(model["info"]["meta"].get("filterIds", None) or []))
+            )
+
+        version = self.get_version()
+        with self._lock:
+            if version != self._version:
+                self._load(version)
+
+            filter_ids = self._sorted_ids.get(model_filter_ids)
+            if filter_ids is None:
+                # `_functions` is already in priority order
+                selected_ids = set(self._global_ids) | set(model_filter_ids)
+                filter_ids = [id for id in self._functions if id in selected_ids]
+                self._sorted_ids[model_filter_ids] = filter_ids
+
+            return list(filter_ids)
+
+    def get_sorted_filter_functions(self, model: dict) -> list[FunctionModel]:
+        filter_ids = self.get_sorted_filter_ids(model)
+        return [self._functions[id] for id in filter_ids if id in self._functions]
+
+
+FILTER_REGISTRY = FilterRegistry()
+
+
 def get_sorted_filter_ids(model: dict):
-    def get_priority(function_id):
-        function = Functions.get_function_by_id(function_id)
-        if function is not None:
-            valves = Functions.get_function_valves_by_id(function_id)
-            return valves.get("priority", 0) if valves else 0
-        return 0
+    return FILTER_REGISTRY.get_sorted_filter_ids(model)
 
-    filter_ids = [function.id for function in Functions.get_global_filter_functions()]
-    if "info" in model and "meta" in model["info"]:
-        filter_ids.extend(model["info"]["meta"].get("filterIds", []))
-        filter_ids = list(set(filter_ids))
 
-    enabled_filter_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("filter", active_only=True)
-    ]
+def get_sorted_filter_functions(model: dict) -> list[FunctionModel]:
+    return FILTER_REGISTRY.get_sorted_filter_functions(model)
 
-    filter_ids = [fid for fid in filter_ids if fid in enabled_filter_ids]
-    filter_ids.sort(key=get_priority)
-    return filter_ids
+
+def get_function_module(request, function_id: str):
+    if function_id in request.app.state.FUNCTIONS:
+        return request.app.state.FUNCTIONS[function_id]
+
+    function_module, _, _ = load_function_module_by_id(function_id)
+    request.app.state.FUNCTIONS[function_id] = function_module
+    return function_module
+
+
+class FilterHandler:
+    """
+    The `filter_type` handler of a filter function, resolved once and reused for
+    every call: the handler, the parameter names it accepts and the validated
+    valves.
+    """
+
+    def __init__(self, request, function, filter_type: str):
+        self.function_module = get_function_module(request, function.id)
+        self.updated_at = function.updated_at
+
+        self.handler = getattr(self.function_module, filter_type, None)
+        self.parameters = (
+            frozenset(inspect.signature(self.handler).parameters)
+            if self.handler
+            else frozenset()
+        )
+        self.is_coroutine = inspect.iscoroutinefunction(self.handler)
+
+        self.valves = None
+        if (
+            self.handler
+            and hasattr(self.function_module, "valves")
+            and hasattr(self.function_module, "Valves")
+        ):
+            valves = Functions.get_function_valves_by_id(function.id)
+            self.valves = self.function_module.Valves(**(valves if valves else {}))
+
+    def is_current(self, request, function) -> bool:
+        return (
+            self.updated_at == function.updated_at
+            and request.app.state.FUNCTIONS.get(function.id) is self.function_module
+        )
+
+
+# (function_id, filter_type) -> FilterHandler
+FILTER_HANDLERS: dict[tuple[str, str], FilterHandler] = {}
+
+
+def get_filter_handler(request, function, filter_type: str) -> FilterHandler:
+    key = (function.id, filter_type)
+
+    filter_handler = FILTER_HANDLERS.get(key)
+    if filter_handler is None or not filter_handler.is_current(request, function):
+        filter_handler = FilterHandler(request, function, filter_type)
+        FILTER_HANDLERS[key] = filter_handler
+
+    return filter_handler
+
+
+def invalidate_filter_handlers(function_id: str) -> None:
+    """
+    Drop the resolved handlers of a function after it changed and reload the
+    filter registry.
+    """
+    for key in [key for key in FILTER_HANDLERS if key[0] == function_id]:
+        FILTER_HANDLERS.pop(key, None)
+
+    FILTER_REGISTRY.invalidate()
+
+
+def has_filter_handler(request, filter_functions, filter_type) -> bool:
+    """Check whether any of the filter functions implements `filter_type`."""
+    return any(
+        get_filter_handler(request, function, filter_type).handler
+        for function in filter_functions
+        if function
+    )
 
 
 async def process_filter_functions(
@@ -39,18 +188,15 @@ async def process_filter_functions(
 
     for function in filter_functions:
         filter = function
-        filter_id = function.id
         if not filter:
             continue
 
-        if filter_id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[filter_id]
-        else:
-            function_module, _, _ = load_function_module_by_id(filter_id)
-            request.app.state.FUNCTIONS[filter_id] = function_module
+        filter_id = function.id
+        filter_handler = get_filter_handler(request, function, filter_type)
+        function_module = filter_handler.function_module
 
         # Prepare handler function
-        handler = getattr(function_module, filter_type, None)
+        handler = filter_handler.handler
         if not handler:
             continue
 
@@ -59,15 +205,12 @@ async def process_filter_functions(
             skip_files = function_module.file_handler
 
         # Apply valves to the function
-        if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-            valves = Functions.get_function_valves_by_id(filter_id)
-            function_module.valves = function_module.Valves(
-                **(valves if valves else {})
-            )
+        if filter_handler.valves is not None:
+            function_module.valves = filter_handler.valves
 
         try:
             # Prepare parameters
-            sig = inspect.signature(handler)
+            parameters = filter_handler.parameters
 
             params = {"body": form_data}
             if filter_type == "stream":
@@ -79,11 +222,11 @@ async def process_filter_functions(
                     **extra_params,
                     "__id__": filter_id,
                 }.items()
-                if k in sig.parameters
+                if k in parameters
             }
 
             # Handle user parameters
-            if "__user__" in sig.parameters:
+            if "__user__" in parameters:
                 if hasattr(function_module, "UserValves"):
                     try:
                         params["__user__"]["valves"] = function_module.UserValves(
@@ -95,7 +238,7 @@ async def process_filter_functions(
                         log.exception(f"Failed to get user values: {e}")
 
             # Execute handler
-            if inspect.iscoroutinefunction(handler):
+            if filter_handler.is_coroutine:
                 form_data = await handler(**params)
             else:
                 form_data = handler(**params)
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+from open_webui.env import (
+    REALTIME_CHAT_SAVE_FLUSH_BYTES,
+    REALTIME_CHAT_SAVE_FLUSH_INTERVAL,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.chats import Chats
+from open_webui.utils.user_encryption import prefetch_user_encryption_key
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+class MessageWriteBufferStats:
+    """Process-wide counters for the realtime chat save write-behind buffers."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.updates = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.total_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+
+    def record_flush(self, updates: int, duration: float, ok: bool = True) -> None:
+        self.updates += updates
+        self.flushes += 1
+        if not ok:
+            self.failed_flushes += 1
+
+        self.total_flush_seconds += duration
+        self.last_flush_seconds = duration
+        self.max_flush_seconds = max(self.max_flush_seconds, duration)
+
+    def to_dict(self) -> dict:
+        return {
+            "updates": self.updates,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            # Number of upserts absorbed by a single database write
+            "coalescing_ratio": (self.updates / self.flushes if self.flushes else 0.0),
+            "flush_latency_ms": {
+                "avg": (
+                    self.total_flush_seconds / self.flushes * 1000
+                    if self.flushes
+                    else 0.0
+                ),
+                "max": self.max_flush_seconds * 1000,
+                "last": self.last_flush_seconds * 1000,
+            },
+        }
+
+
+MESSAGE_WRITE_BUFFER_STATS = MessageWriteBufferStats()
+
+# Consecutive failed writes after which the buffered updates are given up
+MAX_FAILED_FLUSHES = 3
+
+
+def _get_message_size(message: dict) -> int:
+    return sum(len(value) for value in message.values() if isinstance(value, str))
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind buffer for the realtime saves of a single chat message.
+
+    Streaming handlers call `add` for every delta. Updates are merged in memory and
+    written with a single `Chats.save_message_to_chat_by_id_and_message_id` call
+    once `flush_interval` seconds have passed or `flush_bytes` of new content have
+    accumulated since the previous write. Callers must `flush` when the stream ends
+    or is cancelled.
+
+    Appends that would be expensive to serialise on every delta can use
+    `add_delta` instead, which only builds the message when it is written.
+
+    On an event loop, writes run in a task that first loads the encryption key
+    of `user_id`, the owner of the chat, and async callers use `aflush`. A write
+    that fails keeps its updates buffered for the next flush.
+    """
+
+    def __init__(
+        self,
+        chat_id: str,
+        message_id: str,
+        user_id: Optional[str] = None,
+        flush_interval: float = REALTIME_CHAT_SAVE_FLUSH_INTERVAL,
+        flush_bytes: int = REALTIME_CHAT_SAVE_FLUSH_BYTES,
+    ):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.user_id = user_id
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+
+        self._pending: Optional[dict] = None
+        self._pending_factory: Optional[Callable[[], dict]] = None
+        self._pending_updates = 0
+        self._pending_bytes = 0
+        self._last_size = 0
+        self._last_flush_at = time.monotonic()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._failed_flushes = 0
+
+    @property
+    def has_pending(self) -> bool:
+        return self._pending is not None or self._pending_factory is not None
+
+    def add(self, message: dict) -> None:
+        self._materialize()
+
+        if self._pending is None:
+            self._pending = {**message}
+        else:
+            self._pending.update(message)
+
+        size = _get_message_size(self._pending)
+        self._pending_bytes += abs(size - self._last_size)
+        self._last_size = size
+        self._pending_updates += 1
+
+        self._flush_if_due()
+
+    def add_delta(self, size: int, get_message: Callable[[], dict]) -> None:
+        """
+        Record an update of `size` bytes whose message is only built, by calling
+        `get_message`, when the buffer is flushed.
+        """
+        self._pending_factory = get_message
+        self._pending_bytes += size
+        self._last_size += size
+        self._pending_updates += 1
+
+        self._flush_if_due()
+
+    def _materialize(self) -> None:
+        if self._pending_factory is None:
+            return
+
+        message = self._pending_factory()
+        self._pending_factory = None
+
+        if self._pending is None:
+            self._pending = {**message}
+        else:
+            self._pending.update(message)
+
+    def _flush_if_due(self) -> None:
+        elapsed = time.monotonic() - self._last_flush_at
+        if self._pending_bytes >= self.flush_bytes or elapsed >= self.flush_interval:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # No event loop, written right away
+                self.flush()
+            else:
+                self._start_flush()
+        elif self._timer is None:
+            # Make sure a stalled stream does not keep the buffered delta in memory
+            self._schedule_flush(self.flush_interval - elapsed)
+
+    def _schedule_flush(self, delay: float) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._timer = loop.call_later(max(delay, 0), self._start_flush)
+
+    def _start_flush(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # The updates added meanwhile are written by the flush in progress
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._load_key_and_flush())
+
+    async def _load_key_and_flush(self) -> None:
+        if self.user_id is not None:
+            await prefetch_user_encryption_key(self.user_id)
+        self.flush()
+
+        if self.has_pending and self._timer is None:
+            # Added during the write, or kept after it failed
+            self._schedule_flush(self.flush_interval)
+
+    async def aflush(self) -> None:
+        """`flush` from async code, after the flush in progress if any."""
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self._load_key_and_flush()
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        self._materialize()
+        if self._pending is None:
+            return
+
+        message = self._pending
+        updates = self._pending_updates
+
+        self._pending = None
+        self._pending_updates = 0
+        self._pending_bytes = 0
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            ok = Chats.save_message_to_chat_by_id_and_message_id(
+                self.chat_id, self.message_id, message, append=True
+            )
+            if not ok:
+                log.error(
+                    f"Failed to flush buffered message {self.message_id} of chat {self.chat_id}"
+                )
+        except Exception as e:
+            log.error(
+                f"Failed to flush buffered message {self.message_id} of chat {self.chat_id}: {e}"
+            )
+        finally:
+            duration = time.perf_counter() - start
+            self._last_flush_at = time.monotonic()
+            MESSAGE_WRITE_BUFFER_STATS.record_flush(updates if ok else 0, duration, ok)
+
+        if not ok:
+            self._failed_flushes += 1
+            if self._failed_flushes < MAX_FAILED_FLUSHES:
+                # Kept for the next flush, under the updates added since
+                self._materialize()
+                self._pending = {**message, **(self._pending or {})}
+                self._pending_updates += updates
+            else:
+                log.error(
+                    f"Dropping {updates} buffered update(s) of message {self.message_id} after {self._failed_flushes} failed flushes"
+                )
+            return
+
+        self._failed_flushes = 0
+
+        log.debug(
+            f"Flushed {updates} buffered update(s) for chat {self.chat_id} in {duration * 1000:.2f}ms"
+        )
+
+
+def get_message_write_buffer_stats() -> dict:
+    return MESSAGE_WRITE_BUFFER_STATS.to_dict()
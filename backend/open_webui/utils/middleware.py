@@ -10,7 +10,6 @@ import random
 import re
 import sys
 import time
-from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Optional
 from uuid import uuid4
 
@@ -29,9 +28,9 @@ from open_webui.env import (
     SRC_LOG_LEVELS,
 )
 from open_webui.models.chats import Chats
-from open_webui.models.functions import Functions
 from open_webui.models.models import Models
 from open_webui.models.users import UserModel, Users
+from open_webui.retrieval.executor import RETRIEVAL_EXECUTOR
 from open_webui.retrieval.utils import get_sources_from_files
 from open_webui.routers.images import GenerateImageForm, image_generations
 from open_webui.routers.pipelines import (
@@ -53,7 +52,12 @@ from open_webui.socket.main import (
 from open_webui.tasks import create_task
 from open_webui.utils.chat import generate_chat_completion
 from open_webui.utils.code_interpreter import execute_code_jupyter
-from open_webui.utils.filter import get_sorted_filter_ids, process_filter_functions
+from open_webui.utils.filter import (
+    get_sorted_filter_functions,
+    has_filter_handler,
+    process_filter_functions,
+)
+from open_webui.utils.message_buffer import MessageWriteBuffer
 from open_webui.utils.misc import (
     add_or_update_system_message,
     add_or_update_user_message,
@@ -62,6 +66,9 @@ from open_webui.utils.misc import (
     get_last_assistant_message,
     get_last_user_message,
     get_message_list,
+    get_stream_chunk_content,
+    get_stream_chunk_ids,
+    has_partial_start_tag,
     prepend_to_first_user_message_content,
 )
 from open_webui.utils.plugin import load_function_module_by_id
@@ -71,6 +78,7 @@ from open_webui.utils.task import (
     tools_function_calling_generation_template,
 )
 from open_webui.utils.tools import get_tools
+from open_webui.utils.user_encryption import prefetch_user_encryption_key
 from open_webui.utils.webhook import post_webhook
 from starlette.responses import Response, StreamingResponse
 
@@ -593,26 +601,25 @@ async def chat_completion_files_handler(
             queries = [get_last_user_message(body["messages"])]
 
         try:
-            # Offload get_sources_from_files to a separate thread
+            # Offload get_sources_from_files to the shared retrieval executor
             loop = asyncio.get_running_loop()
-            with ThreadPoolExecutor() as executor:
-                sources = await loop.run_in_executor(
-                    executor,
-                    lambda: get_sources_from_files(
-                        request=request,
-                        files=files,
-                        queries=queries,
-                        embedding_function=lambda query, prefix: request.app.state.EMBEDDING_FUNCTION(
-                            query, prefix=prefix, user=user
-                        ),
-                        k=request.app.state.config.TOP_K,
-                        reranking_function=request.app.state.rf,
-                        k_reranker=request.app.state.config.TOP_K_RERANKER,
-                        r=request.app.state.config.RELEVANCE_THRESHOLD,
-                        hybrid_search=request.app.state.config.ENABLE_RAG_HYBRID_SEARCH,
-                        full_context=request.app.state.config.RAG_FULL_CONTEXT,
+            sources = await loop.run_in_executor(
+                RETRIEVAL_EXECUTOR.pool,
+                lambda: get_sources_from_files(
+                    request=request,
+                    files=files,
+                    queries=queries,
+                    embedding_function=lambda query, prefix: request.app.state.EMBEDDING_FUNCTION(
+                        query, prefix=prefix, user=user
                     ),
-                )
+                    k=request.app.state.config.TOP_K,
+                    reranking_function=request.app.state.rf,
+                    k_reranker=request.app.state.config.TOP_K_RERANKER,
+                    r=request.app.state.config.RELEVANCE_THRESHOLD,
+                    hybrid_search=request.app.state.config.ENABLE_RAG_HYBRID_SEARCH,
+                    full_context=request.app.state.config.RAG_FULL_CONTEXT,
+                ),
+            )
         except Exception as e:
             log.exception(e)
 
@@ -757,10 +764,7 @@ async def process_chat_payload(request, form_data, user, metadata, model):
         raise e
 
     try:
-        filter_functions = [
-            Functions.get_function_by_id(filter_id)
-            for filter_id in get_sorted_filter_ids(model)
-        ]
+        filter_functions = get_sorted_filter_functions(model)
 
         form_data, flags = await process_filter_functions(
             request=request,
@@ -937,6 +941,7 @@ async def process_chat_response(
     request, response, form_data, user, metadata, model, events, tasks
 ):
     async def background_tasks_handler():
+        await prefetch_user_encryption_key(user.id)
         message_map = Chats.get_messages_by_chat_id(metadata["chat_id"])
         message = message_map.get(metadata["message_id"]) if message_map else None
 
@@ -980,6 +985,8 @@ async def process_chat_response(
                             if not title:
                                 title = messages[0].get("content", "New Chat")
 
+                            # The key may have left the cache during the generation
+                            await prefetch_user_encryption_key(user.id)
                             Chats.update_chat_title_by_id(metadata["chat_id"], title)
 
                             await event_emitter(
@@ -1053,12 +1060,15 @@ async def process_chat_response(
         event_emitter = get_event_emitter(metadata)
         event_caller = get_event_call(metadata)
 
+    # The synchronous chat table only reads cached encryption keys on the loop
+    await prefetch_user_encryption_key(user.id)
+
     # Non-streaming response
     if not isinstance(response, StreamingResponse):
         if event_emitter:
             if "error" in response:
                 error = response["error"].get("detail", response["error"])
-                Chats.upsert_message_to_chat_by_id_and_message_id(
+                Chats.save_message_to_chat_by_id_and_message_id(
                     metadata["chat_id"],
                     metadata["message_id"],
                     {
@@ -1067,7 +1077,7 @@ async def process_chat_response(
                 )
 
             if "selected_model_id" in response:
-                Chats.upsert_message_to_chat_by_id_and_message_id(
+                Chats.save_message_to_chat_by_id_and_message_id(
                     metadata["chat_id"],
                     metadata["message_id"],
                     {
@@ -1102,7 +1112,7 @@ async def process_chat_response(
                     )
 
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    Chats.save_message_to_chat_by_id_and_message_id(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -1111,7 +1121,7 @@ async def process_chat_response(
                     )
 
                     # Send a webhook notification if the user is not active
-                    if get_active_status_by_user_id(user.id) is None:
+                    if not await get_active_status_by_user_id(user.id):
                         webhook_url = Users.get_user_webhook_url_by_id(user.id)
                         if webhook_url:
                             post_webhook(
@@ -1152,17 +1162,14 @@ async def process_chat_response(
         "__request__": request,
         "__model__": model,
     }
-    filter_functions = [
-        Functions.get_function_by_id(filter_id)
-        for filter_id in get_sorted_filter_ids(model)
-    ]
+    filter_functions = get_sorted_filter_functions(model)
 
     # Streaming response
     if event_emitter and event_caller:
         task_id = str(uuid4())  # Create a unique task ID.
         model_id = form_data.get("model", "")
 
-        Chats.upsert_message_to_chat_by_id_and_message_id(
+        Chats.save_message_to_chat_by_id_and_message_id(
             metadata["chat_id"],
             metadata["message_id"],
             {
@@ -1486,6 +1493,8 @@ async def process_chat_response(
 
                 return content, content_blocks, end_flag
 
+            # Runs as a background task, possibly after the request has finished
+            await prefetch_user_encryption_key(user.id)
             message = Chats.get_message_by_id_and_message_id(
                 metadata["chat_id"], metadata["message_id"]
             )
@@ -1535,6 +1544,47 @@ async def process_chat_response(
 
             solution_tags = [("|begin_of_solution|", "|end_of_solution|")]
 
+            message_write_buffer = MessageWriteBuffer(
+                metadata["chat_id"], metadata["message_id"], user.id
+            )
+
+            # Plain content deltas are relayed without decoding the whole chunk or
+            # re-serialising the content blocks, unless a stream filter or a start
+            # tag could change how they are handled
+            stream_fast_path = not has_filter_handler(
+                request, filter_functions, "stream"
+            )
+            start_tags = [
+                start_tag
+                for detect, tags in (
+                    (DETECT_REASONING, reasoning_tags),
+                    (DETECT_CODE_INTERPRETER, code_interpreter_tags),
+                    (DETECT_SOLUTION, solution_tags),
+                )
+                if detect
+                for start_tag, _ in tags
+            ]
+            fast_path_values = []
+            # Once the client has been sent the serialised content, deltas would
+            # be appended to it rather than to the raw content
+            content_snapshot_sent = False
+
+            def flush_fast_path_values():
+                nonlocal content
+
+                if fast_path_values:
+                    value = "".join(fast_path_values)
+                    fast_path_values.clear()
+
+                    content = f"{content}{value}"
+                    content_blocks[-1]["content"] = (
+                        content_blocks[-1]["content"] + value
+                    )
+
+            def get_buffered_message():
+                flush_fast_path_values()
+                return {"content": serialize_content_blocks(content_blocks)}
+
             try:
                 for event in events:
                     await event_emitter(
@@ -1545,7 +1595,7 @@ async def process_chat_response(
                     )
 
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    Chats.save_message_to_chat_by_id_and_message_id(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -1556,8 +1606,10 @@ async def process_chat_response(
                 async def stream_body_handler(response):
                     nonlocal content
                     nonlocal content_blocks
+                    nonlocal content_snapshot_sent
 
                     response_tool_calls = []
+                    partial_start_tag = None
 
                     async for line in response.body_iterator:
                         line = line.decode("utf-8") if isinstance(line, bytes) else line
@@ -1574,6 +1626,52 @@ async def process_chat_response(
                         # Remove the prefix
                         data = data[len("data:") :].strip()
 
+                        if (
+                            stream_fast_path
+                            and content_blocks
+                            and content_blocks[-1]["type"] == "text"
+                        ):
+                            if partial_start_tag is None:
+                                partial_start_tag = has_partial_start_tag(
+                                    content_blocks[-1]["content"], start_tags
+                                )
+
+                            value = (
+                                None
+                                if partial_start_tag
+                                else get_stream_chunk_content(data)
+                            )
+                            if value is not None and "<" not in value:
+                                fast_path_values.append(value)
+
+                                if ENABLE_REALTIME_CHAT_SAVE:
+                                    message_write_buffer.add_delta(
+                                        len(value), get_buffered_message
+                                    )
+
+                                if content_snapshot_sent:
+                                    event_data = get_buffered_message()
+                                else:
+                                    event_data = {
+                                        "choices": [{"delta": {"content": value}}]
+                                    }
+
+                                # The frontend keeps the chat completion id for
+                                # the signature of the message
+                                await event_emitter(
+                                    {
+                                        "type": "chat:completion",
+                                        "data": {
+                                            **get_stream_chunk_ids(data),
+                                            **event_data,
+                                        },
+                                    }
+                                )
+                                continue
+
+                        flush_fast_path_values()
+                        partial_start_tag = None
+
                         try:
                             data = json.loads(data)
 
@@ -1591,7 +1689,8 @@ async def process_chat_response(
 
                                 if "selected_model_id" in data:
                                     model_id = data["selected_model_id"]
-                                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                                    await prefetch_user_encryption_key(user.id)
+                                    Chats.save_message_to_chat_by_id_and_message_id(
                                         metadata["chat_id"],
                                         metadata["message_id"],
                                         {
@@ -1779,9 +1878,7 @@ async def process_chat_response(
 
                                         if ENABLE_REALTIME_CHAT_SAVE:
                                             # Save message in the database
-                                            Chats.upsert_message_to_chat_by_id_and_message_id(
-                                                metadata["chat_id"],
-                                                metadata["message_id"],
+                                            message_write_buffer.add(
                                                 {
                                                     "content": serialize_content_blocks(
                                                         content_blocks
@@ -1795,6 +1892,9 @@ async def process_chat_response(
                                                 ),
                                             }
 
+                                if "content" in data:
+                                    content_snapshot_sent = True
+
                                 await event_emitter(
                                     {
                                         "type": "chat:completion",
@@ -1809,6 +1909,8 @@ async def process_chat_response(
                                 log.debug("Error: ", e)
                                 continue
 
+                    flush_fast_path_values()
+
                     if content_blocks:
                         # Clean up the last text block
                         if content_blocks[-1]["type"] == "text":
@@ -1830,6 +1932,8 @@ async def process_chat_response(
                     if response_tool_calls:
                         tool_calls.append(response_tool_calls)
 
+                    await message_write_buffer.aflush()
+
                     if response.background:
                         await response.background()
 
@@ -1987,6 +2091,7 @@ async def process_chat_response(
                         )
 
                         if isinstance(res, StreamingResponse):
+                            content_snapshot_sent = True
                             await stream_body_handler(res)
                         else:
                             break
@@ -2168,6 +2273,7 @@ async def process_chat_response(
                             )
 
                             if isinstance(res, StreamingResponse):
+                                content_snapshot_sent = True
                                 await stream_body_handler(res)
                             else:
                                 break
@@ -2175,6 +2281,8 @@ async def process_chat_response(
                             log.debug(e)
                             break
 
+                # Streams can outlast the key cache TTL
+                await prefetch_user_encryption_key(user.id)
                 title = Chats.get_chat_title_by_id(metadata["chat_id"])
                 data = {
                     "done": True,
@@ -2184,7 +2292,7 @@ async def process_chat_response(
 
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    Chats.save_message_to_chat_by_id_and_message_id(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -2193,7 +2301,7 @@ async def process_chat_response(
                     )
 
                 # Send a webhook notification if the user is not active
-                if get_active_status_by_user_id(user.id) is None:
+                if not await get_active_status_by_user_id(user.id):
                     webhook_url = Users.get_user_webhook_url_by_id(user.id)
                     if webhook_url:
                         post_webhook(
@@ -2220,15 +2328,24 @@ async def process_chat_response(
                 log.warning("Task was cancelled!")
                 await event_emitter({"type": "task-cancelled"})
 
+                flush_fast_path_values()
+
+                # Persist whatever the write-behind buffer still holds
+                await message_write_buffer.aflush()
+
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    Chats.save_message_to_chat_by_id_and_message_id(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
                             "content": serialize_content_blocks(content_blocks),
                         },
                     )
+            except Exception:
+                # Persist the content streamed so far before the error propagates
+                await message_write_buffer.aflush()
+                raise
 
             if response.background is not None:
                 await response.background()
@@ -222,6 +222,75 @@ def openai_chat_chunk_message_template(
     return template
 
 
+STREAM_CHUNK_CONTENT_PATTERN = re.compile(r'"content"\s*:\s*"')
+
+# Chunk fields that need the full chunk to be decoded, ignored when explicitly null
+STREAM_CHUNK_SPECIAL_FIELDS_PATTERN = re.compile(
+    r'"(tool_calls|reasoning_content|reasoning|selected_model_id|event|error|usage|sources)"\s*:(?!\s*null\b)'
+)
+
+
+def get_stream_chunk_content(data: str) -> Optional[str]:
+    """
+    Extract `choices[0].delta.content` from a serialised chat completion chunk
+    without decoding the rest of it.
+
+    Returns None unless the chunk is a plain content delta, i.e. it carries a
+    single non-empty content string and none of the fields that need the full
+    chunk (tool calls, reasoning, usage, errors, events...).
+    """
+    if '"delta"' not in data or STREAM_CHUNK_SPECIAL_FIELDS_PATTERN.search(data):
+        return None
+
+    match = STREAM_CHUNK_CONTENT_PATTERN.search(data)
+    if match is None or STREAM_CHUNK_CONTENT_PATTERN.search(data, match.end()):
+        return None
+
+    try:
+        content, _ = json.decoder.scanstring(data, match.end())
+    except ValueError:
+        return None
+
+    return content or None
+
+
+STREAM_CHUNK_IDS_PATTERN = re.compile(r'"(id|model)"\s*:\s*"')
+
+
+def get_stream_chunk_ids(data: str) -> dict:
+    """
+    Extract the `id` and `model` of a serialised chat completion chunk, to be
+    sent along the content taken by `get_stream_chunk_content`.
+    """
+    ids = {}
+    for match in STREAM_CHUNK_IDS_PATTERN.finditer(data):
+        if match.group(1) in ids:
+            continue
+
+        try:
+            ids[match.group(1)], _ = json.decoder.scanstring(data, match.end())
+        except ValueError:
+            pass
+
+    return ids
+
+
+def has_partial_start_tag(content: str, tags: list[str]) -> bool:
+    """
+    Check whether the end of `content` may be the beginning of one of the
+    `<tag ...>` start tags, so the next chunk could complete it.
+    """
+    start = content.rfind("<")
+    if start == -1:
+        return False
+
+    tail = content[start + 1 :]
+    if ">" in tail:
+        return False
+
+    return any(tag.startswith(tail) or tail.startswith(tag) for tag in tags)
+
+
 def openai_chat_completion_message_template(
     model: str,
     message: Optional[str] = None,
@@ -1,17 +1,26 @@
+import asyncio
+import hashlib
 import logging
 import sys
 import time
+from collections import OrderedDict
+from typing import Optional
 
 from aiocache import cached
 from fastapi import Request
 from open_webui.config import DEFAULT_ARENA_MODEL
-from open_webui.env import GLOBAL_LOG_LEVEL, MODELS_CACHE_TTL, SRC_LOG_LEVELS
+from open_webui.env import (
+    GLOBAL_LOG_LEVEL,
+    MODELS_ACCESS_CACHE_SIZE,
+    MODELS_CACHE_TTL,
+    SRC_LOG_LEVELS,
+)
 from open_webui.functions import get_function_models
 from open_webui.models.functions import Functions
-from open_webui.models.models import Models
+from open_webui.models.models import ModelModel, Models
 from open_webui.models.users import UserModel
 from open_webui.routers import ollama, openai
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import get_user_group_ids, has_access
 from open_webui.utils.plugin import load_function_module_by_id
 
 logging.basicConfig(stream=sys.stdout, level=GLOBAL_LOG_LEVEL)
@@ -93,66 +102,94 @@ async def get_all_models_cached(request, user: UserModel = None):
             ]
         models = models + arena_models
 
-    custom_models = Models.get_all_models()
+    return apply_custom_models(models, Models.get_all_models())
+
+
+def apply_custom_models(models: list[dict], custom_models: list[ModelModel]) -> list:
+    """
+    Overlay the custom models on `models`, in time linear in both.
+
+    Custom models without a base model override the models with the same id,
+    or the Ollama models with that name whatever their tag, and hide them when
+    inactive. Active custom models with a base model are appended as presets,
+    owned by the first model whose id, or id without tag, is their base model
+    id. Returns a new list, `models` itself is not reordered.
+    """
+    # id, and Ollama name without tag, -> models overridden by a custom model
+    overridable: dict[str, list[dict]] = {}
+    for model in models:
+        overridable.setdefault(model["id"], []).append(model)
+
+        # Ollama may return model ids in different formats (e.g., 'llama3' vs. 'llama3:7b')
+        if model.get("owned_by") == "ollama":
+            name = model["id"].split(":")[0]
+            if name != model["id"]:
+                overridable.setdefault(name, []).append(model)
+
+    hidden = set()
+    presets = []
     for custom_model in custom_models:
         if custom_model.base_model_id is None:
-            for model in models:
-                if custom_model.id == model["id"] or (
-                    model.get("owned_by") == "ollama"
-                    and custom_model.id
-                    == model["id"].split(":")[
-                        0
-                    ]  # Ollama may return model ids in different formats (e.g., 'llama3' vs. 'llama3:7b')
-                ):
-                    if custom_model.is_active:
-                        model["name"] = custom_model.name
-                        model["info"] = custom_model.model_dump()
-
-                        action_ids = []
-                        if "info" in model and "meta" in model["info"]:
-                            action_ids.extend(
-                                model["info"]["meta"].get("actionIds", [])
-                            )
-
-                        model["action_ids"] = action_ids
-                    else:
-                        models.remove(model)
-
-        elif custom_model.is_active and (
-            custom_model.id not in [model["id"] for model in models]
-        ):
-            owned_by = "openai"
-            pipe = None
-            action_ids = []
-
-            for model in models:
-                if (
-                    custom_model.base_model_id == model["id"]
-                    or custom_model.base_model_id == model["id"].split(":")[0]
-                ):
-                    owned_by = model.get("owned_by", "unknown owner")
-                    if "pipe" in model:
-                        pipe = model["pipe"]
-                    break
-
-            if custom_model.meta:
-                meta = custom_model.meta.model_dump()
-                if "actionIds" in meta:
-                    action_ids.extend(meta["actionIds"])
-
-            models.append(
-                {
-                    "id": f"{custom_model.id}",
-                    "name": custom_model.name,
-                    "object": "model",
-                    "created": custom_model.created_at,
-                    "owned_by": owned_by,
-                    "info": custom_model.model_dump(),
-                    "preset": True,
-                    **({"pipe": pipe} if pipe is not None else {}),
-                    "action_ids": action_ids,
-                }
-            )
+            for model in overridable.get(custom_model.id, ()):
+                if custom_model.is_active:
+                    model["name"] = custom_model.name
+                    model["info"] = custom_model.model_dump()
+
+                    action_ids = []
+                    if "info" in model and "meta" in model["info"]:
+                        action_ids.extend(model["info"]["meta"].get("actionIds", []))
+
+                    model["action_ids"] = action_ids
+                else:
+                    hidden.add(id(model))
+
+        elif custom_model.is_active:
+            presets.append(custom_model)
+
+    models = [model for model in models if id(model) not in hidden]
+
+    # id, and id without tag, -> first model with it, to find the base models
+    base_models = {}
+    for model in models:
+        base_models.setdefault(model["id"], model)
+        base_models.setdefault(model["id"].split(":")[0], model)
+    model_ids = {model["id"] for model in models}
+
+    for custom_model in presets:
+        if custom_model.id in model_ids:
+            continue
+
+        owned_by = "openai"
+        pipe = None
+        action_ids = []
+
+        base_model = base_models.get(custom_model.base_model_id)
+        if base_model is not None:
+            owned_by = base_model.get("owned_by", "unknown owner")
+            pipe = base_model.get("pipe")
+
+        if custom_model.meta:
+            meta = custom_model.meta.model_dump()
+            if "actionIds" in meta:
+                action_ids.extend(meta["actionIds"])
+
+        model = {
+            "id": f"{custom_model.id}",
+            "name": custom_model.name,
+            "object": "model",
+            "created": custom_model.created_at,
+            "owned_by": owned_by,
+            "info": custom_model.model_dump(),
+            "preset": True,
+            **({"pipe": pipe} if pipe is not None else {}),
+            "action_ids": action_ids,
+        }
+        models.append(model)
+
+        # Presets can be the base model of the next ones
+        model_ids.add(model["id"])
+        base_models.setdefault(model["id"], model)
+        base_models.setdefault(model["id"].split(":")[0], model)
 
     return models
 
@@ -245,3 +282,202 @@ def check_model_access(user, model):
             )
         ):
             raise Exception("Model not found")
+
+
+class ModelCatalog:
+    """
+    The models listed by /api/models, in two levels.
+
+    The base catalog is shared by every user: the models without the filter
+    pipelines, with their tags merged and sorted by `MODEL_ORDER_LIST`, along
+    with who may read each of them, from a single query of the model table. It
+    is rebuilt when `get_all_models` returns a new list, the order changes or
+    the version is bumped.
+
+    The models a user may read through groups are memoised per access
+    signature, the role and a hash of the group ids of the user, so users
+    sharing the same groups share one entry. The models the user owns or is
+    granted by id are added on top.
+
+    `invalidate` bumps the version whenever a model, a group or an access
+    control changes. Once attached to the app config, the other workers are
+    told through its Redis channel, so the version is a local counter checked
+    without any I/O. The model table is read off the event loop, concurrent
+    requests share one rebuild.
+    """
+
+    INVALIDATION_NAME = "models"
+
+    def __init__(self, maxsize: int):
+        self.config = None
+        self.maxsize = maxsize
+
+        self._local_version = 0
+        self._key = None
+        self._models: list[dict] = []
+
+        # Indexes in `_models` of the models readable by everyone, by members of
+        # some groups, and by given users
+        self._public_indexes: set[int] = set()
+        self._group_indexes: list[tuple[int, frozenset[str]]] = []
+        self._user_indexes: dict[str, set[int]] = {}
+
+        # (role, group ids hash) -> indexes readable through the groups
+        self._visible: OrderedDict[tuple[str, str], frozenset[int]] = OrderedDict()
+        self._load_lock = asyncio.Lock()
+
+    def attach(self, config) -> None:
+        """Share invalidations with the other workers through `config`."""
+        self.config = config
+        config.add_invalidation_listener(self.INVALIDATION_NAME, self._bump_version)
+
+    def get_version(self) -> int:
+        return self._local_version
+
+    def _bump_version(self) -> None:
+        self._local_version += 1
+
+    def invalidate(self) -> None:
+        self._bump_version()
+
+        if self.config:
+            self.config.publish_invalidation(self.INVALIDATION_NAME)
+
+    def _is_current(self, key: tuple) -> bool:
+        return (
+            self._key is not None
+            and self._key[0] is key[0]
+            and self._key[1:] == key[1:]
+        )
+
+    def _load(self, all_models: list[dict], model_order_list: list[str]) -> tuple:
+        models = []
+        for model in all_models:
+            # Filter out filter pipelines
+            if "pipeline" in model and model["pipeline"].get("type", None) == "filter":
+                continue
+
+            try:
+                model_tags = [
+                    tag.get("name")
+                    for tag in model.get("info", {}).get("meta", {}).get("tags", [])
+                ]
+                tags = [tag.get("name") for tag in model.get("tags", [])]
+
+                tags = list(set(model_tags + tags))
+                model["tags"] = [{"name": tag} for tag in tags]
+            except Exception as e:
+                log.debug(f"Error processing model tags: {e}")
+                model["tags"] = []
+
+            models.append(model)
+
+        if model_order_list:
+            model_order_dict = {
+                model_id: i for i, model_id in enumerate(model_order_list)
+            }
+            # Sort models by order list priority, with fallback for those not in the list
+            models.sort(
+                key=lambda x: (model_order_dict.get(x["id"], float("inf")), x["name"])
+            )
+
+        model_infos = {model.id: model for model in Models.get_all_models()}
+
+        public_indexes = set()
+        group_indexes = []
+        user_indexes = {}
+        for index, model in enumerate(models):
+            if model.get("arena"):
+                owner_id = None
+                access_control = (
+                    model.get("info", {}).get("meta", {}).get("access_control", {})
+                )
+            else:
+                model_info = model_infos.get(model["id"])
+                if model_info is None:
+                    continue
+
+                owner_id = model_info.user_id
+                access_control = model_info.access_control
+
+            if owner_id:
+                user_indexes.setdefault(owner_id, set()).add(index)
+
+            # Same rules as `has_access(..., type="read")`
+            if access_control is None:
+                public_indexes.add(index)
+                continue
+
+            read_access = access_control.get("read", {})
+            for user_id in read_access.get("user_ids", []):
+                user_indexes.setdefault(user_id, set()).add(index)
+
+            group_ids = read_access.get("group_ids", [])
+            if group_ids:
+                group_indexes.append((index, frozenset(group_ids)))
+
+        return models, public_indexes, group_indexes, user_indexes
+
+    def _get_group_visible(self, role: str, user_group_ids: set[str]) -> frozenset[int]:
+        signature = (
+            role,
+            hashlib.sha256("\n".join(sorted(user_group_ids)).encode()).hexdigest(),
+        )
+
+        visible = self._visible.get(signature)
+        if visible is None:
+            visible = frozenset(
+                self._public_indexes.union(
+                    index
+                    for index, group_ids in self._group_indexes
+                    if not group_ids.isdisjoint(user_group_ids)
+                )
+            )
+            self._visible[signature] = visible
+            while len(self._visible) > self.maxsize:
+                self._visible.popitem(last=False)
+        else:
+            self._visible.move_to_end(signature)
+
+        return visible
+
+    async def get_models(
+        self,
+        all_models: list[dict],
+        model_order_list: list[str],
+        user: Optional[UserModel] = None,
+    ) -> list[dict]:
+        """
+        The catalog built from `all_models`, only the models `user` may read when
+        one is given.
+        """
+        # `all_models` is kept so its identity tells whether it was reloaded
+        key = (all_models, tuple(model_order_list or ()), self.get_version())
+        if not self._is_current(key):
+            async with self._load_lock:
+                if not self._is_current(key):
+                    (
+                        self._models,
+                        self._public_indexes,
+                        self._group_indexes,
+                        self._user_indexes,
+                    ) = await asyncio.to_thread(
+                        self._load, all_models, model_order_list
+                    )
+                    self._visible.clear()
+                    self._key = key
+
+        if user is None:
+            return list(self._models)
+
+        user_group_ids = await asyncio.to_thread(get_user_group_ids, user.id)
+        visible = self._get_group_visible(user.role, user_group_ids)
+        owned = self._user_indexes.get(user.id, ())
+        return [
+            model
+            for index, model in enumerate(self._models)
+            if index in visible or index in owned
+        ]
+
+
+MODEL_CATALOG = ModelCatalog(maxsize=MODELS_ACCESS_CACHE_SIZE)
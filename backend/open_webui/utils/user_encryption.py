@@ -1,14 +1,29 @@
+import asyncio
 import base64
+import hashlib
+import hmac
 import json
 import logging
 import os
+import re
 import secrets
-from typing import Dict, Optional
-
-import requests
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+import zlib
+from typing import Callable, Dict, Iterable, Optional
+
+import aiohttp
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from open_webui.models.user_data_keys import UserDataKeys
 
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
 log = logging.getLogger(__name__)
 
 
@@ -18,6 +33,168 @@ class EncryptionError(Exception):
     pass
 
 
+####################
+# Encryption envelope
+####################
+
+# Text form of an envelope stored in the `chat` and `title` columns
+ENVELOPE_PREFIX = "pce:"
+
+# Binary layout (the header is authenticated as AES-GCM associated data):
+#   magic (4) | version (1) | compression (1) | key id (8) | nonce (12) | ciphertext
+ENVELOPE_MAGIC = b"\x8cPCE"
+ENVELOPE_VERSION = 1
+ENVELOPE_HEADER_SIZE = 26
+
+COMPRESSION_NONE = 0
+COMPRESSION_DEFLATE = 1
+COMPRESSION_ZSTD = 2
+
+COMPRESSION_ALGORITHMS = {
+    "none": COMPRESSION_NONE,
+    "deflate": COMPRESSION_DEFLATE,
+    "zstd": COMPRESSION_ZSTD,
+}
+
+# Off by default: the length of a compressed ciphertext leaks how well the
+# plaintext compresses, so content an attacker can inject next to secret content,
+# such as a web page or document quoted in the same chat, lets them guess the
+# secret from the size of the stored chat (as in the CRIME attack). Only enable
+# it when the database size matters more than that.
+CHAT_ENCRYPTION_COMPRESSION = os.getenv("CHAT_ENCRYPTION_COMPRESSION", "none").lower()
+if CHAT_ENCRYPTION_COMPRESSION not in COMPRESSION_ALGORITHMS:
+    CHAT_ENCRYPTION_COMPRESSION = "none"
+elif CHAT_ENCRYPTION_COMPRESSION == "zstd" and not zstd:
+    CHAT_ENCRYPTION_COMPRESSION = "deflate"
+
+# Payloads smaller than this are stored uncompressed
+CHAT_ENCRYPTION_COMPRESSION_MIN_SIZE = int(
+    os.getenv("CHAT_ENCRYPTION_COMPRESSION_MIN_SIZE", "1024")
+)
+
+
+def derive_subkey(key: bytes, label: bytes) -> bytes:
+    """Derive a purpose-bound key from a user's data key, e.g. for keyed digests."""
+    return hmac.new(key, b"private-chat/" + label, hashlib.sha256).digest()
+
+
+# Blind index: words are case-folded, stripped of diacritics and truncated before hashing.
+# Prefixes are indexed as well so queries match while the user is still typing.
+SEARCH_WORD_PATTERN = re.compile(r"\w+")
+SEARCH_INDEX_MIN_PREFIX = 3
+SEARCH_INDEX_MAX_WORD_LENGTH = 32
+
+
+def normalize_search_words(text: str) -> set[str]:
+    """Split text into the normalised words used by the blind search index."""
+    if not text or not isinstance(text, str):
+        return set()
+
+    text = "".join(
+        char
+        for char in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(char)
+    ).casefold()
+    return {
+        word[:SEARCH_INDEX_MAX_WORD_LENGTH]
+        for word in SEARCH_WORD_PATTERN.findall(text)
+    }
+
+
+def expand_search_prefixes(words: Iterable[str]) -> set[str]:
+    """Add the prefixes of every word that a search query may stop at."""
+    expanded = set()
+    for word in words:
+        expanded.add(word)
+        expanded.update(
+            word[:length] for length in range(SEARCH_INDEX_MIN_PREFIX, len(word))
+        )
+    return expanded
+
+
+def get_key_id(key: bytes) -> bytes:
+    """Short, non-secret fingerprint identifying the data key of an envelope."""
+    return hashlib.sha256(b"private-chat-key-id" + key).digest()[:8]
+
+
+def _compress(plaintext: bytes) -> tuple[int, bytes]:
+    if len(plaintext) < CHAT_ENCRYPTION_COMPRESSION_MIN_SIZE:
+        return COMPRESSION_NONE, plaintext
+
+    compression = COMPRESSION_ALGORITHMS[CHAT_ENCRYPTION_COMPRESSION]
+    if compression == COMPRESSION_ZSTD:
+        compressed = zstd.ZstdCompressor().compress(plaintext)
+    elif compression == COMPRESSION_DEFLATE:
+        compressed = zlib.compress(plaintext, 6)
+    else:
+        return COMPRESSION_NONE, plaintext
+
+    if len(compressed) >= len(plaintext):
+        return COMPRESSION_NONE, plaintext
+    return compression, compressed
+
+
+def _decompress(compression: int, payload: bytes) -> bytes:
+    if compression == COMPRESSION_NONE:
+        return payload
+    elif compression == COMPRESSION_DEFLATE:
+        return zlib.decompress(payload)
+    elif compression == COMPRESSION_ZSTD:
+        if not zstd:
+            raise EncryptionError("zstd compressed data but zstandard is not installed")
+        return zstd.ZstdDecompressor().decompress(payload)
+
+    raise EncryptionError(f"Unknown compression: {compression}")
+
+
+def is_envelope(data) -> bool:
+    """O(1) check for the versioned encryption envelope."""
+    return isinstance(data, str) and data.startswith(ENVELOPE_PREFIX)
+
+
+def seal_envelope(key: bytes, plaintext: bytes) -> str:
+    """Compress (when worthwhile) and encrypt plaintext into an envelope string."""
+    compression, payload = _compress(plaintext)
+
+    nonce = secrets.token_bytes(12)
+    header = (
+        ENVELOPE_MAGIC
+        + bytes([ENVELOPE_VERSION, compression])
+        + get_key_id(key)
+        + nonce
+    )
+    ciphertext = AESGCM(key).encrypt(nonce, payload, header)
+
+    return ENVELOPE_PREFIX + base64.b64encode(header + ciphertext).decode("ascii")
+
+
+def open_envelope(key: bytes, data: str) -> bytes:
+    """Decrypt an envelope string produced by `seal_envelope`."""
+    envelope = base64.b64decode(data[len(ENVELOPE_PREFIX) :])
+    if (
+        len(envelope) < ENVELOPE_HEADER_SIZE
+        or envelope[:4] != ENVELOPE_MAGIC
+        or envelope[4] != ENVELOPE_VERSION
+    ):
+        raise EncryptionError("Unsupported encryption envelope")
+
+    header = envelope[:ENVELOPE_HEADER_SIZE]
+    if header[6:14] != get_key_id(key):
+        raise EncryptionError("Envelope was encrypted with a different key")
+
+    nonce = header[14:26]
+    payload = AESGCM(key).decrypt(nonce, envelope[ENVELOPE_HEADER_SIZE:], header)
+    return _decompress(header[5], payload)
+
+
+class KeyServiceError(Exception):
+    """Error response from the external key service."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Key service error {status}: {message}")
+        self.status = status
+
+
 class UserEncryptionConfig:
     """Configuration for user-based encryption."""
 
@@ -34,86 +211,484 @@ class UserEncryptionConfig:
 
         if enabled:
             log.info("Encryption config - Using per-user AES-256-GCM keys")
+            if cls.is_message_storage_enabled():
+                log.info("Encryption config - Storing chat messages individually")
 
+    @classmethod
+    def is_search_index_enabled(cls) -> bool:
+        """Check if encrypted chats are searchable through the blind token index."""
+        return os.environ.get("ENABLE_CHAT_SEARCH_INDEX", "true").lower() == "true"
 
-class UserDataEncryptionService:
+    @classmethod
+    def is_message_storage_enabled(cls) -> bool:
+        """Check if chat messages are encrypted and stored one row per message."""
+        return os.environ.get("ENABLE_CHAT_MESSAGE_STORAGE", "false").lower() == "true"
+
+
+class KeyCache:
     """
-    TEE-safe encryption service for per-user data encryption using AES-256-GCM.
+    Bounded LRU cache of decrypted user data keys with a per-entry TTL.
+
+    Eviction hooks are called as `hook(user_id, reason)` whenever a key leaves the
+    cache, where reason is one of "expired", "capacity" or "explicit".
     """
 
-    def __init__(self):
-        self.key_service_base_url = os.getenv("KEY_SERVICE_BASE_URL")
-        if not self.key_service_base_url:
-            raise Exception("KEY_SERVICE_BASE_URL is not set")
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[str, tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._eviction_hooks: list[Callable[[str, str], None]] = []
+
+    def add_eviction_hook(self, hook: Callable[[str, str], None]) -> None:
+        self._eviction_hooks.append(hook)
+
+    def remove_eviction_hook(self, hook: Callable[[str, str], None]) -> None:
+        if hook in self._eviction_hooks:
+            self._eviction_hooks.remove(hook)
+
+    def _notify(self, evicted: list[tuple[str, str]]) -> None:
+        for user_id, reason in evicted:
+            for hook in self._eviction_hooks:
+                try:
+                    hook(user_id, reason)
+                except Exception as e:
+                    log.warning(f"Key cache eviction hook failed for {user_id}: {e}")
+
+    def get(self, user_id: str) -> Optional[bytes]:
+        evicted = []
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+
+            key, expires_at = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._entries[user_id]
+                evicted.append((user_id, "expired"))
+                key = None
+            else:
+                self._entries.move_to_end(user_id)
+
+        self._notify(evicted)
+        return key
+
+    def set(self, user_id: str, key: bytes) -> None:
+        evicted = []
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl if self.ttl else 0
+            self._entries[user_id] = (key, expires_at)
+            self._entries.move_to_end(user_id)
+
+            while self.max_size and len(self._entries) > self.max_size:
+                evicted_user_id, _ = self._entries.popitem(last=False)
+                evicted.append((evicted_user_id, "capacity"))
+
+        self._notify(evicted)
+
+    def evict(self, user_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+
+        if entry is None:
+            return False
 
-        # In-memory cache for decrypted keys to avoid repeated API calls
-        self._key_cache: Dict[str, bytes] = {}
+        self._notify([(user_id, "explicit")])
+        return True
 
-    def _generate_new_data_key(self) -> str:
-        """Generate a new encrypted data key from the external key service."""
-        url = f"{self.key_service_base_url}/keys"
-        response = requests.post(url, timeout=30)
-        response.raise_for_status()
+    def clear(self) -> None:
+        with self._lock:
+            user_ids = list(self._entries.keys())
+            self._entries.clear()
+
+        self._notify([(user_id, "explicit") for user_id in user_ids])
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class KeyServiceClient:
+    """
+    Asyncio client for the external key service.
+
+    All requests run on a dedicated event loop thread that owns a single pooled
+    `aiohttp` session, so both async request handlers and the synchronous facade
+    used by the database layer share connections and in-flight lookups without
+    blocking the application event loop on network I/O.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 30,
+        pool_size: int = 32,
+        batch_size: int = 100,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+
+        # Flipped off the first time the key service rejects the batch endpoint
+        self.supports_batch = True
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="key-service-client",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coroutine) -> Future:
+        """Schedule a coroutine on the client loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop())
+
+    def in_client_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
 
-        data = response.json()
+    async def _post(self, path: str, payload: Optional[dict] = None) -> dict:
+        session = await self._get_session()
+        async with session.post(f"{self.base_url}{path}", json=payload) as response:
+            if response.status >= 400:
+                error_text = await response.text()
+                raise KeyServiceError(response.status, error_text)
+
+            return await response.json(content_type=None)
+
+    async def generate_data_key(self) -> str:
+        """Generate a new encrypted data key."""
+        data = await self._post("/keys")
         if "key" not in data:
             raise Exception("Invalid response from key service")
 
         return data["key"]
 
-    def _decrypt_data_key(self, encrypted_key: str) -> str:
-        """Decrypt an encrypted data key using the external key service."""
-        url = f"{self.key_service_base_url}/keys/decrypt"
-        payload = {"key": encrypted_key}
-        response = requests.post(url, json=payload, timeout=30)
-
-        if not response.ok:
-            error_text = response.text
-            raise Exception(f"Key service error {response.status_code}: {error_text}")
-
-        data = response.json()
+    async def decrypt_data_key(self, encrypted_key: str) -> str:
+        """Decrypt an encrypted data key, returning the key as hex."""
+        data = await self._post("/keys/decrypt", {"key": encrypted_key})
         if "decryptedKey" not in data:
             raise Exception("Invalid response from key service")
 
         return data["decryptedKey"]
 
-    def _get_user_encryption_key(self, user_id: str) -> bytes:
-        """Get or create a user's encryption key as bytes for AES-256-GCM."""
-        # Check cache first
-        if user_id in self._key_cache:
-            return self._key_cache[user_id]
+    async def decrypt_data_keys(self, encrypted_keys: list[str]) -> list[str]:
+        """
+        Decrypt many encrypted data keys, returning hex keys in the same order.
+
+        Keys are sent to `/keys/decrypt/batch` in chunks of `batch_size`. Key
+        services without the batch endpoint fall back to individual
+        `/keys/decrypt` calls bounded by the connection pool size.
+        """
+        if not encrypted_keys:
+            return []
+
+        if self.supports_batch:
+            try:
+                decrypted_keys = []
+                for i in range(0, len(encrypted_keys), self.batch_size):
+                    chunk = encrypted_keys[i : i + self.batch_size]
+                    data = await self._post("/keys/decrypt/batch", {"keys": chunk})
+
+                    chunk_keys = data.get("decryptedKeys")
+                    if not isinstance(chunk_keys, list) or len(chunk_keys) != len(
+                        chunk
+                    ):
+                        raise Exception("Invalid response from key service")
+
+                    decrypted_keys.extend(chunk_keys)
+                return decrypted_keys
+            except KeyServiceError as e:
+                if e.status not in (404, 405, 501):
+                    raise
+
+                log.info(
+                    "Key service has no batch endpoint, decrypting keys one by one"
+                )
+                self.supports_batch = False
+
+        semaphore = asyncio.Semaphore(self.pool_size)
+
+        async def decrypt(encrypted_key: str) -> str:
+            async with semaphore:
+                return await self.decrypt_data_key(encrypted_key)
+
+        return list(await asyncio.gather(*[decrypt(key) for key in encrypted_keys]))
+
+    async def _close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def close(self) -> None:
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+
+        if loop is None or loop.is_closed():
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result(
+                timeout=self.timeout
+            )
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+class UserDataEncryptionService:
+    """
+    TEE-safe encryption service for per-user data encryption using AES-256-GCM.
+    """
+
+    def __init__(self):
+        self.key_service_base_url = os.getenv("KEY_SERVICE_BASE_URL")
+        if not self.key_service_base_url:
+            raise Exception("KEY_SERVICE_BASE_URL is not set")
+
+        self.key_service_timeout = float(os.getenv("KEY_SERVICE_TIMEOUT", "30"))
+        self._key_client = KeyServiceClient(
+            self.key_service_base_url,
+            timeout=self.key_service_timeout,
+            pool_size=int(os.getenv("KEY_SERVICE_POOL_SIZE", "32")),
+            batch_size=int(os.getenv("KEY_SERVICE_BATCH_SIZE", "100")),
+        )
+
+        # Bounded in-memory cache for decrypted keys to avoid repeated API calls
+        self._key_cache = KeyCache(
+            max_size=int(os.getenv("KEY_CACHE_MAX_SIZE", "1024")),
+            ttl=float(os.getenv("KEY_CACHE_TTL", "3600")),
+        )
+
+        # Lookups in flight on the key client loop, keyed by user id
+        self._pending_keys: Dict[str, asyncio.Task] = {}
+
+    async def _fetch_user_encryption_key(self, user_id: str) -> bytes:
+        """Load a user's key from the database and key service, creating it if needed."""
+        key_bytes = self._key_cache.get(user_id)
+        if key_bytes is not None:
+            return key_bytes
 
         # Check if user already has a data key in database
-        existing_key = UserDataKeys.get_user_data_key_by_user_id(user_id)
+        existing_key = await asyncio.to_thread(
+            UserDataKeys.get_user_data_key_by_user_id, user_id
+        )
 
         if existing_key:
             # User has an existing key
             encrypted_key = existing_key.encrypted_data_key
         else:
             # User doesn't have a key, generate and store a new one
-            encrypted_key = self._generate_new_data_key()
+            encrypted_key = await self._key_client.generate_data_key()
 
-            user_data_key = UserDataKeys.create_user_data_key(
-                user_id=user_id, encrypted_data_key=encrypted_key
+            user_data_key = await asyncio.to_thread(
+                UserDataKeys.create_user_data_key,
+                user_id=user_id,
+                encrypted_data_key=encrypted_key,
             )
 
             if not user_data_key:
                 raise Exception("Failed to store user data key")
 
         # Decrypt, validate, and cache the key
-        decrypted_key_hex = self._decrypt_data_key(encrypted_key)
+        decrypted_key_hex = await self._key_client.decrypt_data_key(encrypted_key)
         key_bytes = bytes.fromhex(decrypted_key_hex)
 
         if len(key_bytes) != 32:
             raise Exception("Invalid key length")
 
-        self._key_cache[user_id] = key_bytes
+        self._key_cache.set(user_id, key_bytes)
         return key_bytes
 
+    async def _load_user_encryption_key(self, user_id: str) -> bytes:
+        """Coalesce concurrent lookups for the same user into a single fetch."""
+        task = self._pending_keys.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_user_encryption_key(user_id))
+            self._pending_keys[user_id] = task
+            task.add_done_callback(lambda _: self._pending_keys.pop(user_id, None))
+
+        return await asyncio.shield(task)
+
+    async def get_user_encryption_key_async(self, user_id: str) -> bytes:
+        """Get or create a user's encryption key without blocking the event loop."""
+        key_bytes = self._key_cache.get(user_id)
+        if key_bytes is not None:
+            return key_bytes
+
+        return await asyncio.wrap_future(
+            self._key_client.submit(self._load_user_encryption_key(user_id))
+        )
+
+    def _wait_for_key_client(self, coroutine, description: str):
+        """
+        Run `coroutine` on the key client loop and wait for its result.
+
+        Only worker threads wait. On a thread running an event loop, waiting would
+        stall every request served by that loop, so the lookup is left to finish
+        in the background and EncryptionError is raised right away. Async callers
+        load keys beforehand with `get_user_encryption_key_async`.
+        """
+        if self._key_client.in_client_loop():
+            coroutine.close()
+            raise EncryptionError("Synchronous key lookup from the key client loop")
+
+        future = self._key_client.submit(coroutine)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return future.result(timeout=self.key_service_timeout)
+
+        def done(future: Future):
+            if not future.cancelled() and future.exception() is not None:
+                log.warning(f"Failed to load {description}: {future.exception()}")
+
+        future.add_done_callback(done)
+        raise EncryptionError(f"{description} is not loaded yet".capitalize())
+
+    def _get_user_encryption_key(self, user_id: str) -> bytes:
+        """Get or create a user's encryption key as bytes for AES-256-GCM."""
+        # Check cache first
+        key_bytes = self._key_cache.get(user_id)
+        if key_bytes is not None:
+            return key_bytes
+
+        return self._wait_for_key_client(
+            self._load_user_encryption_key(user_id),
+            f"encryption key of user {user_id}",
+        )
+
+    async def _fetch_user_encryption_keys(
+        self, user_ids: list[str]
+    ) -> Dict[str, bytes]:
+        """Unwrap the stored keys of many users with batched key service calls."""
+        user_ids = [
+            user_id
+            for user_id in dict.fromkeys(user_ids)
+            if user_id not in self._key_cache
+        ]
+        if not user_ids:
+            return {}
+
+        user_data_keys = await asyncio.to_thread(
+            UserDataKeys.get_user_data_keys_by_user_ids, user_ids
+        )
+        if not user_data_keys:
+            return {}
+
+        decrypted_keys = await self._key_client.decrypt_data_keys(
+            [user_data_key.encrypted_data_key for user_data_key in user_data_keys]
+        )
+
+        keys = {}
+        for user_data_key, decrypted_key_hex in zip(user_data_keys, decrypted_keys):
+            try:
+                key_bytes = bytes.fromhex(decrypted_key_hex)
+            except (TypeError, ValueError):
+                key_bytes = b""
+
+            if len(key_bytes) != 32:
+                log.warning(f"Invalid key length for user {user_data_key.user_id}")
+                continue
+
+            self._key_cache.set(user_data_key.user_id, key_bytes)
+            keys[user_data_key.user_id] = key_bytes
+        return keys
+
+    async def get_user_encryption_keys_async(
+        self, user_ids: list[str]
+    ) -> Dict[str, bytes]:
+        """
+        Get the keys of many users at once, unwrapping cache misses in batches.
+
+        Users without a stored data key are skipped rather than created.
+        """
+        keys = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            key_bytes = self._key_cache.get(user_id)
+            if key_bytes is not None:
+                keys[user_id] = key_bytes
+            else:
+                missing.append(user_id)
+
+        if missing:
+            keys.update(
+                await asyncio.wrap_future(
+                    self._key_client.submit(self._fetch_user_encryption_keys(missing))
+                )
+            )
+        return keys
+
+    def get_user_encryption_keys(self, user_ids: list[str]) -> Dict[str, bytes]:
+        """Synchronous facade for `get_user_encryption_keys_async`."""
+        keys = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            key_bytes = self._key_cache.get(user_id)
+            if key_bytes is not None:
+                keys[user_id] = key_bytes
+            else:
+                missing.append(user_id)
+
+        if missing:
+            keys.update(
+                self._wait_for_key_client(
+                    self._fetch_user_encryption_keys(missing),
+                    f"encryption keys of {len(missing)} user(s)",
+                )
+            )
+        return keys
+
+    async def prewarm_keys(self, active_within: int = 3600) -> int:
+        """
+        Load the keys of users active within the last `active_within` seconds.
+
+        Returns the number of keys added to the cache.
+        """
+        from open_webui.models.users import Users
+
+        user_ids = await asyncio.to_thread(
+            Users.get_active_user_ids, int(time.time()) - active_within
+        )
+        keys = await self.get_user_encryption_keys_async(
+            [user_id for user_id in user_ids if user_id not in self._key_cache]
+        )
+
+        log.info(f"Prewarmed {len(keys)} user encryption key(s)")
+        return len(keys)
+
+    def add_key_eviction_hook(self, hook: Callable[[str, str], None]) -> None:
+        """Register a callback invoked as hook(user_id, reason) on key eviction."""
+        self._key_cache.add_eviction_hook(hook)
+
     def clear_cache(self, user_id: Optional[str] = None) -> None:
         """Clear cached decrypted keys."""
         if user_id:
-            self._key_cache.pop(user_id, None)
+            self._key_cache.evict(user_id)
         else:
             self._key_cache.clear()
 
@@ -129,14 +704,42 @@ class UserDataEncryptionService:
         json_str = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
         plaintext = json_str.encode("utf-8")
 
-        # Create AESGCM instance and encrypt
-        aesgcm = AESGCM(key)
-        nonce = secrets.token_bytes(12)
-        ciphertext = aesgcm.encrypt(nonce, plaintext, None)
+        return seal_envelope(key, plaintext)
 
-        # Combine nonce + ciphertext and return base64 encoded
-        encrypted_data = nonce + ciphertext
-        return base64.b64encode(encrypted_data).decode("utf-8")
+    def encrypt_data_with_digest(
+        self, data: dict, user_id: str, previous_digest: Optional[str] = None
+    ) -> tuple[Optional[str], str]:
+        """
+        Encrypt data and compute a keyed digest of its plaintext.
+
+        The digest lets callers detect unchanged data without decrypting it and
+        reveals nothing about the plaintext without the user's key. Encryption is
+        skipped, and None returned instead of the envelope, if the digest matches
+        `previous_digest`.
+        """
+        if not isinstance(data, dict):
+            raise EncryptionError(f"Expected dict, got {type(data)}")
+
+        key = self._get_user_encryption_key(user_id)
+
+        json_str = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        plaintext = json_str.encode("utf-8")
+
+        digest = hmac.new(
+            derive_subkey(key, b"digest"), plaintext, hashlib.sha256
+        ).hexdigest()
+        if previous_digest is not None and hmac.compare_digest(digest, previous_digest):
+            return None, digest
+
+        return seal_envelope(key, plaintext), digest
+
+    def get_search_tokens(self, words: Iterable[str], user_id: str) -> set[str]:
+        """Compute the blind index tokens (keyed HMACs) of normalised words."""
+        search_key = derive_subkey(self._get_user_encryption_key(user_id), b"search")
+        return {
+            hmac.new(search_key, word.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+            for word in words
+        }
 
     def decrypt_data(self, encrypted_data: str, user_id: str) -> dict:
         """Decrypt data using AES-256-GCM with the user's encryption key."""
@@ -155,32 +758,42 @@ class UserDataEncryptionService:
             except json.JSONDecodeError:
                 return {}
 
+        # Fail closed: an empty chat read back would be written over the stored one
+        key = self._get_user_encryption_key(user_id)
+
         # Decrypt AES-256-GCM data
         try:
-            # Get user's encryption key
-            key = self._get_user_encryption_key(user_id)
+            if is_envelope(encrypted_data):
+                decrypted_bytes = open_envelope(key, encrypted_data)
+            else:
+                decrypted_bytes = self._decrypt_legacy_data(key, encrypted_data)
 
-            # Decode base64
-            encrypted_bytes = base64.b64decode(encrypted_data.encode("utf-8"))
+            return json.loads(decrypted_bytes.decode("utf-8"))
 
-            # Extract nonce and ciphertext (nonce is first 12 bytes)
-            if len(encrypted_bytes) < 12:
-                return {}
+        except EncryptionError:
+            raise
+        except Exception as e:
+            raise EncryptionError(f"Failed to decrypt data: {e}") from e
 
-            nonce = encrypted_bytes[:12]
-            ciphertext = encrypted_bytes[12:]
+    def _decrypt_legacy_data(self, key: bytes, encrypted_data: str) -> bytes:
+        """Decrypt the pre-envelope format: base64(nonce + ciphertext)."""
+        # Decode base64
+        encrypted_bytes = base64.b64decode(encrypted_data.encode("utf-8"))
 
-            # Decrypt and parse JSON
-            aesgcm = AESGCM(key)
-            decrypted_bytes = aesgcm.decrypt(nonce, ciphertext, None)
-            return json.loads(decrypted_bytes.decode("utf-8"))
+        # Extract nonce and ciphertext (nonce is first 12 bytes)
+        if len(encrypted_bytes) < 12:
+            raise EncryptionError("Encrypted data is too short")
 
-        except Exception:
-            # Graceful degradation: return empty dict instead of crashing
-            return {}
+        nonce = encrypted_bytes[:12]
+        ciphertext = encrypted_bytes[12:]
+
+        aesgcm = AESGCM(key)
+        return aesgcm.decrypt(nonce, ciphertext, None)
 
     def is_encrypted(self, data: str) -> bool:
-        """Check if data is a base64 string."""
+        """Check if data is an encryption envelope or legacy base64 ciphertext."""
+        if is_envelope(data):
+            return True
         return self._is_base64_encoded(data)
 
     def _is_base64_encoded(self, data: str) -> bool:
@@ -188,6 +801,10 @@ class UserDataEncryptionService:
         if not data or not isinstance(data, str):
             return False
 
+        # Plain JSON can never be base64, skip the full decode for it
+        if data[0] in "{[":
+            return False
+
         try:
             base64.b64decode(data, validate=True)
             return True
@@ -211,6 +828,12 @@ def _get_encryption_service() -> UserDataEncryptionService:
     return _user_encryption_service
 
 
+def close_encryption_service() -> None:
+    """Close the key service client of the global encryption service, if any."""
+    if _user_encryption_service is not None:
+        _user_encryption_service._key_client.close()
+
+
 # Convenience functions for backward compatibility and ease of use
 def encrypt_chat_data(chat_data: dict, user_id: str) -> str:
     """
@@ -221,7 +844,7 @@ def encrypt_chat_data(chat_data: dict, user_id: str) -> str:
         user_id (str): User ID to encrypt for
 
     Returns:
-        str: Base64 encoded encrypted string
+        str: Encrypted envelope string
 
     Raises:
         EncryptionError: If encryption fails
@@ -234,15 +857,77 @@ def decrypt_chat_data(encrypted_data: str, user_id: str) -> dict:
     Convenience function to decrypt chat data for a specific user.
 
     Args:
-        encrypted_data (str): Base64 encoded encrypted string or plain JSON
+        encrypted_data (str): Encrypted envelope or legacy base64 string, or plain JSON
         user_id (str): User ID to decrypt for
 
     Returns:
         dict: Decrypted dictionary
+
+    Raises:
+        EncryptionError: If the key is not available or decryption fails
     """
     return _get_encryption_service().decrypt_data(encrypted_data, user_id)
 
 
+def encrypt_message_data(
+    message: dict, user_id: str, previous_digest: Optional[str] = None
+) -> tuple[Optional[str], str]:
+    """
+    Encrypt a single chat message for a specific user.
+
+    Args:
+        message (dict): Message to encrypt
+        user_id (str): User ID to encrypt for
+        previous_digest (Optional[str]): Digest of the stored message, if any
+
+    Returns:
+        tuple[Optional[str], str]: Encrypted envelope string, or None if the message
+            is unchanged from `previous_digest`, and the keyed digest of the message
+
+    Raises:
+        EncryptionError: If encryption fails
+    """
+    return _get_encryption_service().encrypt_data_with_digest(
+        message, user_id, previous_digest
+    )
+
+
+def get_search_index_tokens(texts: Iterable[str], user_id: str) -> set[str]:
+    """
+    Compute the blind index tokens for chat titles and message contents.
+
+    Args:
+        texts (Iterable[str]): Plaintext to index
+        user_id (str): User ID whose key the tokens are derived from
+
+    Returns:
+        set[str]: Tokens of every word and word prefix in `texts`
+    """
+    words = set()
+    for text in texts:
+        words.update(normalize_search_words(text))
+
+    return _get_encryption_service().get_search_tokens(
+        expand_search_prefixes(words), user_id
+    )
+
+
+def get_search_query_tokens(search_text: str, user_id: str) -> set[str]:
+    """
+    Compute the blind index tokens for a search query.
+
+    Args:
+        search_text (str): Search query without `tag:` filters
+        user_id (str): User ID whose key the tokens are derived from
+
+    Returns:
+        set[str]: One token per query word, all of which must match
+    """
+    return _get_encryption_service().get_search_tokens(
+        normalize_search_words(search_text), user_id
+    )
+
+
 def is_chat_data_encrypted(data: str) -> bool:
     """
     Convenience function to check if data is encrypted.
@@ -259,12 +944,48 @@ def is_chat_data_encrypted(data: str) -> bool:
         return False
 
 
+def is_legacy_encrypted_data(data) -> bool:
+    """Check if data is ciphertext in the pre-envelope base64 format."""
+    if not isinstance(data, str) or not data or is_envelope(data):
+        return False
+
+    try:
+        return _get_encryption_service()._is_base64_encoded(data.strip())
+    except Exception:
+        return False
+
+
 def get_user_data_encryption_key(user_id: str) -> str:
     """Get a user's data encryption key in hex format (for backward compatibility)."""
     key_bytes = _get_encryption_service()._get_user_encryption_key(user_id)
     return key_bytes.hex()
 
 
+async def prefetch_user_encryption_key(user_id: str) -> None:
+    """Warm the key cache for a user so later synchronous lookups are cache hits."""
+    if not UserEncryptionConfig.is_encryption_enabled():
+        return
+
+    try:
+        await _get_encryption_service().get_user_encryption_key_async(user_id)
+    except Exception as e:
+        log.warning(f"Failed to prefetch encryption key for user {user_id}: {e}")
+
+
+async def prewarm_encryption_keys(active_within: Optional[int] = None) -> None:
+    """Load keys for recently active users, e.g. after a deploy or pod restart."""
+    if active_within is None:
+        active_within = int(os.getenv("KEY_CACHE_PREWARM_WINDOW", "3600"))
+
+    if active_within <= 0:
+        return
+
+    try:
+        await _get_encryption_service().prewarm_keys(active_within)
+    except Exception as e:
+        log.warning(f"Failed to prewarm encryption keys: {e}")
+
+
 def clear_encryption_cache(user_id: Optional[str] = None) -> None:
     """Clear cached encryption keys."""
     _get_encryption_service().clear_cache(user_id)
@@ -279,7 +1000,7 @@ def encrypt_title_data(title: str, user_id: str) -> str:
         user_id (str): User ID to encrypt for
 
     Returns:
-        str: Base64 encoded encrypted string
+        str: Encrypted envelope string
 
     Raises:
         EncryptionError: If encryption fails
@@ -297,11 +1018,14 @@ def decrypt_title_data(encrypted_data: str, user_id: str) -> str:
     Convenience function to decrypt title data for a specific user.
 
     Args:
-        encrypted_data (str): Base64 encoded encrypted string or plain text
+        encrypted_data (str): Encrypted envelope or legacy base64 string, or plain text
         user_id (str): User ID to decrypt for
 
     Returns:
         str: Decrypted title string
+
+    Raises:
+        EncryptionError: If the key is not available
     """
     if not encrypted_data or not isinstance(encrypted_data, str):
         return encrypted_data or ""
@@ -310,9 +1034,14 @@ def decrypt_title_data(encrypted_data: str, user_id: str) -> str:
     if not encrypted_data:
         return ""
 
+    service = _get_encryption_service()
+    if service.is_encrypted(encrypted_data):
+        # Without the key the ciphertext would be served, and saved, as the title
+        service._get_user_encryption_key(user_id)
+
     try:
         # Try to decrypt the data
-        decrypted_data = _get_encryption_service().decrypt_data(encrypted_data, user_id)
+        decrypted_data = service.decrypt_data(encrypted_data, user_id)
         return (
             decrypted_data.get("title", "") if isinstance(decrypted_data, dict) else ""
         )
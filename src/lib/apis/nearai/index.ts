@@ -39,6 +39,50 @@ export const getMessageSignature = async ({
 	return res.json();
 };
 
+// Fetch the signatures of several messages of a model at once, `onSignature` is
+// called for each message as soon as the server has its signature or error
+export const getMessageSignatures = async ({
+	token,
+	model,
+	chatCompletionIds,
+	onSignature,
+	url = `${WEBUI_BASE_URL}/api`,
+	signingAlgorithm = 'ecdsa'
+}: GetMessageSignaturesParams): Promise<void> => {
+	const res = await fetch(`${url}/signatures`, {
+		method: 'POST',
+		headers: {
+			Authorization: `Bearer ${token}`,
+			'Content-Type': 'application/json',
+			Accept: 'application/x-ndjson'
+		},
+		body: JSON.stringify({
+			model,
+			chat_completion_ids: chatCompletionIds,
+			signing_algo: signingAlgorithm
+		})
+	});
+	if (!res.ok || !res.body) {
+		throw new Error((await res.json().catch(() => null))?.detail ?? 'Failed to fetch signatures');
+	}
+
+	const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+	let buffer = '';
+	while (true) {
+		const { value, done } = await reader.read();
+		if (done) break;
+
+		buffer += value;
+		const lines = buffer.split('\n');
+		buffer = lines.pop() ?? '';
+		for (const line of lines) {
+			if (line.trim()) {
+				onSignature(JSON.parse(line));
+			}
+		}
+	}
+};
+
 export type Address = `0x${string}`;
 
 export type GetModelAttestationReportParams = {
@@ -69,6 +113,22 @@ export type GetMessageSignatureParams = {
 	signingAlgorithm?: SigningAlgorithm;
 };
 
+export type GetMessageSignaturesParams = {
+	url?: string;
+	token: string;
+	model: string;
+	chatCompletionIds: string[];
+	onSignature: (result: MessageSignatureResult) => void;
+	signingAlgorithm?: SigningAlgorithm;
+};
+
+export type MessageSignatureResult = {
+	chat_completion_id: string;
+	signature?: MessageSignature;
+	error?: string;
+	status?: number;
+};
+
 export type MessageSignature = {
 	text: string; // Format: request_body_sha256:response_body_sha256
 	signature: string;